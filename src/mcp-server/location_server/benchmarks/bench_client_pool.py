@@ -0,0 +1,74 @@
+"""Per-call client overhead: a new geo-routes client per call vs the shared registry.
+
+Usage (from the location_server directory):
+
+    python benchmarks/bench_client_pool.py [--iterations 200] [--live]
+
+Without --live only client acquisition is timed, which needs no credentials.
+With --live every iteration also issues a calculate_routes request so the cost
+of a fresh TLS connection shows up in the numbers.
+"""
+
+import argparse
+import boto3
+import botocore.config
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client_registry import GeoClientRegistry  # noqa: E402
+
+
+ROUTE_PARAMS = {
+    'Origin': [-46.5358, -23.4356],
+    'Destination': [-46.5658, -23.7214],
+    'TravelMode': 'Car',
+}
+
+
+def per_call_client():
+    config = botocore.config.Config(
+        connect_timeout=15, read_timeout=15, retries={'max_attempts': 3}
+    )
+    return boto3.client(
+        'geo-routes', region_name=os.environ.get('AWS_REGION', 'us-east-1'), config=config
+    )
+
+
+def measure(get_client, iterations, live):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        client = get_client()
+        if live:
+            client.calculate_routes(**ROUTE_PARAMS)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'p50_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[int(len(samples) * 0.95) - 1], 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--live', action='store_true', help='Call calculate_routes each iteration')
+    args = parser.parse_args()
+
+    shared = GeoClientRegistry()
+    shared.warm_up(('geo-routes',))
+
+    before = measure(per_call_client, args.iterations, args.live)
+    after = measure(lambda: shared.get('geo-routes'), args.iterations, args.live)
+    print(f'per-call client : {before}')
+    print(f'shared registry : {after}')
+    print(f'p50 speedup     : {before["p50_ms"] / max(after["p50_ms"], 1e-6):.0f}x')
+
+
+if __name__ == '__main__':
+    main()
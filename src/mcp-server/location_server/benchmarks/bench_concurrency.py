@@ -0,0 +1,91 @@
+"""Concurrent sessions against a geo-places client that sleeps like a slow API.
+
+Usage (from the location_server directory):
+
+    python benchmarks/bench_concurrency.py [--sessions N] [--latency 0.2]
+
+'blocking' reproduces the old behaviour of calling boto3 directly inside the
+async tool, 'executor' goes through the reverse_geocode tool, which dispatches
+the call to the geo executor. With the executor N sessions should finish in
+about ceil(N / limit) API latencies instead of N, where limit is the per-API
+concurrency limit of reverse_geocode (GEO_API_CONCURRENCY, 16 by default).
+Beyond the rate limiter's burst of one second of calls (GEO_API_RATE, 20 by
+default) the rest wait for tokens, which also bounds the time.
+--sessions defaults to the concurrency limit, so the executor should take
+about one latency.
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server_location  # noqa: E402
+from client_registry import registry  # noqa: E402
+from geo_executor import GEO_API_RATE, executor  # noqa: E402
+
+
+class SleepingPlacesClient:
+    """Stand-in for the boto3 geo-places client with a fixed response latency."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def reverse_geocode(self, QueryPosition):
+        time.sleep(self.latency)
+        return {'Place': {'Title': 'Stub', 'Geometry': {'Point': QueryPosition}}}
+
+
+async def blocking_session(client, i):
+    # What the tools used to do: a synchronous boto3 call inside async def
+    client.reverse_geocode(QueryPosition=[-46.5 + i * 1e-3, -23.5])
+
+
+async def executor_session(i):
+    await server_location.mcp.call_tool(
+        'reverse_geocode', {'longitude': -46.5 + i * 1e-3, 'latitude': -23.5}
+    )
+
+
+async def timed(coros):
+    start = time.perf_counter()
+    await asyncio.gather(*coros)
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    api = 'geo-places.reverse_geocode'
+    limit = executor.api_limits.get(api, executor.default_limit)
+    rate = executor.api_rates.get(api, GEO_API_RATE)
+    parser.add_argument('--sessions', type=int, default=limit)
+    parser.add_argument('--latency', type=float, default=0.2)
+    args = parser.parse_args()
+    # Whole waves of `limit` calls, or the calls beyond the burst at the token rate
+    expected = max(
+        math.ceil(args.sessions / limit) * args.latency,
+        max(args.sessions - rate, 0) / rate + args.latency,
+    )
+
+    client = SleepingPlacesClient(args.latency)
+    registry.register('geo-places', client)
+
+    blocking = await timed(blocking_session(client, i) for i in range(args.sessions))
+    concurrent = await timed(executor_session(i) for i in range(args.sessions))
+    print(
+        f'{args.sessions} sessions, {args.latency * 1000:.0f} ms per call, '
+        f'limit {limit} in flight, {rate:g} calls/s'
+    )
+    print(f'blocking : {blocking:.2f}s ({blocking / args.latency:.1f}x latency)')
+    print(
+        f'executor : {concurrent:.2f}s ({concurrent / args.latency:.1f}x latency, '
+        f'expected about {expected:.2f}s)'
+    )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
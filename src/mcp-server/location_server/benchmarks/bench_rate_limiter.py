@@ -0,0 +1,121 @@
+"""Bulk and interactive calculate_routes traffic against an API with a request rate quota.
+
+Usage (from the location_server directory):
+
+    python benchmarks/bench_rate_limiter.py [--quota 20] [--bulk 200] [--interactive 20]
+
+The stub client throttles every request above `quota` per second, like
+Amazon Location does. 'unlimited' sends calls as fast as the executor allows
+and relies on retries alone; 'adaptive' goes through the AIMD token bucket.
+Bulk calls (calculate_routes_batch) use the bulk lane, so interactive calls
+(calculate_route) made during the burst should keep a low latency.
+"""
+
+import argparse
+import asyncio
+import botocore.exceptions
+import collections
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client_registry import registry  # noqa: E402
+from geo_executor import GeoExecutor, bulk_priority  # noqa: E402
+
+
+class QuotaRoutesClient:
+    """Stand-in for the boto3 geo-routes client that throttles above a request rate."""
+
+    def __init__(self, quota, latency):
+        self.quota = quota
+        self.latency = latency
+        self.requests = 0
+        self.throttled = 0
+        self._recent = collections.deque()
+        self._lock = threading.Lock()
+
+    def calculate_routes(self, **params):
+        with self._lock:
+            self.requests += 1
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 1.0:
+                self._recent.popleft()
+            if len(self._recent) >= self.quota:
+                self.throttled += 1
+                raise botocore.exceptions.ClientError(
+                    {'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}},
+                    'CalculateRoutes',
+                )
+            self._recent.append(now)
+        time.sleep(self.latency)
+        return {'Routes': [{'Distance': 1000, 'DurationSeconds': 100}]}
+
+
+async def call(executor, index, bulk, latencies, failures):
+    start = time.perf_counter()
+    try:
+        if bulk:
+            with bulk_priority():
+                await executor.run('geo-routes', 'calculate_routes', Origin=[index, 0])
+        else:
+            await executor.run('geo-routes', 'calculate_routes', Origin=[-index, 0])
+        latencies.append(time.perf_counter() - start)
+    except botocore.exceptions.ClientError:
+        failures.append(index)
+
+
+async def interactive_stream(executor, count, latencies, failures):
+    # One user request every 250 ms while the bulk burst is running
+    tasks = []
+    for i in range(count):
+        tasks.append(asyncio.ensure_future(call(executor, i + 1, False, latencies, failures)))
+        await asyncio.sleep(0.25)
+    await asyncio.gather(*tasks)
+
+
+async def scenario(name, executor, client, args):
+    bulk_latencies, bulk_failures = [], []
+    interactive_latencies, interactive_failures = [], []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(call(executor, i, True, bulk_latencies, bulk_failures) for i in range(args.bulk)),
+        interactive_stream(executor, args.interactive, interactive_latencies, interactive_failures),
+    )
+    elapsed = time.perf_counter() - start
+    p95 = (
+        statistics.quantiles(interactive_latencies, n=20)[-1]
+        if len(interactive_latencies) > 1
+        else float('nan')
+    )
+    print(
+        f'{name:<9}: {elapsed:5.2f}s, {client.requests} requests, {client.throttled} throttled, '
+        f'failed bulk {len(bulk_failures)} / interactive {len(interactive_failures)}, '
+        f'interactive p50 {statistics.median(interactive_latencies or [0]) * 1000:.0f} ms '
+        f'p95 {p95 * 1000:.0f} ms'
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quota', type=int, default=20)
+    parser.add_argument('--bulk', type=int, default=200)
+    parser.add_argument('--interactive', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    api = 'geo-routes.calculate_routes'
+    for name, rate in (('unlimited', 1e6), ('adaptive', args.quota)):
+        client = QuotaRoutesClient(args.quota, args.latency)
+        registry.register('geo-routes', client)
+        executor = GeoExecutor(api_rates={api: rate}, coalesce=False)
+        await scenario(name, executor, client, args)
+        if name == 'adaptive':
+            print(f'final rate: {executor.stats()["rate_limits"][api]["rate_per_second"]}/s')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,285 @@
+"""Concurrent MCP sessions over SSE against the location server on the fake geo backend.
+
+Usage (from the location_server directory):
+
+    python benchmarks/bench_sse_load.py [--sessions 20] [--calls 25] [--latency-ms 50]
+        [--output results.json] [--compare baseline.json]
+
+The Starlette app from server_location runs in-process under uvicorn on a
+local port with GEO_BACKEND=fake. Each session connects through /sse, posts
+to /messages/ and calls a weighted mix of tools with arguments drawn from the
+fake place dataset. The report has overall throughput, p50/p95/p99 latency
+and error counts per tool, event-loop lag and process memory. Clients share
+the server's event loop, so loop lag covers both sides, as it would for any
+in-process load test.
+
+Results are written as JSON; --compare prints the throughput and p95 change
+against an earlier run, e.g. one from the previous commit.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['GEO_BACKEND'] = 'fake'
+os.environ.setdefault('API_TOKEN', 'bench-token')
+os.environ.setdefault('FASTMCP_LOG_LEVEL', 'ERROR')
+
+import server_location  # noqa: E402
+import uvicorn  # noqa: E402
+from mcp import ClientSession  # noqa: E402
+from mcp.client.sse import sse_client  # noqa: E402
+
+
+# Relative frequency of each tool in the mix, roughly what an agent session asks for
+TOOL_WEIGHTS = {
+    'search_places': 20,
+    'search_nearby': 20,
+    'reverse_geocode': 15,
+    'get_place': 10,
+    'calculate_route': 15,
+    'route_geometry': 5,
+    'places_open_at': 5,
+    'route_matrix': 5,
+    'optimize_waypoints': 5,
+}
+
+
+def tool_arguments(tool, rng, places):
+    """Return arguments for one call, drawn from the fake dataset."""
+    place = rng.choice(places)
+    lon, lat = place['Position']
+    other = rng.choice(places)
+    if tool == 'search_places':
+        words = place['Title'].split()
+        return {'query': f'{words[0]} {place["Address"]["Locality"]}', 'max_results': 5}
+    if tool == 'search_nearby':
+        return {'longitude': lon, 'latitude': lat, 'radius': rng.choice([300, 500, 1000])}
+    if tool == 'reverse_geocode':
+        return {'longitude': lon + rng.uniform(-0.002, 0.002), 'latitude': lat}
+    if tool == 'get_place':
+        return {'place_id': place['PlaceId']}
+    if tool in ('calculate_route', 'route_geometry'):
+        return {'departure_position': [lon, lat], 'destination_position': other['Position']}
+    if tool == 'places_open_at':
+        ids = [p['PlaceId'] for p in rng.sample(places, 10)]
+        return {'place_ids': json.dumps(ids), 'window_minutes': 60}
+    if tool == 'route_matrix':
+        origins = [p['Position'] for p in rng.sample(places, 3)]
+        destinations = [p['Position'] for p in rng.sample(places, 5)]
+        return {'origins': json.dumps(origins), 'destinations': json.dumps(destinations)}
+    waypoints = [{'Position': p['Position']} for p in rng.sample(places, 5)]
+    return {
+        'origin_position': [lon, lat],
+        'destination_position': [lon, lat],
+        'waypoints': waypoints,
+    }
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def rss_mb():
+    """Current resident set size in MB, from /proc where available."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+async def monitor_loop(interval, lags, memory, stop):
+    # Lag is how late a sleep wakes up: time the loop spent on other work
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - start - interval))
+        rss = rss_mb()
+        if rss is not None:
+            memory.append(rss)
+
+
+async def session(url, headers, index, args, places, samples):
+    rng = random.Random(args.seed + index)
+    tools = list(TOOL_WEIGHTS)
+    weights = list(TOOL_WEIGHTS.values())
+    async with sse_client(url, headers=headers, timeout=30) as (read_stream, write_stream):
+        async with ClientSession(read_stream, write_stream) as client:
+            await client.initialize()
+            for _ in range(args.calls):
+                tool = rng.choices(tools, weights)[0]
+                arguments = tool_arguments(tool, rng, places)
+                start = time.perf_counter()
+                try:
+                    result = await client.call_tool(tool, arguments)
+                    text = result.content[0].text if result.content else ''
+                    failed = result.isError or '"error"' in text
+                except Exception:
+                    failed = True
+                samples.append((tool, time.perf_counter() - start, failed))
+
+
+def summarize(samples, elapsed, lags, memory, args):
+    tools = {}
+    for tool in sorted({s[0] for s in samples}):
+        latencies = [s[1] * 1000 for s in samples if s[0] == tool]
+        tools[tool] = {
+            'calls': len(latencies),
+            'errors': sum(1 for s in samples if s[0] == tool and s[2]),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+        }
+    latencies = [s[1] * 1000 for s in samples]
+    lag_ms = [lag * 1000 for lag in lags]
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    backend = server_location.fake_geo_backend
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'config': {
+            'sessions': args.sessions,
+            'calls_per_session': args.calls,
+            'latency_ms': args.latency_ms,
+            'error_rate': args.error_rate,
+            'seed': args.seed,
+            'tool_weights': TOOL_WEIGHTS,
+        },
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_calls_per_second': round(len(samples) / elapsed, 2) if elapsed else None,
+        'calls': len(samples),
+        'errors': sum(1 for s in samples if s[2]),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 2) if latencies else None,
+            'p95': round(percentile(latencies, 95), 2) if latencies else None,
+            'p99': round(percentile(latencies, 99), 2) if latencies else None,
+        },
+        'tools': tools,
+        'event_loop_lag_ms': {
+            'mean': round(statistics.fmean(lag_ms), 2) if lag_ms else None,
+            'p99': round(percentile(lag_ms, 99), 2) if lag_ms else None,
+            'max': round(max(lag_ms), 2) if lag_ms else None,
+        },
+        'memory_mb': {
+            'rss_start': round(memory[0], 1) if memory else None,
+            'rss_end': round(memory[-1], 1) if memory else None,
+            'rss_peak': round(max(memory), 1) if memory else None,
+            'max_rss': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        },
+        'backend_calls': dict(backend.calls),
+        'executor': server_location.executor.stats(),
+    }
+
+
+def print_report(report, baseline=None):
+    print(
+        f'{report["calls"]} calls in {report["elapsed_seconds"]}s: '
+        f'{report["throughput_calls_per_second"]} calls/s, {report["errors"]} errors'
+    )
+    print(f'{"tool":<20} {"calls":>6} {"errors":>6} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+    for tool, row in report['tools'].items():
+        print(
+            f'{tool:<20} {row["calls"]:>6} {row["errors"]:>6} '
+            f'{row["p50_ms"]:>8} {row["p95_ms"]:>8} {row["p99_ms"]:>8}'
+        )
+    lag = report['event_loop_lag_ms']
+    memory = report['memory_mb']
+    print(f'event loop lag: mean {lag["mean"]} ms, p99 {lag["p99"]} ms, max {lag["max"]} ms')
+    print(f'memory: rss {memory["rss_start"]} -> {memory["rss_end"]} MB, peak {memory["rss_peak"]} MB')
+    if baseline:
+        print(f'compared with {baseline.get("commit")}:')
+        before = baseline['throughput_calls_per_second']
+        print(f'  throughput {before} -> {report["throughput_calls_per_second"]} calls/s')
+        for tool, row in report['tools'].items():
+            old = baseline.get('tools', {}).get(tool)
+            if old:
+                change = (row['p95_ms'] / old['p95_ms'] - 1) * 100 if old['p95_ms'] else 0.0
+                print(f'  {tool:<20} p95 {old["p95_ms"]} -> {row["p95_ms"]} ms ({change:+.0f}%)')
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--calls', type=int, default=25, help='tool calls per session')
+    parser.add_argument('--latency-ms', type=float, default=50, help='fake API latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='injected API errors')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', default='sse_load.json')
+    parser.add_argument('--compare', help='earlier JSON result to compare with')
+    args = parser.parse_args()
+
+    backend = server_location.fake_geo_backend
+    backend.latency_ms = args.latency_ms
+    backend.jitter_ms = args.latency_ms / 5
+    backend.error_rate = args.error_rate
+
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    config = uvicorn.Config(
+        server_location.create_app(), host='127.0.0.1', port=port, log_level='error'
+    )
+    server = uvicorn.Server(config)
+    serving = asyncio.ensure_future(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    url = f'http://127.0.0.1:{port}{server_location.BASE_PATH}/sse'
+    headers = {'Authorization': f'Bearer {os.environ["API_TOKEN"]}'}
+    samples, lags, memory = [], [], []
+    stop = asyncio.Event()
+    monitor = asyncio.ensure_future(monitor_loop(0.01, lags, memory, stop))
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(session(url, headers, i, args, backend.places, samples) for i in range(args.sessions)),
+        return_exceptions=True,
+    )
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await monitor
+    server.should_exit = True
+    await serving
+
+    failed_sessions = [r for r in results if isinstance(r, BaseException)]
+    if failed_sessions:
+        print(f'{len(failed_sessions)} sessions failed: {failed_sessions[0]!r}')
+    report = summarize(samples, elapsed, lags, memory, args)
+    report['failed_sessions'] = len(failed_sessions)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+"""Local fleet route planner on synthetic instances with known bounds.
+
+Usage (from the location_server directory):
+
+    python benchmarks/bench_vrp.py [--budget 2.0] [--seed 0]
+
+Costs are Euclidean. Two instance families are used:
+
+- clustered: every vehicle's worth of demand sits on a tiny ring far from the
+  depot, so the optimal plan sends one vehicle per ring. Its cost is bounded
+  below by out-and-back to the ring plus the ring perimeter ('opt_lb'), which
+  is tight to within the ring radius.
+- uniform: stops scattered uniformly around the depot; the solution is
+  compared with the radial lower bound sum(2 * d(depot, i) * q_i) / Q.
+"""
+
+import argparse
+import numpy as np
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vrp import route_cost, solve_vrp  # noqa: E402
+
+
+def clustered_instance(rng, clusters, per_cluster, capacity, radius=1.0, distance=100.0):
+    angles = rng.uniform(0, 2 * np.pi, clusters)
+    centers = np.stack([np.cos(angles), np.sin(angles)], axis=1) * distance
+    ring = np.linspace(0, 2 * np.pi, per_cluster, endpoint=False)
+    offsets = np.stack([np.cos(ring), np.sin(ring)], axis=1) * radius
+    points = np.vstack([[0.0, 0.0]] + [center + offsets for center in centers])
+    demands = np.zeros(len(points))
+    demands[1:] = capacity / per_cluster
+    # One trip per ring: out to the ring, around it, back
+    side = 2 * radius * np.sin(np.pi / per_cluster)
+    optimal = clusters * (2 * (distance - radius) + (per_cluster - 1) * side)
+    return points, demands, clusters, optimal
+
+
+def uniform_instance(rng, stops, capacity, extent=100.0):
+    points = np.vstack([[0.0, 0.0], rng.uniform(-extent, extent, (stops, 2))])
+    demands = np.zeros(len(points))
+    demands[1:] = rng.integers(1, 20, stops)
+    vehicles = int(np.ceil(demands.sum() / capacity * 1.3))
+    return points, demands, vehicles, None
+
+
+def run(name, points, demands, vehicles, capacity, optimal, budget):
+    cost = np.sqrt(((points[:, None, :] - points[None, :, :]) ** 2).sum(axis=-1))
+    stops = np.arange(1, len(points))
+    start = time.perf_counter()
+    routes, unassigned = solve_vrp(
+        cost, stops, demands[:, None], [0] * vehicles, np.full((vehicles, 1), capacity), budget
+    )
+    elapsed = time.perf_counter() - start
+    total = sum(route_cost(cost, 0, route) for route in routes)
+    radial = 2 * (cost[0] * demands).sum() / capacity
+    line = (
+        f'{name:<22} stops={len(stops):<4} vehicles_used={sum(1 for r in routes if r):<3} '
+        f'unassigned={len(unassigned):<3} cost={total:9.1f} time={elapsed:5.2f}s '
+        f'radial_lb={radial:9.1f} gap_lb={100 * (total / radial - 1):5.1f}%'
+    )
+    if optimal is not None:
+        line += f' opt_lb={optimal:9.1f} gap_opt_lb={100 * (total / optimal - 1):5.2f}%'
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    for clusters, per_cluster in ((10, 10), (25, 20)):
+        points, demands, vehicles, optimal = clustered_instance(rng, clusters, per_cluster, 100)
+        name = f'clustered {clusters}x{per_cluster}'
+        run(name, points, demands, vehicles, 100, optimal, args.budget)
+    for stops in (100, 250, 500):
+        points, demands, vehicles, _ = uniform_instance(rng, stops, 100)
+        run(f'uniform {stops}', points, demands, vehicles, 100, None, args.budget)
+
+
+if __name__ == '__main__':
+    main()
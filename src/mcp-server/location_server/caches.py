@@ -0,0 +1,258 @@
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+# Single thread that writes persisted cache entries, so SQLite never blocks the event loop;
+# one worker keeps the writes (and clears) of every cache in order
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cache-writer')
+
+
+def normalize_query(query: str) -> str:
+    """Normalize free text so trivially different spellings share a cache key.
+
+    Case, accents and repeated whitespace are dropped: 'CD  Guarulhos' and
+    'cd guarulhos', or 'São Bernardo do Campo' and 'Sao Bernardo do Campo',
+    resolve to the same key.
+    """
+    decomposed = unicodedata.normalize('NFKD', query)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.casefold().split())
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire after a TTL.
+
+    Optionally persists entries to a SQLite file so a restarted server starts
+    warm. Values must be JSON serializable when persistence is enabled, and
+    must not be mutated once set. Persisted writes are write-behind: set only
+    records the entry, and a background writer thread stores every entry set
+    since its last pass in a single transaction.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl_seconds: float,
+        max_entries: int,
+        path: Optional[str] = None,
+    ):
+        """Initialize the cache and load persisted entries if a path is given."""
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._pending: Dict[Hashable, tuple] = {}
+        self._flush_scheduled = False
+        self.persisted = 0
+        if path:
+            self._open(path)
+
+    def _open(self, path: str):
+        try:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS cache '
+                '(name TEXT, key TEXT, value TEXT, expires_at REAL, PRIMARY KEY (name, key))'
+            )
+            now = time.time()
+            self._db.execute('DELETE FROM cache WHERE expires_at <= ?', (now,))
+            rows = self._db.execute(
+                'SELECT key, value, expires_at FROM cache WHERE name = ? '
+                'ORDER BY expires_at DESC LIMIT ?',
+                (self.name, self.max_entries),
+            ).fetchall()
+            self._db.commit()
+            # Oldest first so the most recently written entries end up most recently used
+            for key, value, expires_at in reversed(rows):
+                self._entries[key] = (json.loads(value), expires_at)
+            logger.debug(f'Loaded {len(rows)} {self.name} cache entries from {path}')
+        except sqlite3.Error as e:
+            logger.error(f'Failed to open {self.name} cache at {path}: {str(e)}')
+            self._db = None
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Store a value, evicting the least recently used entries when full."""
+        expires_at = time.time() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            self._store(key, value, expires_at)
+
+    def set_if_absent(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> bool:
+        """Store a value unless the key holds an unexpired entry; returns True if stored.
+
+        The check and the store happen under one lock, so a concurrent set is
+        never overwritten.
+        """
+        now = time.time()
+        expires_at = now + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                return False
+            self._store(key, value, expires_at)
+            return True
+
+    def _store(self, key: Hashable, value: Any, expires_at: float):
+        # Callers hold self._lock
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        if self._db is not None:
+            self._pending[key] = (value, expires_at)
+            if not self._flush_scheduled:
+                self._flush_scheduled = True
+                _writer.submit(self._write_pending)
+
+    def _write_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flush_scheduled = False
+        rows = []
+        for key, (value, expires_at) in pending.items():
+            try:
+                rows.append((self.name, key, json.dumps(value), expires_at))
+            except TypeError as e:
+                logger.warning(f'Failed to persist {self.name} cache entry: {str(e)}')
+        try:
+            self._db.executemany('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)', rows)
+            self._db.commit()
+            self.persisted += len(rows)
+        except sqlite3.Error as e:
+            logger.warning(f'Failed to persist {len(rows)} {self.name} cache entries: {str(e)}')
+
+    def _delete_persisted(self):
+        try:
+            self._db.execute('DELETE FROM cache WHERE name = ?', (self.name,))
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f'Failed to clear persisted {self.name} cache: {str(e)}')
+
+    def flush(self):
+        """Block until every persisted write and clear issued so far is on disk."""
+        if self._db is not None:
+            _writer.submit(lambda: None).result()
+
+    def clear(self):
+        """Remove every entry, including persisted ones."""
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+            if self._db is not None:
+                _writer.submit(self._delete_persisted)
+
+    def __len__(self) -> int:
+        """Return the number of entries, expired ones included until touched."""
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        """Return counters for the health endpoint."""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+            'persistent': self._db is not None,
+            'persisted': self.persisted,
+            'pending_writes': len(self._pending),
+        }
+
+
+class StaleWhileRevalidateCache(TTLCache):
+    """TTL cache with separate fresh and stale windows.
+
+    Entries younger than `fresh_seconds` are served as is. Older entries are
+    still served for another `stale_seconds`, but the caller is told they are
+    stale so it can refresh them in the background.
+    """
+
+    def __init__(self, name: str, fresh_seconds: float, stale_seconds: float, max_entries: int):
+        """Initialize the cache with its fresh and stale windows."""
+        super().__init__(name, ttl_seconds=fresh_seconds + stale_seconds, max_entries=max_entries)
+        self.fresh_seconds = fresh_seconds
+        self.stale_hits = 0
+        self.seeded = 0
+        self.refreshes = 0
+        self._refreshing = set()
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Store a value that is fresh for `fresh_seconds`."""
+        super().set(key, {'value': value, 'fresh_until': time.time() + self.fresh_seconds})
+
+    def seed(self, key: Hashable, value: Any):
+        """Store a value that is already stale, unless the key is cached.
+
+        Used for partial data taken from other responses: it is good enough to
+        answer immediately but should be replaced by a real lookup, and never
+        replaces one, even one stored concurrently.
+        """
+        if self.set_if_absent(key, {'value': value, 'fresh_until': 0}):
+            with self._lock:
+                self.seeded += 1
+
+    def lookup(self, key: Hashable) -> Tuple[Optional[Any], bool]:
+        """Return (value, is_fresh); value is None on a miss."""
+        entry = self.get(key)
+        if entry is None:
+            return None, False
+        fresh = entry['fresh_until'] > time.time()
+        if not fresh:
+            self.stale_hits += 1
+        return entry['value'], fresh
+
+    def begin_refresh(self, key: Hashable) -> bool:
+        """Mark a key as being refreshed; False if a refresh is already running."""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            self.refreshes += 1
+            return True
+
+    def end_refresh(self, key: Hashable):
+        """Clear the refresh mark set by begin_refresh."""
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def stats(self) -> Dict:
+        """Return counters for the health endpoint."""
+        stats = super().stats()
+        stats.update(
+            {
+                'stale_hits': self.stale_hits,
+                'seeded': self.seeded,
+                'refreshes': self.refreshes,
+                'refreshing': len(self._refreshing),
+            }
+        )
+        return stats
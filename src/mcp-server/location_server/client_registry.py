@@ -0,0 +1,148 @@
+import boto3
+import botocore.config
+import os
+import threading
+import time
+from loguru import logger
+from typing import Any, Dict, Optional, Tuple
+
+
+# Size of the urllib3 connection pool shared by all requests to one service
+MAX_POOL_CONNECTIONS = int(os.environ.get('GEO_MAX_POOL_CONNECTIONS', 50))
+
+# Attempts botocore makes per call; throttling, connection, timeout and 5xx retries are
+# done by the geo executor through its rate limiter, so botocore does not retry by default
+BOTOCORE_MAX_ATTEMPTS = int(os.environ.get('GEO_BOTOCORE_MAX_ATTEMPTS', 1))
+
+# Rebuild clients after this many seconds (0 disables age based refresh)
+CLIENT_MAX_AGE_SECONDS = float(os.environ.get('GEO_CLIENT_MAX_AGE_SECONDS', 0))
+
+
+def _credential_fingerprint() -> Tuple[Optional[str], ...]:
+    """Return the environment values that a client was built from.
+
+    Static credentials injected through the environment are the only ones boto3
+    does not refresh on its own, so a change in any of them forces a rebuild.
+    """
+    return (
+        os.environ.get('AWS_REGION', 'us-east-1'),
+        os.environ.get('AWS_ACCESS_KEY_ID'),
+        os.environ.get('AWS_SECRET_ACCESS_KEY'),
+        os.environ.get('AWS_SESSION_TOKEN'),
+    )
+
+
+class GeoClientRegistry:
+    """Process-wide, lazily initialized registry of Amazon Location clients.
+
+    boto3 clients are thread safe, so a single client per service is shared by
+    every tool call. This keeps the TLS connection pool warm instead of paying
+    for credential resolution and a new handshake on each request.
+    """
+
+    def __init__(self, max_pool_connections: int = MAX_POOL_CONNECTIONS):
+        """Initialize an empty registry."""
+        self.max_pool_connections = max_pool_connections
+        self._lock = threading.Lock()
+        self._clients: Dict[str, Any] = {}
+        self._created_at: Dict[str, float] = {}
+        self._fingerprint = None
+        self._overrides: Dict[str, Any] = {}
+        self.builds = 0
+
+    def _build_client(self, service: str):
+        region, aws_access_key, aws_secret_key, aws_session_token = _credential_fingerprint()
+        config = botocore.config.Config(
+            connect_timeout=15,
+            read_timeout=15,
+            retries={'mode': 'standard', 'total_max_attempts': BOTOCORE_MAX_ATTEMPTS},
+            max_pool_connections=self.max_pool_connections,
+        )
+        if aws_access_key and aws_secret_key:
+            client_args = {
+                'aws_access_key_id': aws_access_key,
+                'aws_secret_access_key': aws_secret_key,
+                'region_name': region,
+                'config': config,
+            }
+            if aws_session_token:
+                client_args['aws_session_token'] = aws_session_token
+            client = boto3.session.Session().client(service, **client_args)
+        else:
+            client = boto3.session.Session().client(service, region_name=region, config=config)
+        self.builds += 1
+        logger.debug(f'Amazon {service} client initialized for region {region}')
+        return client
+
+    def _is_stale(self, service: str) -> bool:
+        if CLIENT_MAX_AGE_SECONDS <= 0:
+            return False
+        return time.monotonic() - self._created_at.get(service, 0) > CLIENT_MAX_AGE_SECONDS
+
+    def get(self, service: str):
+        """Return the shared client for a service, creating it on first use.
+
+        Returns None if the client cannot be created, mirroring the behaviour
+        of the original per-call wrappers.
+        """
+        override = self._overrides.get(service)
+        if override is not None:
+            return override
+        fingerprint = _credential_fingerprint()
+        client = self._clients.get(service)
+        if client is not None and fingerprint == self._fingerprint and not self._is_stale(service):
+            return client
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                if self._fingerprint is not None:
+                    logger.info('AWS credentials changed, rebuilding Amazon Location clients')
+                self._clients.clear()
+                self._fingerprint = fingerprint
+            client = self._clients.get(service)
+            if client is None or self._is_stale(service):
+                try:
+                    client = self._build_client(service)
+                except Exception as e:
+                    logger.error(f'Failed to initialize Amazon {service} client: {str(e)}')
+                    return None
+                self._clients[service] = client
+                self._created_at[service] = time.monotonic()
+            return client
+
+    def register(self, service: str, client):
+        """Install a client object for a service in place of the boto3 one.
+
+        Pass None to go back to the boto3 client.
+        """
+        if client is None:
+            self._overrides.pop(service, None)
+        else:
+            self._overrides[service] = client
+
+    def refresh(self):
+        """Drop all cached clients so the next call rebuilds them."""
+        with self._lock:
+            self._clients.clear()
+            self._created_at.clear()
+            self._fingerprint = None
+
+    def warm_up(self, services=('geo-places', 'geo-routes')):
+        """Create clients ahead of the first request.
+
+        Resolving credentials and loading the service model takes a few hundred
+        milliseconds, which would otherwise land on the first tool call.
+        """
+        for service in services:
+            self.get(service)
+
+    def stats(self) -> Dict:
+        """Return registry state for the health endpoint."""
+        return {
+            'services': sorted(self._clients),
+            'builds': self.builds,
+            'max_pool_connections': self.max_pool_connections,
+        }
+
+
+# Shared by every client wrapper in the process
+registry = GeoClientRegistry()
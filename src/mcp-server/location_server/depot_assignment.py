@@ -0,0 +1,50 @@
+import numpy as np
+
+
+# Slack on capacity comparisons so float sums of demands do not reject exact fits
+EPSILON = 1e-6
+
+
+def assign_by_regret(
+    cost: np.ndarray, demands: np.ndarray, capacities: np.ndarray, max_cost: float = np.inf
+) -> np.ndarray:
+    """Assign orders to depots with the regret heuristic under per-depot capacities.
+
+    cost is (depots, orders), demands (orders, k) and capacities (depots, k);
+    costs at or above max_cost mean the depot cannot serve the order. Each
+    round computes, for every pending order, its cheapest depot that still has
+    room and its regret (how much more the second cheapest would cost). Orders
+    are then assigned to their cheapest depot by decreasing regret, so the
+    orders with the most to lose go first. An order whose depot filled up
+    during the round waits for the next one, which recomputes the regrets
+    against the remaining capacities. Returns the depot index of each order,
+    -1 for orders no depot can serve.
+    """
+    depots, orders = cost.shape
+    assignment = np.full(orders, -1, dtype=np.int64)
+    remaining = np.asarray(capacities, dtype=np.float64).copy()
+    demands = np.asarray(demands, dtype=np.float64)
+    pending = np.flatnonzero((cost < max_cost).any(axis=0))
+    while len(pending):
+        fits = (demands[None, pending] <= remaining[:, None] + EPSILON).all(axis=2)
+        masked = np.where(fits & (cost[:, pending] < max_cost), cost[:, pending], np.inf)
+        if depots > 1:
+            cheapest = np.partition(masked, 1, axis=0)[:2]
+        else:
+            cheapest = np.vstack([masked, np.full(len(pending), np.inf)])
+        feasible = np.isfinite(cheapest[0])
+        pending, masked, cheapest = pending[feasible], masked[:, feasible], cheapest[:, feasible]
+        if not len(pending):
+            break
+        best = np.argmin(masked, axis=0)
+        # Orders with a single feasible depot have infinite regret and go first
+        regret = np.where(np.isfinite(cheapest[1]), cheapest[1] - cheapest[0], np.inf)
+        assigned = np.zeros(len(pending), dtype=bool)
+        for k in np.lexsort((cheapest[0], -regret)):
+            order, depot = pending[k], best[k]
+            if (demands[order] <= remaining[depot] + EPSILON).all():
+                remaining[depot] -= demands[order]
+                assignment[order] = depot
+                assigned[k] = True
+        pending = pending[~assigned]
+    return assignment
@@ -0,0 +1,476 @@
+import botocore.exceptions
+import numpy as np
+import os
+import random
+import threading
+import time
+from caches import normalize_query
+from great_circle import haversine_matrix, haversine_meters, nearest_indices
+from polyline import encode_flexible_polyline
+from typing import Dict, List, Optional
+
+
+# Mean added latency per call, its random spread, and the share of calls that fail
+FAKE_GEO_LATENCY_MS = float(os.environ.get('FAKE_GEO_LATENCY_MS', 0))
+FAKE_GEO_LATENCY_JITTER_MS = float(os.environ.get('FAKE_GEO_LATENCY_JITTER_MS', 0))
+FAKE_GEO_ERROR_RATE = float(os.environ.get('FAKE_GEO_ERROR_RATE', 0))
+
+# Error code raised by injected failures, e.g. ThrottlingException or InternalServerException
+FAKE_GEO_ERROR_CODE = os.environ.get('FAKE_GEO_ERROR_CODE', 'ThrottlingException')
+
+# Dataset size and the seed that makes datasets, latencies and errors reproducible
+FAKE_GEO_PLACES_PER_CITY = int(os.environ.get('FAKE_GEO_PLACES_PER_CITY', 400))
+FAKE_GEO_SEED = int(os.environ.get('FAKE_GEO_SEED', 42))
+
+# (city, state, longitude, latitude, spread in meters)
+CITIES = (
+    ('São Paulo', 'SP', -46.6333, -23.5505, 12000),
+    ('Guarulhos', 'SP', -46.5333, -23.4628, 5000),
+    ('Campinas', 'SP', -47.0626, -22.9056, 6000),
+    ('Santos', 'SP', -46.3336, -23.9608, 4000),
+    ('São Bernardo do Campo', 'SP', -46.5650, -23.6914, 4000),
+    ('Rio de Janeiro', 'RJ', -43.1729, -22.9068, 12000),
+    ('Niterói', 'RJ', -43.1036, -22.8832, 4000),
+    ('Belo Horizonte', 'MG', -43.9378, -19.9208, 8000),
+    ('Curitiba', 'PR', -49.2731, -25.4284, 7000),
+    ('Porto Alegre', 'RS', -51.2177, -30.0346, 7000),
+    ('Florianópolis', 'SC', -48.5482, -27.5949, 5000),
+    ('Salvador', 'BA', -38.5014, -12.9714, 8000),
+    ('Recife', 'PE', -34.8770, -8.0476, 6000),
+    ('Fortaleza', 'CE', -38.5267, -3.7319, 7000),
+    ('Brasília', 'DF', -47.8825, -15.7942, 9000),
+    ('Goiânia', 'GO', -49.2643, -16.6869, 6000),
+    ('Manaus', 'AM', -60.0217, -3.1190, 7000),
+    ('Belém', 'PA', -48.4902, -1.4558, 6000),
+)
+
+# (category, name prefixes, share of places that are open 24 h)
+CATEGORIES = (
+    ('Pharmacy', ('Drogaria', 'Farmácia'), 0.3),
+    ('Supermarket', ('Supermercado', 'Mercado'), 0.1),
+    ('Restaurant', ('Restaurante', 'Cantina'), 0.0),
+    ('Bakery', ('Padaria', 'Panificadora'), 0.0),
+    ('Gas Station', ('Posto', 'Auto Posto'), 0.5),
+    ('Hospital', ('Hospital', 'Pronto Socorro'), 1.0),
+    ('Warehouse', ('Centro de Distribuição', 'CD'), 0.2),
+    ('Post Office', ('Agência dos Correios', 'Correios'), 0.0),
+)
+
+SURNAMES = ('Silva', 'Santos', 'Oliveira', 'Souza', 'Costa', 'Pereira', 'Almeida', 'Ferreira')
+STREETS = ('Rua das Flores', 'Avenida Brasil', 'Rua São João', 'Avenida Paulista',
+           'Rua XV de Novembro', 'Avenida Getúlio Vargas', 'Rua Sete de Setembro',
+           'Avenida Presidente Vargas', 'Rua Tiradentes', 'Avenida Santos Dumont')
+DISTRICTS = ('Centro', 'Jardim América', 'Vila Nova', 'Boa Vista', 'Santa Cecília',
+             'Bela Vista', 'Liberdade', 'Industrial')
+
+# (weekday codes, opening time, hours open) of the usual trading patterns
+SCHEDULES = (
+    ('MO,TU,WE,TH,FR', 'T080000', 10, 'SA', 'T080000', 5),
+    ('MO,TU,WE,TH,FR,SA', 'T070000', 14, 'SU', 'T080000', 6),
+    ('MO,TU,WE,TH,FR', 'T090000', 9, None, None, 0),
+    ('TU,WE,TH,FR,SA,SU', 'T110000', 12, None, None, 0),
+)
+
+# Average door-to-door speeds in m/s and the ratio of road to straight-line distance; the
+# tools advertise 'Walking' and the routes API calls it 'Pedestrian', so both are listed
+SPEEDS = {
+    'Car': 8.3,
+    'Truck': 6.9,
+    'Scooter': 7.0,
+    'Bicycle': 4.2,
+    'Walking': 1.3,
+    'Pedestrian': 1.3,
+}
+DETOUR_FACTOR = 1.3
+
+
+def _opening_hours(rng: random.Random, always_open_share: float) -> List[Dict]:
+    if rng.random() < always_open_share:
+        return [
+            {
+                'Display': ['Aberto 24 horas'],
+                'OpenNow': True,
+                'Components': [
+                    {
+                        'OpenTime': 'T000000',
+                        'OpenDuration': 'PT24H00M',
+                        'Recurrence': 'FREQ:DAILY;BYDAY:MO,TU,WE,TH,FR,SA,SU',
+                    }
+                ],
+            }
+        ]
+    days, opens, hours, extra_days, extra_opens, extra_hours = rng.choice(SCHEDULES)
+    components = [
+        {'OpenTime': opens, 'OpenDuration': f'PT{hours}H00M', 'Recurrence': f'FREQ:DAILY;BYDAY:{days}'}
+    ]
+    display = [f'{days}: {opens[1:3]}:00-{int(opens[1:3]) + hours:02d}:00']
+    if extra_days:
+        components.append(
+            {
+                'OpenTime': extra_opens,
+                'OpenDuration': f'PT{extra_hours}H00M',
+                'Recurrence': f'FREQ:DAILY;BYDAY:{extra_days}',
+            }
+        )
+        display.append(
+            f'{extra_days}: {extra_opens[1:3]}:00-{int(extra_opens[1:3]) + extra_hours:02d}:00'
+        )
+    # OpenNow is filled in per request from the components
+    return [{'Display': display, 'OpenNow': False, 'Components': components}]
+
+
+def build_dataset(places_per_city: int = FAKE_GEO_PLACES_PER_CITY, seed: int = FAKE_GEO_SEED):
+    """Return (places, positions) of a deterministic synthetic Brazilian place dataset.
+
+    Places are scattered around each city center with a normal spread and
+    carry the fields search_text and get_place return: Title, Address,
+    Position, Categories, Contacts and OpeningHours with Components.
+    """
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    places = []
+    positions = []
+    for city, state, lon, lat, spread in CITIES:
+        offsets = np_rng.normal(0, spread, (places_per_city, 2))
+        for i in range(places_per_city):
+            category, prefixes, always_open = rng.choice(CATEGORIES)
+            position = [
+                round(lon + float(offsets[i, 0]) / (111320.0 * float(np.cos(np.radians(lat)))), 6),
+                round(lat + float(offsets[i, 1]) / 111320.0, 6),
+            ]
+            district = rng.choice(DISTRICTS)
+            street = f'{rng.choice(STREETS)}, {rng.randint(10, 3000)}'
+            postal_code = f'{rng.randint(10000, 99999)}-{rng.randint(0, 999):03d}'
+            places.append(
+                {
+                    'PlaceId': f'fake-{normalize_query(city).replace(" ", "-")}-{i}',
+                    'PlaceType': 'PointOfInterest',
+                    'Title': f'{rng.choice(prefixes)} {rng.choice(SURNAMES)} {district}',
+                    'Address': {
+                        'Label': f'{street} - {district}, {city} - {state}, {postal_code}, Brasil',
+                        'Country': {'Code2': 'BR', 'Code3': 'BRA', 'Name': 'Brasil'},
+                        'Region': {'Code': state, 'Name': state},
+                        'Locality': city,
+                        'District': district,
+                        'PostalCode': postal_code,
+                        'Street': street,
+                    },
+                    'Position': position,
+                    'Categories': [{'Id': normalize_query(category), 'Name': category}],
+                    'Contacts': {
+                        'Phones': [{'Value': f'+55 11 {rng.randint(2000, 9999)}-{rng.randint(0, 9999):04d}'}]
+                    },
+                    'OpeningHours': _opening_hours(rng, always_open),
+                    'TimeZone': {'Name': 'America/Sao_Paulo', 'Offset': '-03:00', 'OffsetSeconds': -10800},
+                }
+            )
+            positions.append(position)
+    return places, np.array(positions, dtype=np.float64)
+
+
+class FakeGeoBackend:
+    """Shared dataset, latency and error injection behind the fake geo clients."""
+
+    def __init__(
+        self,
+        latency_ms: float = FAKE_GEO_LATENCY_MS,
+        jitter_ms: float = FAKE_GEO_LATENCY_JITTER_MS,
+        error_rate: float = FAKE_GEO_ERROR_RATE,
+        error_code: str = FAKE_GEO_ERROR_CODE,
+        places_per_city: int = FAKE_GEO_PLACES_PER_CITY,
+        seed: int = FAKE_GEO_SEED,
+    ):
+        """Build the dataset and the random source for latencies and errors."""
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.places, self.positions = build_dataset(places_per_city, seed)
+        # Index of every place by PlaceId, so get_place is a dict lookup
+        self.by_id = {place['PlaceId']: index for index, place in enumerate(self.places)}
+        self.keywords = [
+            normalize_query(f'{p["Title"]} {p["Categories"][0]["Name"]} {p["Address"]["Locality"]}')
+            for p in self.places
+        ]
+        self.calls: Dict[str, int] = {}
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def call(self, operation: str):
+        """Count a call, sleep for its latency and raise an injected error if drawn."""
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+            delay = max(0.0, self._random.gauss(self.latency_ms, self.jitter_ms)) / 1000
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if delay:
+            time.sleep(delay)
+        if failed:
+            status = 429 if 'Throttl' in self.error_code else 500
+            raise botocore.exceptions.ClientError(
+                {
+                    'Error': {'Code': self.error_code, 'Message': 'Injected by the fake geo backend'},
+                    'ResponseMetadata': {'HTTPStatusCode': status},
+                },
+                operation,
+            )
+
+    def matches(self, query: Optional[str]) -> np.ndarray:
+        """Return the indices of places whose title, category or city contains every query word."""
+        words = normalize_query(query or '').split()
+        if not words:
+            return np.arange(len(self.places))
+        return np.array(
+            [i for i, text in enumerate(self.keywords) if all(w in text for w in words)],
+            dtype=np.int64,
+        )
+
+    def result_item(self, index: int, origin=None) -> Dict:
+        """Return a copy of a place with OpenNow set for the current time and its Distance."""
+        place = self.places[index]
+        item = {**place, 'OpeningHours': [dict(entry) for entry in place['OpeningHours']]}
+        for entry in item['OpeningHours']:
+            entry['OpenNow'] = is_open_now(entry['Components'])
+        if origin is not None:
+            item['Distance'] = int(haversine_meters(origin, [place['Position']])[0])
+        return item
+
+
+def is_open_now(components: List[Dict]) -> bool:
+    """Evaluate fake OpeningHours components at the current time in Brasília."""
+    local = time.gmtime(time.time() - 3 * 3600)
+    minute = local.tm_hour * 60 + local.tm_min
+    today = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')[local.tm_wday]
+    yesterday = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')[local.tm_wday - 1]
+    for component in components:
+        start = int(component['OpenTime'][1:3]) * 60 + int(component['OpenTime'][3:5])
+        hours = int(component['OpenDuration'][2:].split('H')[0])
+        days = component['Recurrence'].split('BYDAY:')[-1].split(',')
+        if today in days and start <= minute < start + hours * 60:
+            return True
+        if yesterday in days and minute < start + hours * 60 - 24 * 60:
+            return True
+    return False
+
+
+class FakeGeoPlacesClient:
+    """Deterministic stand-in for the boto3 geo-places client."""
+
+    def __init__(self, backend: FakeGeoBackend):
+        """Serve places from a shared fake backend."""
+        self.backend = backend
+
+    def geocode(self, QueryText: str = '', MaxResults: int = 1, **params) -> Dict:
+        self.backend.call('geocode')
+        text = normalize_query(QueryText)
+        for city, state, lon, lat, _ in CITIES:
+            if normalize_query(city) in text:
+                return {
+                    'ResultItems': [
+                        {
+                            'PlaceId': f'fake-city-{normalize_query(city).replace(" ", "-")}',
+                            'PlaceType': 'Locality',
+                            'Title': f'{city}, {state}, Brasil',
+                            'Address': {'Label': f'{city} - {state}, Brasil', 'Locality': city},
+                            'Position': [lon, lat],
+                        }
+                    ]
+                }
+        found = self.backend.matches(QueryText)
+        if not len(found):
+            return {'ResultItems': []}
+        return {'ResultItems': [self.backend.result_item(int(i)) for i in found[:MaxResults]]}
+
+    def search_text(
+        self,
+        QueryText: str = '',
+        MaxResults: int = 10,
+        BiasPosition: Optional[list] = None,
+        Filter: Optional[Dict] = None,
+        **params,
+    ) -> Dict:
+        self.backend.call('search_text')
+        # Words naming a city narrow the search to it instead of matching place text
+        text = normalize_query(QueryText)
+        localities = set()
+        for city, *_ in CITIES:
+            if normalize_query(city) in text:
+                text = text.replace(normalize_query(city), ' ')
+                localities.add(city)
+        found = self.backend.matches(text)
+        if not len(found):
+            found = self.backend.matches(None)
+        if localities:
+            found = np.array(
+                [i for i in found if self.backend.places[i]['Address']['Locality'] in localities],
+                dtype=np.int64,
+            )
+        positions = self.backend.positions[found]
+        center = BiasPosition
+        if Filter and 'Circle' in Filter:
+            center = Filter['Circle']['Center']
+            inside = haversine_meters(center, positions) <= Filter['Circle']['Radius']
+            found, positions = found[inside], positions[inside]
+        elif Filter and 'BoundingBox' in Filter:
+            west, south, east, north = Filter['BoundingBox']
+            inside = (
+                (positions[:, 0] >= west)
+                & (positions[:, 0] <= east)
+                & (positions[:, 1] >= south)
+                & (positions[:, 1] <= north)
+            )
+            found, positions = found[inside], positions[inside]
+            center = [(west + east) / 2, (south + north) / 2]
+        if center is not None and len(found):
+            found = found[nearest_indices(haversine_meters(center, positions), MaxResults)]
+        return {
+            'ResultItems': [self.backend.result_item(int(i), center) for i in found[:MaxResults]]
+        }
+
+    def search_nearby(
+        self, QueryPosition: list, MaxResults: int = 10, QueryRadius: int = 1000, **params
+    ) -> Dict:
+        self.backend.call('search_nearby')
+        distances = haversine_meters(QueryPosition, self.backend.positions)
+        nearest = nearest_indices(distances, MaxResults)
+        nearest = nearest[distances[nearest] <= QueryRadius]
+        return {
+            'ResultItems': [self.backend.result_item(int(i), QueryPosition) for i in nearest]
+        }
+
+    def get_place(self, PlaceId: str, **params) -> Dict:
+        self.backend.call('get_place')
+        index = self.backend.by_id.get(PlaceId)
+        if index is None:
+            raise botocore.exceptions.ClientError(
+                {
+                    'Error': {'Code': 'ResourceNotFoundException', 'Message': 'Place not found'},
+                    'ResponseMetadata': {'HTTPStatusCode': 404},
+                },
+                'GetPlace',
+            )
+        return self.backend.result_item(index)
+
+    def reverse_geocode(self, QueryPosition: list, **params) -> Dict:
+        self.backend.call('reverse_geocode')
+        index = int(np.argmin(haversine_meters(QueryPosition, self.backend.positions)))
+        item = self.backend.result_item(index, QueryPosition)
+        return {
+            'ResultItems': [item],
+            'Place': {
+                'Label': item['Address']['Label'],
+                'Title': item['Title'],
+                'Geometry': {'Point': item['Position']},
+                'Categories': item['Categories'],
+                'Address': item['Address'],
+            },
+        }
+
+
+class FakeGeoRoutesClient:
+    """Stand-in for the boto3 geo-routes client with haversine-based route metrics.
+
+    Road distance is the great-circle distance times DETOUR_FACTOR and duration
+    follows a fixed average speed per travel mode.
+    """
+
+    def __init__(self, backend: FakeGeoBackend):
+        """Share latency and error injection with the places client."""
+        self.backend = backend
+
+    @staticmethod
+    def metrics(distance_m, travel_mode: str):
+        road = np.asarray(distance_m) * DETOUR_FACTOR
+        speed = SPEEDS.get(travel_mode, SPEEDS['Car'])
+        return np.round(road).astype(np.int64), np.round(road / speed).astype(np.int64)
+
+    def calculate_routes(
+        self,
+        Origin: list,
+        Destination: list,
+        TravelMode: str = 'Car',
+        LegGeometryFormat: Optional[str] = None,
+        **params,
+    ) -> Dict:
+        self.backend.call('calculate_routes')
+        straight = float(haversine_meters(Origin, [Destination])[0])
+        distance, duration = self.metrics(straight, TravelMode)
+        leg = {
+            'TravelMode': TravelMode,
+            'VehicleLegDetails': {
+                'TravelSteps': [
+                    {'Distance': int(distance), 'Duration': int(duration), 'Type': 'Depart'},
+                    {'Distance': 0, 'Duration': 0, 'Type': 'Arrive'},
+                ]
+            },
+        }
+        if LegGeometryFormat == 'FlexiblePolyline':
+            # A gently curved line with a point about every 50 m
+            count = max(2, int(straight / 50))
+            t = np.linspace(0, 1, count)[:, None]
+            points = np.asarray(Origin) * (1 - t) + np.asarray(Destination) * t
+            bend = np.sin(np.pi * t[:, 0]) * 0.05 * (straight / 111320.0)
+            points[:, 0] += bend
+            leg['Geometry'] = {'Polyline': encode_flexible_polyline(points)}
+        return {
+            'Routes': [
+                {'Distance': int(distance), 'DurationSeconds': int(duration), 'Legs': [leg]}
+            ]
+        }
+
+    def calculate_route_matrix(
+        self, Origins: list, Destinations: list, TravelMode: str = 'Car', **params
+    ) -> Dict:
+        self.backend.call('calculate_route_matrix')
+        straight = haversine_matrix(
+            [o['Position'] for o in Origins], [d['Position'] for d in Destinations]
+        )
+        distances, durations = self.metrics(straight, TravelMode)
+        return {
+            'RouteMatrix': [
+                [{'Distance': int(d), 'Duration': int(t)} for d, t in zip(drow, trow)]
+                for drow, trow in zip(distances, durations)
+            ]
+        }
+
+    def optimize_waypoints(
+        self,
+        Origin: list,
+        Destination: Optional[list] = None,
+        Waypoints: Optional[list] = None,
+        TravelMode: str = 'Car',
+        **params,
+    ) -> Dict:
+        self.backend.call('optimize_waypoints')
+        positions = [w['Position'] for w in Waypoints or []]
+        remaining = list(range(len(positions)))
+        current, order, straight = Origin, [], 0.0
+        # Nearest neighbour tour, good enough to exercise the server
+        while remaining:
+            distances = haversine_meters(current, [positions[i] for i in remaining])
+            k = int(np.argmin(distances))
+            straight += float(distances[k])
+            current = positions[remaining.pop(k)]
+            order.append(current)
+        if Destination is not None:
+            straight += float(haversine_meters(current, [Destination])[0])
+        distance, duration = self.metrics(straight, TravelMode)
+        return {
+            'Routes': [
+                {
+                    'Distance': int(distance),
+                    'DurationSeconds': int(duration),
+                    'Waypoints': [{'Position': p} for p in order],
+                }
+            ]
+        }
+
+
+def install_fake_backend(registry, backend: Optional[FakeGeoBackend] = None) -> FakeGeoBackend:
+    """Register fake geo-places and geo-routes clients in a client registry."""
+    backend = backend or FakeGeoBackend()
+    registry.register('geo-places', FakeGeoPlacesClient(backend))
+    registry.register('geo-routes', FakeGeoRoutesClient(backend))
+    return backend
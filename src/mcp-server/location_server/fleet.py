@@ -0,0 +1,308 @@
+from datetime import datetime, timedelta, tzinfo
+from typing import Dict, List, Optional
+
+
+# Keys under which records from the DynamoDB tables keep their coordinates
+POSITION_KEYS = (
+    'position',
+    'coordenadas',
+    'coordinates',
+    'localizacao_atual',
+    'localizacao_entrega',
+    'localizacao',
+)
+
+# Keys that identify records from the DynamoDB tables, in order of preference
+ID_KEYS = ('id', 'veiculo_id', 'entrega_id', 'pedido_id', 'cliente_id', 'produto_id')
+
+
+def unwrap_attribute_values(value):
+    """Convert DynamoDB AttributeValue JSON ({'S': ...}, {'N': ...}, {'M': ...}) to plain values.
+
+    Plain values pass through unchanged, so both raw scan output and simplified
+    items are accepted.
+    """
+    if isinstance(value, dict):
+        if len(value) == 1:
+            tag, inner = next(iter(value.items()))
+            if tag == 'S':
+                return inner
+            if tag == 'N':
+                return float(inner)
+            if tag == 'BOOL':
+                return bool(inner)
+            if tag == 'NULL':
+                return None
+            if tag == 'M':
+                return {k: unwrap_attribute_values(v) for k, v in inner.items()}
+            if tag == 'L':
+                return [unwrap_attribute_values(v) for v in inner]
+            if tag in ('SS', 'NS'):
+                return [float(v) if tag == 'NS' else v for v in inner]
+        return {k: unwrap_attribute_values(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [unwrap_attribute_values(v) for v in value]
+    return value
+
+
+def position_of(value) -> Optional[List[float]]:
+    """Return [longitude, latitude] from a position pair, a coordinates dict or a record."""
+    if isinstance(value, (list, tuple)) and len(value) == 2:
+        try:
+            return [float(value[0]), float(value[1])]
+        except (TypeError, ValueError):
+            return None
+    if isinstance(value, dict):
+        if 'longitude' in value and 'latitude' in value:
+            return [float(value['longitude']), float(value['latitude'])]
+        for key in POSITION_KEYS:
+            if value.get(key) is not None:
+                return position_of(value[key])
+    return None
+
+
+def record_id(item: Dict, default):
+    """Return the identifier of a record, or default if it has none."""
+    for key in ID_KEYS:
+        if item.get(key) is not None:
+            return item[key]
+    return default
+
+
+def order_id(item: Dict, default):
+    """Return the identifier of an order record (entrega, pedido or plain stop).
+
+    Entregas also carry a veiculo_id, which must not become the order id, so
+    id, entrega_id and pedido_id come before the generic record_id lookup.
+    """
+    for key in ('id', 'entrega_id', 'pedido_id'):
+        if item.get(key) is not None:
+            return item[key]
+    return record_id(item, default)
+
+
+def order_position(item: Dict) -> Optional[List[float]]:
+    """Return where an order must be delivered.
+
+    Entregas are located at their destino, not at the package's
+    localizacao_atual; then localizacao_entrega, then the record's own position.
+    """
+    return (
+        position_of(item.get('destino'))
+        or position_of(item.get('localizacao_entrega'))
+        or position_of(item)
+    )
+
+
+def parse_candidates(items: list) -> List[Dict]:
+    """Normalize arbitrary located records (vehicles, customers, orders) into id and position.
+
+    Vehicles are located by localizacao_atual.
+    """
+    candidates = []
+    for index, item in enumerate(unwrap_attribute_values(items)):
+        position = position_of(item)
+        if position is None:
+            raise ValueError(f'candidates[{index}] has no position or coordenadas')
+        label = record_id(item, index) if isinstance(item, dict) else index
+        candidates.append({'id': label, 'position': position})
+    return candidates
+
+
+def _number(value, default: float) -> float:
+    return default if value is None else float(value)
+
+
+def parse_vehicles(items: list) -> List[Dict]:
+    """Normalize mcp-veiculos items into id, depot, depot_name, position, capacity and status.
+
+    position is localizacao_atual, or the depot when it is missing. capacity is
+    [capacidade_kg, capacidade_m3]; a missing capacity is unlimited.
+    """
+    vehicles = []
+    for index, item in enumerate(unwrap_attribute_values(items)):
+        if not isinstance(item, dict):
+            raise ValueError(f'vehicles[{index}] must be an object')
+        base = item.get('base_operacional') or {}
+        depot = position_of(base) or position_of(item.get('depot'))
+        if depot is None:
+            raise ValueError(f'vehicles[{index}] has no base_operacional coordinates')
+        vehicles.append(
+            {
+                'id': record_id(item, index),
+                'depot': depot,
+                'depot_name': base.get('nome') if isinstance(base, dict) else None,
+                'position': position_of(item.get('localizacao_atual')) or depot,
+                'capacity': [
+                    _number(item.get('capacidade_kg'), float('inf')),
+                    _number(item.get('capacidade_m3'), float('inf')),
+                ],
+                'status': item.get('status'),
+            }
+        )
+    return vehicles
+
+
+def parse_vehicle_trip(item) -> Dict:
+    """Normalize one mcp-veiculos item on a trip into id, position, destination and status.
+
+    position is localizacao_atual and destination destino_atual; both are required.
+    """
+    item = unwrap_attribute_values(item)
+    if not isinstance(item, dict):
+        raise ValueError('vehicle must be an object')
+    position = position_of(item.get('localizacao_atual')) or position_of(item.get('position'))
+    if position is None:
+        raise ValueError('vehicle has no localizacao_atual coordinates')
+    destination = position_of(item.get('destino_atual')) or position_of(item.get('destination'))
+    if destination is None:
+        raise ValueError('vehicle has no destino_atual coordinates')
+    return {
+        'id': record_id(item, None),
+        'position': position,
+        'destination': destination,
+        'status': item.get('status'),
+    }
+
+
+def parse_tracking_points(items: list) -> List[Dict]:
+    """Flatten positions, tracking events and entregas into one list of located points.
+
+    An item with a historico list contributes one point per event, labelled
+    with the item's order_id, the event index, its status and data; any other
+    item is a single point with its order_id (its index for bare positions).
+    """
+    points = []
+    for index, item in enumerate(unwrap_attribute_values(items)):
+        events = item.get('historico') if isinstance(item, dict) else None
+        if isinstance(events, list):
+            label = order_id(item, index)
+            for number, event in enumerate(events):
+                position = position_of(event)
+                if position is None:
+                    raise ValueError(f'points[{index}].historico[{number}] has no coordenadas')
+                points.append(
+                    {
+                        'id': label,
+                        'event': number,
+                        'status': event.get('status'),
+                        'data': event.get('data'),
+                        'position': position,
+                    }
+                )
+            continue
+        position = position_of(item)
+        if position is None:
+            raise ValueError(f'points[{index}] has no position or coordenadas')
+        label = order_id(item, index) if isinstance(item, dict) else index
+        points.append({'id': label, 'position': position})
+    return points
+
+
+def parse_deliveries(items: list) -> List[Dict]:
+    """Normalize deliveries (or mcp-pedidos/mcp-entregas items) into id, position and demand.
+
+    demand is [peso_kg, volume_m3]; missing values count as zero. Ids and
+    positions follow order_id and order_position.
+    """
+    deliveries = []
+    for index, item in enumerate(unwrap_attribute_values(items)):
+        if not isinstance(item, dict):
+            raise ValueError(f'deliveries[{index}] must be an object')
+        position = order_position(item)
+        if position is None:
+            raise ValueError(f'deliveries[{index}] has no position, coordenadas or destino')
+        deliveries.append(
+            {
+                'id': order_id(item, index),
+                'position': position,
+                'demand': [
+                    _number(item.get('peso_kg', item.get('peso')), 0.0),
+                    _number(item.get('volume_m3'), 0.0),
+                ],
+            }
+        )
+    return deliveries
+
+
+def parse_depots(items: list) -> List[Dict]:
+    """Normalize depots into id and position, deduplicated.
+
+    Accepts mcp-veiculos items, whose base_operacional is used and named by
+    its nome, or depot records with their own position or coordenadas.
+    """
+    depots, seen = [], set()
+    for index, item in enumerate(unwrap_attribute_values(items)):
+        base = item.get('base_operacional') if isinstance(item, dict) else None
+        record = base if isinstance(base, dict) else item
+        position = position_of(record)
+        if position is None:
+            raise ValueError(f'bases[{index}] has no base_operacional or coordenadas')
+        label = record.get('nome') if isinstance(record, dict) else None
+        if label is None:
+            label = record_id(record, index) if isinstance(record, dict) else index
+        key = (label, round(position[0], 5), round(position[1], 5))
+        if key not in seen:
+            seen.add(key)
+            depots.append({'id': label, 'position': position})
+    return depots
+
+
+def _datetime(value, tz: tzinfo, end_of_day: bool = False) -> Optional[datetime]:
+    """Parse an ISO 8601 value; naive values are in tz, and a bare date means its start or end."""
+    if value is None or value == '':
+        return None
+    parsed = datetime.fromisoformat(str(value))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=tz)
+    if end_of_day and len(str(value).strip()) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def parse_timed_stops(items: list, departure: datetime, service_minutes: float) -> List[Dict]:
+    """Normalize entregas/pedidos into id, position, demand, earliest, latest and service_minutes.
+
+    latest comes from latest/janela_fim, else data_prevista (entregas), else
+    data_pedido + prazo_entrega days (pedidos, counted from the departure date
+    without data_pedido); a bare date allows the whole day. earliest comes from
+    earliest/janela_inicio. Missing limits are None. Ids and positions follow
+    order_id and order_position.
+    """
+    tz = departure.tzinfo
+    stops = []
+    for index, item in enumerate(unwrap_attribute_values(items)):
+        if not isinstance(item, dict):
+            raise ValueError(f'stops[{index}] must be an object')
+        position = order_position(item)
+        if position is None:
+            raise ValueError(f'stops[{index}] has no position, coordenadas or destino')
+        try:
+            earliest = _datetime(item.get('earliest', item.get('janela_inicio')), tz)
+            latest = _datetime(
+                item.get('latest', item.get('janela_fim', item.get('data_prevista'))),
+                tz,
+                end_of_day=True,
+            )
+            if latest is None and item.get('prazo_entrega') is not None:
+                ordered = _datetime(item.get('data_pedido'), tz) or departure
+                day = ordered.replace(hour=0, minute=0, second=0, microsecond=0)
+                latest = day + timedelta(days=int(float(item['prazo_entrega'])) + 1)
+        except ValueError as e:
+            raise ValueError(f'stops[{index}] has an invalid date: {str(e)}')
+        stops.append(
+            {
+                'id': order_id(item, index),
+                'position': position,
+                'demand': [
+                    _number(item.get('peso_kg', item.get('peso')), 0.0),
+                    _number(item.get('volume_m3'), 0.0),
+                ],
+                'earliest': earliest,
+                'latest': latest,
+                'service_minutes': _number(
+                    item.get('service_minutes', item.get('tempo_servico_minutos')), service_minutes
+                ),
+            }
+        )
+    return stops
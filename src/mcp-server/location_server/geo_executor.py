@@ -0,0 +1,300 @@
+import asyncio
+import botocore.exceptions
+import contextvars
+import json
+import os
+import random
+import time
+import weakref
+from client_registry import registry
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from rate_limiter import BULK, INTERACTIVE, AdaptiveRateLimiter
+from typing import Dict, Optional
+
+
+# Worker threads dedicated to blocking Amazon Location calls
+GEO_EXECUTOR_WORKERS = int(os.environ.get('GEO_EXECUTOR_WORKERS', 32))
+
+# Maximum concurrent in-flight calls per API unless overridden below
+GEO_API_CONCURRENCY = int(os.environ.get('GEO_API_CONCURRENCY', 16))
+
+# Starting and maximum requests per second per API unless overridden below
+GEO_API_RATE = float(os.environ.get('GEO_API_RATE', 20))
+GEO_API_MAX_RATE = float(os.environ.get('GEO_API_MAX_RATE', 100))
+
+# Retries of a throttled, disconnected, timed out or 5xx-failed call, with jittered
+# exponential backoff
+GEO_MAX_RETRIES = int(os.environ.get('GEO_MAX_RETRIES', 3))
+GEO_RETRY_BASE_SECONDS = float(os.environ.get('GEO_RETRY_BASE_SECONDS', 0.2))
+
+# APIs that always use the bulk lane of the rate limiter
+GEO_BULK_APIS = ('geo-routes.calculate_route_matrix',)
+
+# Error codes Amazon Location uses when a request rate quota is exceeded
+THROTTLING_CODES = ('ThrottlingException', 'TooManyRequestsException', 'Throttling')
+
+# Error codes and HTTP statuses of transient server-side failures, as botocore's standard
+# retry mode treats them
+TRANSIENT_CODES = (
+    'InternalServerException',
+    'InternalFailure',
+    'ServiceUnavailable',
+    'ServiceUnavailableException',
+    'RequestTimeout',
+    'RequestTimeoutException',
+    'PriorRequestNotComplete',
+)
+TRANSIENT_STATUSES = (500, 502, 503, 504)
+
+# Rate limiter lane of the calls made by the current task and the tasks it starts
+geo_priority = contextvars.ContextVar('geo_priority', default=INTERACTIVE)
+
+# Counter of the calls actually sent by the current task and the tasks it starts
+geo_calls_issued = contextvars.ContextVar('geo_calls_issued', default=None)
+
+# Share one in-flight call between concurrent identical requests
+GEO_COALESCE_CALLS = os.environ.get('GEO_COALESCE_CALLS', 'true').lower() in ('1', 'true', 'yes')
+
+
+def _parse_limits(value: str, cast=int) -> Dict[str, int]:
+    """Parse 'geo-routes.calculate_route_matrix=4,geo-places.geocode=8' overrides."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        api, _, limit = item.partition('=')
+        limits[api.strip()] = cast(limit)
+    return limits
+
+
+@contextmanager
+def bulk_priority():
+    """Send the geo calls made inside the block through the bulk lane."""
+    token = geo_priority.set(BULK)
+    try:
+        yield
+    finally:
+        geo_priority.reset(token)
+
+
+@contextmanager
+def count_geo_calls(counter: Optional[Dict[str, int]] = None):
+    """Count in counter['issued'] the geo calls sent to the API inside the block.
+
+    Calls still waiting for a rate limiter token or a concurrency slot are not
+    counted, so a caller cancelled before its call went out sees zero.
+    """
+    counter = {'issued': 0} if counter is None else counter
+    token = geo_calls_issued.set(counter)
+    try:
+        yield counter
+    finally:
+        geo_calls_issued.reset(token)
+
+
+def is_throttling(error: Exception) -> bool:
+    """Return True if a boto3 error reports an exceeded request rate."""
+    if not isinstance(error, botocore.exceptions.ClientError):
+        return False
+    response = error.response or {}
+    code = response.get('Error', {}).get('Code')
+    status = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    return code in THROTTLING_CODES or status == 429
+
+
+def is_transient(error: Exception) -> bool:
+    """Return True if a boto3 error is a network failure, a read timeout or a transient 5xx."""
+    if isinstance(
+        error, (botocore.exceptions.ConnectionError, botocore.exceptions.ReadTimeoutError)
+    ):
+        return True
+    if not isinstance(error, botocore.exceptions.ClientError):
+        return False
+    response = error.response or {}
+    code = response.get('Error', {}).get('Code')
+    status = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    return code in TRANSIENT_CODES or status in TRANSIENT_STATUSES
+
+
+class GeoExecutor:
+    """Run blocking boto3 geo calls off the event loop.
+
+    Calls go to a bounded thread pool that is separate from the default asyncio
+    executor, and each API ('service.operation') has its own concurrency limit so
+    a burst of one kind of request cannot starve the others.
+
+    Identical calls (same API and parameters) made while one is in flight wait
+    for that call instead of issuing their own, and all receive the same
+    response object, which callers must treat as read-only.
+
+    Each API also has an adaptive token bucket with an interactive and a bulk
+    lane. Throttled calls, connection errors, read timeouts and transient 5xx
+    errors are retried here, through the bucket, rather than inside botocore,
+    so retries slow down with the rate. Only throttling lowers the rate.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = GEO_EXECUTOR_WORKERS,
+        default_limit: int = GEO_API_CONCURRENCY,
+        api_limits: Optional[Dict[str, int]] = None,
+        coalesce: bool = GEO_COALESCE_CALLS,
+        api_rates: Optional[Dict[str, float]] = None,
+        max_retries: int = GEO_MAX_RETRIES,
+    ):
+        """Initialize the thread pool and per-API limits."""
+        self.max_workers = max_workers
+        self.default_limit = default_limit
+        self.api_limits = api_limits or {}
+        self.coalesce = coalesce
+        self.api_rates = api_rates or {}
+        self.max_retries = max_retries
+        self._limiters: Dict[str, AdaptiveRateLimiter] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='geo')
+        # asyncio primitives are bound to a loop, so keep one set per running loop
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._shared = weakref.WeakKeyDictionary()
+        self.calls: Dict[str, int] = {}
+        self.coalesced: Dict[str, int] = {}
+        self.retries: Dict[str, int] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.queue_wait_seconds: Dict[str, float] = {}
+
+    def _semaphore(self, api: str) -> asyncio.Semaphore:
+        per_loop = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        semaphore = per_loop.get(api)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.api_limits.get(api, self.default_limit))
+            per_loop[api] = semaphore
+        return semaphore
+
+    def _limiter(self, api: str) -> AdaptiveRateLimiter:
+        limiter = self._limiters.get(api)
+        if limiter is None:
+            rate = self.api_rates.get(api, GEO_API_RATE)
+            limiter = self._limiters.setdefault(
+                api, AdaptiveRateLimiter(rate, max_rate=max(rate, GEO_API_MAX_RATE))
+            )
+        return limiter
+
+    async def run(self, service: str, operation: str, **params):
+        """Invoke `operation` on the shared `service` client without blocking the loop.
+
+        Joins an identical call already in flight on this loop when coalescing
+        is enabled. The shared call is shielded, so a cancelled caller does not
+        cancel it for the others; once its last waiter is cancelled it is
+        cancelled too, so a call nobody needs any more is not sent.
+        """
+        if not self.coalesce:
+            return await self._call(service, operation, params)
+        key = (service, operation, json.dumps(params, sort_keys=True, default=str))
+        shared = self._shared.setdefault(asyncio.get_running_loop(), {})
+        entry = shared.get(key)
+        if entry is not None:
+            api = f'{service}.{operation}'
+            self.coalesced[api] = self.coalesced.get(api, 0) + 1
+        else:
+            # The shared task and the number of callers waiting for it
+            entry = [asyncio.ensure_future(self._call(service, operation, params)), 0]
+            shared[key] = entry
+
+            def forget(done):
+                if shared.get(key) is entry:
+                    del shared[key]
+                # Nobody may be left waiting; mark a failure as retrieved
+                if not done.cancelled():
+                    done.exception()
+
+            entry[0].add_done_callback(forget)
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if not entry[1] and not task.done():
+                task.cancel()
+
+    async def _call(self, service: str, operation: str, params: Dict):
+        api = f'{service}.{operation}'
+        limiter = self._limiter(api)
+        priority = BULK if api in GEO_BULK_APIS else geo_priority.get()
+        attempt = 0
+        while True:
+            await limiter.acquire(priority)
+            try:
+                result = await self._invoke(service, operation, params)
+            except (
+                botocore.exceptions.ClientError,
+                botocore.exceptions.ConnectionError,
+                botocore.exceptions.ReadTimeoutError,
+            ) as e:
+                throttled = is_throttling(e)
+                if throttled:
+                    limiter.on_throttle()
+                if attempt >= self.max_retries or not (throttled or is_transient(e)):
+                    raise
+                attempt += 1
+                self.retries[api] = self.retries.get(api, 0) + 1
+                backoff = GEO_RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+                await asyncio.sleep(random.uniform(backoff / 2, backoff))
+                continue
+            limiter.on_success()
+            return result
+
+    async def _invoke(self, service: str, operation: str, params: Dict):
+        client = registry.get(service)
+        if client is None:
+            raise RuntimeError(f'AWS {service} client not initialized')
+        api = f'{service}.{operation}'
+        method = getattr(client, operation)
+        queued_at = time.monotonic()
+        async with self._semaphore(api):
+            self.queue_wait_seconds[api] = (
+                self.queue_wait_seconds.get(api, 0.0) + time.monotonic() - queued_at
+            )
+            self.calls[api] = self.calls.get(api, 0) + 1
+            counter = geo_calls_issued.get()
+            self.in_flight[api] = self.in_flight.get(api, 0) + 1
+
+            def send():
+                # Counted when a worker starts it: a job cancelled while queued never goes out
+                if counter is not None:
+                    counter['issued'] += 1
+                return method(**params)
+
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._pool, send)
+            finally:
+                self.in_flight[api] -= 1
+
+    def stats(self) -> Dict:
+        """Return executor state for the health endpoint."""
+        return {
+            'max_workers': self.max_workers,
+            'default_limit': self.default_limit,
+            'calls': dict(self.calls),
+            'coalesced': dict(self.coalesced),
+            'retries': dict(self.retries),
+            'rate_limits': {api: limiter.stats() for api, limiter in self._limiters.items()},
+            'in_flight': {api: n for api, n in self.in_flight.items() if n},
+            'queue_wait_seconds': {
+                api: round(wait, 3) for api, wait in self.queue_wait_seconds.items()
+            },
+        }
+
+
+executor = GeoExecutor(
+    api_limits=_parse_limits(os.environ.get('GEO_API_CONCURRENCY_LIMITS', '')),
+    api_rates=_parse_limits(os.environ.get('GEO_API_RATE_LIMITS', ''), float),
+)
+
+
+async def geo_places(operation: str, **params):
+    """Call a geo-places API through the shared executor."""
+    return await executor.run('geo-places', operation, **params)
+
+
+async def geo_routes(operation: str, **params):
+    """Call a geo-routes API through the shared executor."""
+    return await executor.run('geo-routes', operation, **params)
@@ -0,0 +1,25 @@
+import math
+from typing import Tuple
+
+
+# Meters per degree of latitude (and of longitude at the equator)
+METERS_PER_DEGREE = 111320.0
+
+
+def quantize_position(longitude: float, latitude: float, precision_m: float) -> Tuple[int, int]:
+    """Map a position to an integer grid cell roughly `precision_m` meters wide.
+
+    Latitude rows have a fixed height; the longitude step of each row is widened
+    by 1/cos(latitude) so cells stay close to square away from the equator.
+    """
+    lat_step = precision_m / METERS_PER_DEGREE
+    row = math.floor(latitude / lat_step)
+    row_center = (row + 0.5) * lat_step
+    lon_step = lat_step / max(math.cos(math.radians(row_center)), 1e-6)
+    return row, math.floor(longitude / lon_step)
+
+
+def cell_key(longitude: float, latitude: float, precision_m: float) -> str:
+    """Return a string cache key for the grid cell containing a position."""
+    row, col = quantize_position(longitude, latitude, precision_m)
+    return f'{precision_m:g}:{row}:{col}'
@@ -0,0 +1,150 @@
+import numpy as np
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Weekday codes used by OpeningHours Components recurrences, Monday first
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+DURATION_PATTERN = re.compile(r'P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?')
+
+
+def opening_hours_entries(result: Dict) -> List[Dict]:
+    """Return the OpeningHours entries of a place, from the place or its Contacts."""
+    oh = result.get('OpeningHours')
+    if not oh:
+        contacts = result.get('Contacts', {})
+        oh = contacts.get('OpeningHours') if contacts else None
+    if not oh:
+        return []
+    return [oh] if isinstance(oh, dict) else oh
+
+
+def parse_opening_hours(result: Dict) -> List[Dict]:
+    """Normalize OpeningHours to dicts with display, components, open_now and categories."""
+    parsed = []
+    for entry in opening_hours_entries(result):
+        parsed.append(
+            {
+                'display': entry.get('Display', []) or entry.get('display', []),
+                'components': entry.get('Components', []) or entry.get('components', []),
+                'open_now': entry.get('OpenNow', None),
+                'categories': [cat.get('Name') for cat in entry.get('Categories', [])]
+                if 'Categories' in entry
+                else [],
+            }
+        )
+    return parsed
+
+
+def parse_open_time(value: str) -> int:
+    """Return the minute of day of an OpenTime such as 'T073000'."""
+    digits = value.rsplit('T', 1)[-1].ljust(4, '0')
+    return int(digits[:2]) * 60 + int(digits[2:4])
+
+
+def parse_duration(value: str) -> int:
+    """Return the minutes of an ISO 8601 OpenDuration such as 'PT10H30M'."""
+    match = DURATION_PATTERN.fullmatch(value or '')
+    if not match:
+        raise ValueError(f'Unsupported OpenDuration {value!r}')
+    days, hours, minutes, seconds = (int(v or 0) for v in match.groups())
+    return days * MINUTES_PER_DAY + hours * 60 + minutes + (seconds + 59) // 60
+
+
+def recurrence_days(value: Optional[str]) -> List[int]:
+    """Return the weekdays (0 = Monday) of a recurrence like 'FREQ:DAILY;BYDAY:MO,TU'."""
+    for part in (value or '').split(';'):
+        key, _, days = part.replace('=', ':').partition(':')
+        if key.strip().upper() == 'BYDAY':
+            return [WEEKDAYS.index(d.strip()[-2:].upper()) for d in days.split(',') if d.strip()]
+    return list(range(7))
+
+
+class OpeningHours:
+    """Weekly opening intervals compiled from OpeningHours Components.
+
+    Intervals are stored as one sorted uint16 array of minute-of-week
+    boundaries (open, close, open, close, ...), so a lookup is a binary search:
+    a time is open when an odd number of boundaries lie at or before it.
+    Times are interpreted in the place's own UTC offset.
+    """
+
+    __slots__ = ('boundaries', 'utc_offset')
+
+    def __init__(self, intervals: List[tuple], utc_offset: timedelta):
+        """Merge (start, end) minute-of-week intervals; ends may pass the end of the week."""
+        split = []
+        for start, end in intervals:
+            if end - start >= MINUTES_PER_WEEK:
+                split = [(0, MINUTES_PER_WEEK)]
+                break
+            start, end = start % MINUTES_PER_WEEK, start % MINUTES_PER_WEEK + end - start
+            if end > MINUTES_PER_WEEK:
+                split.extend([(start, MINUTES_PER_WEEK), (0, end - MINUTES_PER_WEEK)])
+            else:
+                split.append((start, end))
+        merged = []
+        for start, end in sorted(split):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.boundaries = np.array(merged, dtype=np.uint16).reshape(-1)
+        self.utc_offset = utc_offset
+
+    @classmethod
+    def from_place(cls, place: Dict, default_offset: timedelta) -> Optional['OpeningHours']:
+        """Compile the Components of a place; None when it has no structured hours.
+
+        Only entries without categories are used when the place has any, as
+        category entries describe parts of the place such as a pharmacy counter.
+        """
+        entries = opening_hours_entries(place)
+        general = [e for e in entries if not e.get('Categories')] or entries
+        intervals = []
+        for entry in general:
+            for component in entry.get('Components', []) or []:
+                try:
+                    start = parse_open_time(component['OpenTime'])
+                    duration = parse_duration(component.get('OpenDuration'))
+                    days = recurrence_days(component.get('Recurrence'))
+                except (KeyError, ValueError, AttributeError):
+                    continue
+                for day in days:
+                    opens = day * MINUTES_PER_DAY + start
+                    intervals.append((opens, opens + duration))
+        if not intervals:
+            return None
+        offset_seconds = (place.get('TimeZone') or {}).get('OffsetSeconds')
+        offset = default_offset if offset_seconds is None else timedelta(seconds=offset_seconds)
+        return cls(intervals, offset)
+
+    def minute_of_week(self, when: datetime) -> int:
+        """Return the place-local minute of week (0 = Monday 00:00) of an aware datetime."""
+        local = when.astimezone(timezone(self.utc_offset))
+        return local.weekday() * MINUTES_PER_DAY + local.hour * 60 + local.minute
+
+    def is_open(self, when: datetime) -> bool:
+        """Return True if the place is open at a time."""
+        minute = self.minute_of_week(when)
+        return bool(np.searchsorted(self.boundaries, minute, side='right') % 2)
+
+    def is_open_between(self, start: datetime, end: datetime) -> bool:
+        """Return True if the place is open at any moment of [start, end)."""
+        if end - start >= timedelta(weeks=1):
+            return len(self.boundaries) > 0
+        if self.is_open(start):
+            return True
+        first = self.minute_of_week(start)
+        last = first + int((end - start).total_seconds() // 60)
+        opens = self.boundaries[0::2].astype(np.int64)
+        # An opening inside the window, this week or (for windows that wrap) the next
+        return bool(
+            np.any((opens > first) & (opens < last))
+            or np.any((opens + MINUTES_PER_WEEK > first) & (opens + MINUTES_PER_WEEK < last))
+        )
@@ -0,0 +1,169 @@
+import math
+import numpy as np
+import threading
+import time
+from caches import normalize_query
+from geometry import METERS_PER_DEGREE
+from great_circle import haversine_meters
+from typing import Dict, List, Optional
+
+
+def place_keywords(item: Dict) -> str:
+    """Return the normalized title and category names that keyword filters search."""
+    return normalize_query(
+        ' '.join(
+            [item.get('Title') or '']
+            + [c.get('Name') or '' for c in item.get('Categories') or []]
+        )
+    )
+
+
+def matches_keyword(item: Dict, keyword: Optional[str]) -> bool:
+    """Return True if keyword is empty or appears in the place's title or category names."""
+    return not keyword or normalize_query(keyword) in place_keywords(item)
+
+
+class PlaceIndex:
+    """In-process spatial index of places seen in geo-places responses.
+
+    Positions and timestamps live in flat numpy arrays addressed by slot, and
+    a grid of square degree cells maps to the slots inside each cell, so a
+    radius query only measures the places of the few cells the circle touches.
+    Re-seeing a place updates its slot in place; when the index is full the
+    least recently seen places are dropped.
+    """
+
+    def __init__(self, max_entries: int, cell_degrees: float = 0.01):
+        """Initialize an empty index holding at most max_entries places."""
+        self.max_entries = max_entries
+        self.cell_degrees = cell_degrees
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._positions = np.zeros((max_entries, 2), dtype=np.float64)
+        self._seen_at = np.zeros(max_entries, dtype=np.float64)
+        self._items: List[Optional[Dict]] = [None] * max_entries
+        self._keywords: List[str] = [''] * max_entries
+        self._cell_of: List[Optional[tuple]] = [None] * max_entries
+        self._slots: Dict[str, int] = {}
+        self._cells: Dict[tuple, set] = {}
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+
+    def _cell(self, longitude: float, latitude: float) -> tuple:
+        return (math.floor(latitude / self.cell_degrees), math.floor(longitude / self.cell_degrees))
+
+    def _release(self, slot: int):
+        self._cells[self._cell_of[slot]].discard(slot)
+        if not self._cells[self._cell_of[slot]]:
+            del self._cells[self._cell_of[slot]]
+        del self._slots[self._items[slot]['PlaceId']]
+        self._items[slot] = None
+        self._cell_of[slot] = None
+        self._free.append(slot)
+
+    def add(self, items: list):
+        """Index places with a PlaceId and Position, stamped as seen now."""
+        now = time.time()
+        with self._lock:
+            for item in items:
+                place_id = item.get('PlaceId')
+                position = item.get('Position')
+                if not place_id or not position or len(position) != 2:
+                    continue
+                slot = self._slots.get(place_id)
+                if slot is not None:
+                    self._release(slot)
+                if not self._free:
+                    # Every slot is in use here, so the oldest timestamp is the LRU place
+                    self._release(int(np.argmin(self._seen_at)))
+                    self.evictions += 1
+                slot = self._free.pop()
+                cell = self._cell(*position)
+                self._positions[slot] = position
+                self._seen_at[slot] = now
+                self._items[slot] = item
+                self._keywords[slot] = place_keywords(item)
+                self._cell_of[slot] = cell
+                self._slots[place_id] = slot
+                self._cells.setdefault(cell, set()).add(slot)
+
+    def query(
+        self,
+        longitude: float,
+        latitude: float,
+        radius_m: float,
+        max_age_seconds: float,
+        keyword: Optional[str] = None,
+    ) -> List[Dict]:
+        """Return fresh places within radius_m of a point, closest first.
+
+        keyword, if given, must appear in the place's title or category names.
+        Each result is {'item', 'distance_meters', 'age_seconds'}.
+        """
+        lat_span = radius_m / METERS_PER_DEGREE
+        lon_span = lat_span / max(math.cos(math.radians(latitude)), 1e-6)
+        row0, col0 = self._cell(longitude - lon_span, latitude - lat_span)
+        row1, col1 = self._cell(longitude + lon_span, latitude + lat_span)
+        needle = normalize_query(keyword) if keyword else None
+        now = time.time()
+        with self._lock:
+            slots = [
+                slot
+                for row in range(row0, row1 + 1)
+                for col in range(col0, col1 + 1)
+                for slot in self._cells.get((row, col), ())
+            ]
+            slots = np.array(
+                [s for s in slots if not needle or needle in self._keywords[s]], dtype=np.int64
+            )
+            if len(slots):
+                slots = slots[now - self._seen_at[slots] <= max_age_seconds]
+            if not len(slots):
+                return []
+            distances = haversine_meters([longitude, latitude], self._positions[slots])
+            inside = distances <= radius_m
+            slots, distances = slots[inside], distances[inside]
+            order = np.argsort(distances, kind='stable')
+            return [
+                {
+                    'item': self._items[slots[k]],
+                    'distance_meters': float(distances[k]),
+                    'age_seconds': now - float(self._seen_at[slots[k]]),
+                }
+                for k in order
+            ]
+
+    def nearby(
+        self,
+        longitude: float,
+        latitude: float,
+        radius_m: float,
+        max_age_seconds: float,
+        min_results: int,
+        keyword: Optional[str] = None,
+    ) -> Optional[List[Dict]]:
+        """Return the closest min_results fresh places, or None if the index has fewer."""
+        results = self.query(longitude, latitude, radius_m, max_age_seconds, keyword)
+        if len(results) < min_results:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return results[:min_results]
+
+    def __len__(self) -> int:
+        """Return the number of indexed places."""
+        return len(self._slots)
+
+    def stats(self) -> Dict:
+        """Return counters for the health endpoint."""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._slots),
+            'max_entries': self.max_entries,
+            'cells': len(self._cells),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+        }
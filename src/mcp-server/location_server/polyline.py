@@ -0,0 +1,150 @@
+import numpy as np
+from geometry import METERS_PER_DEGREE
+from typing import Tuple
+
+
+# FlexiblePolyline uses URL-safe base64 characters, each carrying 5 bits plus a continuation bit
+ENCODING_TABLE = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_'
+DECODING_TABLE = np.full(256, -1, dtype=np.int64)
+DECODING_TABLE[np.frombuffer(ENCODING_TABLE.encode(), dtype=np.uint8)] = np.arange(64)
+
+FORMAT_VERSION = 1
+
+
+def decode_varints(encoded: str) -> np.ndarray:
+    """Decode every unsigned varint of a FlexiblePolyline string at once."""
+    values = DECODING_TABLE[np.frombuffer(encoded.encode(), dtype=np.uint8)]
+    if np.any(values < 0):
+        raise ValueError('Invalid FlexiblePolyline character')
+    last = (values & 0x20) == 0
+    if len(values) and not last[-1]:
+        raise ValueError('Truncated FlexiblePolyline')
+    ends = np.flatnonzero(last)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    offsets = np.arange(len(values)) - np.repeat(starts, ends - starts + 1)
+    shifted = (values & 0x1F) << (5 * offsets)
+    return np.add.reduceat(shifted, starts) if len(starts) else shifted
+
+
+def decode_flexible_polyline(encoded: str) -> Tuple[np.ndarray, int]:
+    """Decode a FlexiblePolyline into an (n, 2) float64 array of [longitude, latitude].
+
+    A third dimension (elevation, level...) is dropped. Returns the points and
+    the precision (decimal digits) of the encoding.
+    """
+    varints = decode_varints(encoded)
+    if len(varints) < 2 or varints[0] != FORMAT_VERSION:
+        raise ValueError('Unsupported FlexiblePolyline version')
+    header = int(varints[1])
+    precision = header & 0x0F
+    dimensions = 3 if (header >> 4) & 0x07 else 2
+    deltas = varints[2:]
+    if len(deltas) % dimensions:
+        raise ValueError('Truncated FlexiblePolyline')
+    # Zig-zag decoding of signed deltas
+    signed = (deltas >> 1) ^ -(deltas & 1)
+    coordinates = np.cumsum(signed.reshape(-1, dimensions)[:, :2], axis=0) / 10.0**precision
+    return coordinates[:, ::-1], precision
+
+
+def encode_varints(values: np.ndarray) -> str:
+    """Encode unsigned integers as FlexiblePolyline varints."""
+    chars = []
+    for value in values.tolist():
+        while value >= 0x20:
+            chars.append(ENCODING_TABLE[(value & 0x1F) | 0x20])
+            value >>= 5
+        chars.append(ENCODING_TABLE[value])
+    return ''.join(chars)
+
+
+def encode_flexible_polyline(points: np.ndarray, precision: int = 5) -> str:
+    """Encode (n, 2) [longitude, latitude] points as a two-dimensional FlexiblePolyline."""
+    scaled = np.round(np.asarray(points, dtype=np.float64)[:, ::-1] * 10.0**precision)
+    deltas = np.diff(scaled.astype(np.int64), axis=0, prepend=0).reshape(-1)
+    zigzag = (deltas << 1) ^ (deltas >> 63)
+    return encode_varints(np.concatenate(([FORMAT_VERSION, precision], zigzag)))
+
+
+def significance(points: np.ndarray, tolerance_m: float) -> np.ndarray:
+    """Run Douglas-Peucker once and return the tolerance each point survives, in meters.
+
+    A point is kept by Douglas-Peucker at tolerance t exactly when its value is
+    above t, so any coarser simplification is a threshold on this array.
+    Endpoints are infinite and points dropped at tolerance_m are zero. Points
+    are projected to local meters around their mean latitude, and the
+    distances of a whole span to its chord are computed at once per step.
+    """
+    n = len(points)
+    values = np.zeros(n)
+    values[[0, -1]] = np.inf
+    if n <= 2:
+        return values
+    scale = np.array([np.cos(np.radians(points[:, 1].mean())), 1.0]) * METERS_PER_DEGREE
+    xy = points * scale
+    stack = [(0, n - 1, np.inf)]
+    while stack:
+        first, last, parent = stack.pop()
+        if last - first < 2:
+            continue
+        a, b = xy[first], xy[last]
+        offsets = xy[first + 1:last] - a
+        chord = b - a
+        length = np.hypot(*chord)
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(chord[0] * offsets[:, 1] - chord[1] * offsets[:, 0]) / length
+        worst = int(np.argmax(distances))
+        if distances[worst] > tolerance_m:
+            index = first + 1 + worst
+            # A point never outlives the split that exposed it
+            values[index] = min(distances[worst], parent)
+            stack.extend([(first, index, values[index]), (index, last, values[index])])
+    return values
+
+
+def simplify(points: np.ndarray, tolerance_m: float) -> np.ndarray:
+    """Douglas-Peucker simplification; returns the indices of the points to keep."""
+    if tolerance_m <= 0:
+        return np.arange(len(points))
+    return np.flatnonzero(significance(points, tolerance_m) > tolerance_m)
+
+
+def fit_to_budget(
+    points: np.ndarray,
+    tolerance_m: float,
+    max_bytes: float,
+    max_points: float = np.inf,
+    precision: int = 5,
+) -> Tuple[np.ndarray, str, float]:
+    """Simplify points with the smallest tolerance >= tolerance_m that fits the budget.
+
+    The budget is met when the encoded polyline has at most max_bytes
+    characters and at most max_points points remain. Douglas-Peucker runs
+    once; coarser tolerances are thresholds on the significance of each point,
+    searched by bisection. Returns the kept points, their encoding and the
+    tolerance used.
+    """
+    values = significance(points, tolerance_m)
+    kept = points[values > tolerance_m]
+    encoded = encode_flexible_polyline(kept, precision)
+    if len(encoded) <= max_bytes and len(kept) <= max_points:
+        return kept, encoded, tolerance_m
+    # Candidate tolerances, each dropping at least one more point than the previous
+    thresholds = np.unique(values[np.isfinite(values) & (values > tolerance_m)])
+    low, high = 0, len(thresholds)
+    best = (points[np.isinf(values)], None, float(thresholds[-1]) if len(thresholds) else 0.0)
+    while low < high:
+        middle = (low + high) // 2
+        candidate = points[values > thresholds[middle]]
+        candidate_encoded = encode_flexible_polyline(candidate, precision)
+        if len(candidate_encoded) <= max_bytes and len(candidate) <= max_points:
+            best = (candidate, candidate_encoded, float(thresholds[middle]))
+            high = middle
+        else:
+            low = middle + 1
+    kept, encoded, tolerance = best
+    if encoded is None:
+        encoded = encode_flexible_polyline(kept, precision)
+    return kept, encoded, tolerance
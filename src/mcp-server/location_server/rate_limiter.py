@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+from typing import Dict
+
+
+# Priority lanes: bulk calls only get a token when no interactive call is waiting
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+
+
+class AdaptiveRateLimiter:
+    """Token bucket for one API whose rate adapts to throttling (AIMD).
+
+    Every success raises the rate by about `increase` requests per second
+    each second (rate += increase / rate per call), and a throttling response
+    multiplies it by `decrease`, at most once per second so a burst of
+    throttled calls counts as one congestion signal. The bucket holds up to
+    one second of tokens and starts full, so a cold burst within the quota is
+    sent at once and only real throttling slows it down.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        max_rate: float,
+        min_rate: float = 1.0,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+    ):
+        """Initialize a bucket refilling at `rate` requests per second."""
+        self.rate = rate
+        self.max_rate = max(max_rate, rate)
+        self.min_rate = min(min_rate, rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.tokens = max(rate, 1.0)
+        self.throttles = 0
+        self.waited_seconds = 0.0
+        self.waiting = {INTERACTIVE: 0, BULK: 0}
+        self._updated_at = time.monotonic()
+        self._decreased_at = 0.0
+        self._lock = threading.Lock()
+
+    def _take(self, priority: str) -> float:
+        """Take a token and return 0, or return the seconds until one may be available."""
+        with self._lock:
+            now = time.monotonic()
+            capacity = max(self.rate, 1.0)
+            self.tokens = min(capacity, self.tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self.tokens < 1:
+                return max((1 - self.tokens) / self.rate, 0.001)
+            if priority == BULK and self.waiting[INTERACTIVE]:
+                # The token is left to the interactive lane; check again after the next refill
+                return 1 / self.rate
+            self.tokens -= 1
+            return 0.0
+
+    async def acquire(self, priority: str = INTERACTIVE) -> float:
+        """Wait for a token in the given lane; returns the seconds waited."""
+        started = time.monotonic()
+        delay = self._take(priority)
+        if not delay:
+            return 0.0
+        self.waiting[priority] += 1
+        try:
+            while delay:
+                await asyncio.sleep(delay)
+                delay = self._take(priority)
+        finally:
+            self.waiting[priority] -= 1
+        waited = time.monotonic() - started
+        self.waited_seconds += waited
+        return waited
+
+    def on_success(self):
+        """Additive increase after a call that was not throttled."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    def on_throttle(self):
+        """Multiplicative decrease after a throttling response."""
+        with self._lock:
+            self.throttles += 1
+            now = time.monotonic()
+            if now - self._decreased_at >= 1.0:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.tokens = min(self.tokens, 0.0)
+                self._decreased_at = now
+
+    def stats(self) -> Dict:
+        """Return limiter state for the health endpoint."""
+        return {
+            'rate_per_second': round(self.rate, 2),
+            'max_rate_per_second': self.max_rate,
+            'tokens': round(self.tokens, 2),
+            'throttles': self.throttles,
+            'waiting': dict(self.waiting),
+            'waited_seconds': round(self.waited_seconds, 3),
+        }
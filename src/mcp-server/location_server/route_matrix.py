@@ -0,0 +1,112 @@
+import asyncio
+import numpy as np
+import os
+from caches import TTLCache
+from geo_executor import geo_routes
+from geometry import cell_key
+from typing import Dict, List, Optional, Tuple
+
+
+# Largest origins x destinations block sent in one calculate_route_matrix request
+ROUTE_MATRIX_MAX_ORIGINS = int(os.environ.get('ROUTE_MATRIX_MAX_ORIGINS', 15))
+ROUTE_MATRIX_MAX_DESTINATIONS = int(os.environ.get('ROUTE_MATRIX_MAX_DESTINATIONS', 100))
+
+# Snapping of matrix points for cell cache keys, in meters
+ROUTE_MATRIX_PRECISION_METERS = float(os.environ.get('ROUTE_MATRIX_PRECISION_METERS', 50))
+
+# Value used for cells without a route
+UNREACHABLE = -1
+
+# (distance, duration) per origin/destination cell, shared across requests
+matrix_cache = TTLCache(
+    'route_matrix',
+    ttl_seconds=float(os.environ.get('ROUTE_MATRIX_CACHE_TTL_SECONDS', 6 * 3600)),
+    max_entries=int(os.environ.get('ROUTE_MATRIX_CACHE_MAX_ENTRIES', 250000)),
+)
+
+
+def plan_tiles(
+    missing: np.ndarray, max_rows: int, max_cols: int
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Cover the True cells of a boolean matrix with blocks of at most max_rows x max_cols.
+
+    Rows that need fetching are grouped max_rows at a time and, within each
+    group, only the columns that still have a missing cell are requested.
+    Blocks may include some already cached cells; they are simply overwritten.
+    """
+    tiles = []
+    rows = np.flatnonzero(missing.any(axis=1))
+    for start in range(0, len(rows), max_rows):
+        tile_rows = rows[start:start + max_rows]
+        cols = np.flatnonzero(missing[tile_rows].any(axis=0))
+        for col_start in range(0, len(cols), max_cols):
+            tiles.append((tile_rows, cols[col_start:col_start + max_cols]))
+    return tiles
+
+
+async def fetch_route_matrix(
+    origins: np.ndarray,
+    destinations: np.ndarray,
+    travel_mode: str = 'Car',
+    optimize_for: str = 'FastestRoute',
+    departure_time: Optional[str] = None,
+    cache_scope: Tuple = (),
+    ttl_seconds: Optional[float] = None,
+) -> Tuple[np.ndarray, np.ndarray, Dict]:
+    """Return dense (distance_meters, duration_seconds) int64 matrices for all pairs.
+
+    origins and destinations are (n, 2) and (m, 2) arrays of [longitude, latitude].
+    Cached cells are reused; the remaining ones are fetched with concurrent
+    calculate_route_matrix requests. Cells without a route hold UNREACHABLE.
+    cache_scope is added to every cell key, e.g. a departure time bucket.
+    """
+    n, m = len(origins), len(destinations)
+    distances = np.full((n, m), UNREACHABLE, dtype=np.int64)
+    durations = np.full((n, m), UNREACHABLE, dtype=np.int64)
+    scope = (travel_mode, optimize_for) + tuple(cache_scope)
+    origin_keys = [cell_key(lon, lat, ROUTE_MATRIX_PRECISION_METERS) for lon, lat in origins]
+    destination_keys = [
+        cell_key(lon, lat, ROUTE_MATRIX_PRECISION_METERS) for lon, lat in destinations
+    ]
+
+    missing = np.ones((n, m), dtype=bool)
+    for i, origin_key in enumerate(origin_keys):
+        for j, destination_key in enumerate(destination_keys):
+            cached = matrix_cache.get((origin_key, destination_key) + scope)
+            if cached is not None:
+                distances[i, j], durations[i, j] = cached
+                missing[i, j] = False
+
+    params = {'TravelMode': travel_mode, 'OptimizeRoutingFor': optimize_for}
+    if departure_time:
+        params['DepartureTime'] = departure_time
+
+    async def fetch(rows: np.ndarray, cols: np.ndarray):
+        response = await geo_routes(
+            'calculate_route_matrix',
+            Origins=[{'Position': [float(v) for v in origins[i]]} for i in rows],
+            Destinations=[{'Position': [float(v) for v in destinations[j]]} for j in cols],
+            RoutingBoundary={'Unbounded': True},
+            **params,
+        )
+        for r, row in enumerate(response.get('RouteMatrix', [])):
+            for c, entry in enumerate(row):
+                if entry.get('Error') or entry.get('Distance') is None:
+                    continue
+                i, j = rows[r], cols[c]
+                distances[i, j] = entry['Distance']
+                durations[i, j] = entry.get('Duration', UNREACHABLE)
+                matrix_cache.set(
+                    (origin_keys[i], destination_keys[j]) + scope,
+                    [int(distances[i, j]), int(durations[i, j])],
+                    ttl_seconds=ttl_seconds,
+                )
+
+    tiles = plan_tiles(missing, ROUTE_MATRIX_MAX_ORIGINS, ROUTE_MATRIX_MAX_DESTINATIONS)
+    await asyncio.gather(*(fetch(rows, cols) for rows, cols in tiles))
+    stats = {
+        'cells': n * m,
+        'cells_from_cache': int(n * m - missing.sum()),
+        'tiles_fetched': len(tiles),
+    }
+    return distances, durations, stats
@@ -0,0 +1,154 @@
+import asyncio
+import numpy as np
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+
+class RoutePlan:
+    """Ordered stops of one vehicle and the road leg between each pair of consecutive points.
+
+    points are the start followed by the stop positions; legs[i] joins
+    points[i] to points[i + 1]. Stops are dicts with id, position,
+    service_seconds and latest (seconds after departure, inf without a
+    deadline). Waiting is not modelled: a stop's ETA is the departure plus the
+    legs and service times before it.
+    """
+
+    def __init__(
+        self,
+        vehicle_id,
+        start: List[float],
+        stops: List[Dict],
+        legs: List[Dict],
+        departure: datetime,
+        travel_mode: str = 'Car',
+    ):
+        """Initialize a plan; legs must hold one entry per stop."""
+        if len(legs) != len(stops):
+            raise ValueError('A route plan needs exactly one leg per stop')
+        self.vehicle_id = vehicle_id
+        self.start = start
+        self.stops = stops
+        self.legs = legs
+        self.departure = departure
+        self.travel_mode = travel_mode
+        self.updated_at = time.time()
+        # Serializes insertions, which await the routing API between choosing and applying
+        self.lock = asyncio.Lock()
+
+    @property
+    def points(self) -> List[List[float]]:
+        return [self.start] + [stop['position'] for stop in self.stops]
+
+    def etas(self) -> np.ndarray:
+        """Arrival time of every stop, in seconds after departure."""
+        travel = np.array([leg['duration_seconds'] for leg in self.legs], dtype=np.float64)
+        service = np.array([stop['service_seconds'] for stop in self.stops], dtype=np.float64)
+        # Service at the previous stop delays the arrival at this one
+        return np.cumsum(travel + np.concatenate(([0.0], service[:-1])))
+
+    def best_insertion(
+        self,
+        to_stop: np.ndarray,
+        from_stop: np.ndarray,
+        service_seconds: float,
+        latest: float = np.inf,
+        max_delay_seconds: float = np.inf,
+    ) -> Tuple[Optional[int], np.ndarray, np.ndarray]:
+        """Return the cheapest feasible insertion index, and the delay and new stop ETA per index.
+
+        Index i puts the new stop between points[i] and points[i + 1] (the last
+        index appends it). to_stop[i] is the travel time from points[i] to the
+        new stop and from_stop[i] from the new stop to points[i + 1]. The delay
+        of index i, added to every later stop, is the detour plus the service
+        time; it must stay within max_delay_seconds and every later deadline,
+        and the new stop must be reached by its own latest time. Everything is
+        one vectorized pass over the stops, O(stops). The index is None if none
+        is feasible.
+        """
+        n = len(self.stops)
+        etas = self.etas()
+        old = np.array([leg['duration_seconds'] for leg in self.legs], dtype=np.float64)
+        service = np.array([stop['service_seconds'] for stop in self.stops], dtype=np.float64)
+        delays = np.empty(n + 1)
+        delays[:n] = to_stop[:n] + service_seconds + from_stop[:n] - old
+        delays[n] = 0.0
+        # Time left before each later stop breaks its deadline or the delay limit
+        stop_latest = np.array([stop['latest'] for stop in self.stops], dtype=np.float64)
+        allowance = np.minimum(stop_latest - etas, max_delay_seconds)
+        suffix = np.append(np.minimum.accumulate(allowance[::-1])[::-1], np.inf)
+        arrival = np.concatenate(([0.0], etas + service)) + to_stop
+        feasible = (delays <= suffix) & (arrival <= latest)
+        if not feasible.any():
+            return None, delays, arrival
+        cost = np.where(feasible, delays, np.inf)
+        # Appending delays nobody but still lengthens the route by the trip out and the service
+        cost[n] = to_stop[n] + service_seconds if feasible[n] else np.inf
+        return int(np.argmin(cost)), delays, arrival
+
+    def insert(self, index: int, stop: Dict, leg_in: Dict, leg_out: Optional[Dict]):
+        """Insert a stop at an index, replacing the leg it splits by leg_in and leg_out."""
+        self.stops.insert(index, stop)
+        if index < len(self.legs):
+            self.legs[index:index + 1] = [leg_in, leg_out]
+        else:
+            self.legs.append(leg_in)
+        self.updated_at = time.time()
+
+    def to_dict(self) -> Dict:
+        """Summarize the plan with ETAs and totals."""
+        etas = self.etas()
+        return {
+            'vehicle_id': self.vehicle_id,
+            'departure_time': self.departure.isoformat(timespec='seconds'),
+            'travel_mode': self.travel_mode,
+            'start': self.start,
+            'stops': [
+                {
+                    'id': stop['id'],
+                    'position': stop['position'],
+                    'eta': (self.departure + timedelta(seconds=float(eta))).isoformat(
+                        timespec='seconds'
+                    ),
+                }
+                for stop, eta in zip(self.stops, etas)
+            ],
+            'distance_meters': int(sum(leg['distance_meters'] or 0 for leg in self.legs)),
+            'duration_seconds': int(etas[-1]) if len(etas) else 0,
+        }
+
+
+class RoutePlanStore:
+    """In-memory route plans keyed by veiculo_id, least recently used evicted first."""
+
+    def __init__(self, max_plans: int):
+        """Initialize an empty store holding at most max_plans plans."""
+        self.max_plans = max_plans
+        self.insertions = 0
+        self._plans: 'OrderedDict[str, RoutePlan]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, vehicle_id) -> Optional[RoutePlan]:
+        with self._lock:
+            plan = self._plans.get(str(vehicle_id))
+            if plan is not None:
+                self._plans.move_to_end(str(vehicle_id))
+            return plan
+
+    def put(self, plan: RoutePlan):
+        with self._lock:
+            self._plans[str(plan.vehicle_id)] = plan
+            self._plans.move_to_end(str(plan.vehicle_id))
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+
+    def stats(self) -> Dict:
+        """Return store state for the health endpoint."""
+        return {
+            'plans': len(self._plans),
+            'max_plans': self.max_plans,
+            'insertions': self.insertions,
+        }
@@ -0,0 +1,103 @@
+import numpy as np
+import time
+from geometry import METERS_PER_DEGREE
+from typing import Dict, List, Tuple
+
+
+class TrackedRoute:
+    """Planned route of one vehicle, kept to estimate its remaining time from live positions.
+
+    points is the (n, 2) [longitude, latitude] route geometry and steps the
+    turn_by_turn list of route_summary. Steps carry distances but no geometry
+    offsets, so their ends are placed along the polyline by cumulative
+    distance, scaled to the polyline length. Positions are projected onto a
+    local equirectangular plane around the first point, which is accurate to
+    well under a meter over the length of a delivery route.
+    """
+
+    def __init__(
+        self,
+        vehicle_id,
+        destination: List[float],
+        points: np.ndarray,
+        steps: List[Dict],
+        distance_meters: float,
+        duration_seconds: float,
+        travel_mode: str = 'Car',
+    ):
+        """Precompute the segment vectors of the route and the cumulative step times."""
+        self.vehicle_id = vehicle_id
+        self.destination = destination
+        self.travel_mode = travel_mode
+        self.distance_meters = float(distance_meters or 0)
+        self.duration_seconds = float(duration_seconds or 0)
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.origin = points[0]
+        self.scale = METERS_PER_DEGREE * np.array([np.cos(np.radians(points[0, 1])), 1.0])
+        xy = (points - self.origin) * self.scale
+        self.starts = xy[:-1]
+        self.vectors = np.diff(xy, axis=0)
+        lengths = np.hypot(self.vectors[:, 0], self.vectors[:, 1])
+        self.along = np.concatenate(([0.0], np.cumsum(lengths)))
+        self.length = float(self.along[-1])
+        step_distances = np.array([s.get('distance_meters') or 0 for s in steps], dtype=np.float64)
+        step_durations = np.array([s.get('duration_seconds') or 0 for s in steps], dtype=np.float64)
+        if step_distances.sum() > 0 and step_durations.sum() > 0:
+            ends = np.cumsum(step_distances) / step_distances.sum() * self.length
+            self.step_ends = np.concatenate(([0.0], ends))
+            self.step_times = np.concatenate(([0.0], np.cumsum(step_durations)))
+            self.duration_seconds = self.duration_seconds or float(self.step_times[-1])
+        else:
+            # Without usable steps, time is spread evenly along the route
+            self.step_ends = np.array([0.0, self.length])
+            self.step_times = np.array([0.0, self.duration_seconds])
+            steps = []
+        self.road_names = [s.get('road_name') for s in steps]
+        self.progress = 0.0
+        self.updates = 0
+        self.updated_at = time.time()
+
+    def snap(self, position: List[float], backtrack_meters: float) -> Tuple[float, float]:
+        """Return (offset along the route, distance from it) of the closest point to position.
+
+        Only segments ending after the last known progress minus backtrack_meters
+        are considered, so a route that passes the same street twice does not
+        send the vehicle back to its first pass.
+        """
+        point = (np.asarray(position, dtype=np.float64) - self.origin) * self.scale
+        if not len(self.vectors):
+            return 0.0, float(np.hypot(*point))
+        candidates = np.flatnonzero(self.along[1:] >= self.progress - backtrack_meters)
+        if not len(candidates):
+            candidates = np.arange(len(self.vectors))
+        starts, vectors = self.starts[candidates], self.vectors[candidates]
+        squared = np.einsum('ij,ij->i', vectors, vectors)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.clip(np.einsum('ij,ij->i', point - starts, vectors) / squared, 0, 1)
+        t = np.where(squared > 0, t, 0.0)
+        offsets = starts + t[:, None] * vectors - point
+        distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        best = int(np.argmin(distances))
+        segment = candidates[best]
+        along = self.along[segment] + t[best] * np.sqrt(squared[best])
+        return float(along), float(distances[best])
+
+    def remaining(self, offset: float) -> Dict:
+        """Return the remaining distance and time from an offset along the route."""
+        offset = min(max(offset, 0.0), self.length)
+        elapsed = float(np.interp(offset, self.step_ends, self.step_times))
+        step = min(int(np.searchsorted(self.step_ends, offset, side='right')), len(self.road_names))
+        fraction = (self.length - offset) / self.length if self.length else 0.0
+        return {
+            'remaining_meters': int(round(fraction * self.distance_meters)),
+            'remaining_seconds': int(round(max(self.step_times[-1] - elapsed, 0.0))),
+            'progress': round(1 - fraction, 4),
+            'current_step': step - 1 if step else None,
+            'road_name': self.road_names[step - 1] if step else None,
+        }
+
+    def advance(self, offset: float):
+        """Record the progress of the vehicle; it never moves backwards along the route."""
+        self.progress = max(self.progress, offset)
+        self.updates += 1
+        self.updated_at = time.time()
@@ -1,20 +1,48 @@
 import asyncio
-import boto3
-import botocore.config
 import botocore.exceptions
+import json
+import numpy as np
 import os
 import sys
+import time
 import uvicorn
+from caches import StaleWhileRevalidateCache, TTLCache, normalize_query
+from client_registry import registry
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from depot_assignment import assign_by_regret
 from dotenv import load_dotenv
+from fake_geo import install_fake_backend
+from fleet import (
+    parse_candidates,
+    parse_deliveries,
+    parse_depots,
+    parse_timed_stops,
+    parse_tracking_points,
+    parse_vehicle_trip,
+    parse_vehicles,
+)
+from geo_executor import bulk_priority, count_geo_calls, executor, geo_places, geo_routes
+from geometry import cell_key
+from great_circle import haversine_matrix, haversine_meters, nearest_indices
 from loguru import logger
 from mcp.server.fastmcp import Context, FastMCP
 from mcp.server.sse import SseServerTransport
+from opening_hours import OpeningHours, parse_opening_hours
+from place_index import PlaceIndex, matches_keyword
+from polyline import decode_flexible_polyline, fit_to_budget
 from pydantic import Field
-from typing import Dict, Optional
+from route_matrix import UNREACHABLE, fetch_route_matrix, matrix_cache
+from route_plans import RoutePlan, RoutePlanStore
+from route_tracking import TrackedRoute
+from service_area import compute_service_area, service_area_cache
+from typing import Dict, Optional, Tuple
+from vrp import route_path, schedule_path, solve_time_windows, solve_vrp
+from waypoint_clusters import cluster_junctions, order_clusters, sweep_clusters
 
 from starlette.applications import Starlette
 from starlette.middleware import Middleware
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, Response
 from starlette.routing import Mount, Route
 from starlette.middleware.base import BaseHTTPMiddleware
 import os
@@ -94,8 +122,20 @@ mcp = FastMCP(
     - Use the search_places tool for general search
     - Use get_place for details on a specific place
     - Use reverse_geocode for lat/lon to address
+    - Use reverse_geocode_batch to resolve many points at once, e.g. every historico event of a set of entregas
     - Use search_nearby for places near a point
     - Use search_places_open_now to find currently open places (if supported by data)
+    - Use places_open_at to check known PlaceIds against a time or delivery window (e.g. entregas.data_prevista)
+    - Use route_geometry to draw a route on a map; it returns a size-limited polyline or coordinate array
+    - Use service_area with the mcp-veiculos bases to precompute reachable areas, then ask which customers each base reaches within N minutes
+    - Use route_matrix for many-to-many distance/duration questions (e.g. vehicles x deliveries)
+    - Use nearest_candidates to find the vehicles closest to an order before routing any of them
+    - Use assign_orders_to_depots to decide which CD serves each pending order before planning routes per CD
+    - Use plan_time_window_routes when deliveries have deadlines (data_prevista, prazo_entrega) to compare vehicles in one call
+    - Use set_route_plan to store a vehicle's route and insert_stop to add a new order without re-optimizing (keeps communicated ETAs)
+    - Use eta_update to poll the arrival time of a vehicle 'Em Rota' at its destino_atual; it only re-routes when the vehicle leaves its route
+    - Use plan_fleet_routes to split deliveries across several vehicles with capacity limits
+    - Use calculate_routes_batch instead of repeated calculate_route calls when comparing several origin/destination pairs
     """,
     dependencies=[
         'boto3',
@@ -106,6 +146,19 @@ mcp = FastMCP(
 # Create SSE transport
 sse = SseServerTransport(f'{BASE_PATH}/messages/')
 
+
+class SentResponse(Response):
+    """Response for a request that was already answered on the raw ASGI send channel.
+
+    connect_sse sends the SSE response itself, so sending another one (even
+    an empty one) after the client disconnects makes BaseHTTPMiddleware raise
+    'Unexpected message: http.response.start'.
+    """
+
+    async def __call__(self, scope, receive, send):
+        pass
+
+
 # MCP SSE handler function
 async def handle_sse(request):
     async with sse.connect_sse(request.scope, request.receive, request._send) as (
@@ -115,75 +168,42 @@ async def handle_sse(request):
         await mcp._mcp_server.run(
             read_stream, write_stream, mcp._mcp_server.create_initialization_options()
         )
+    # Starlette expects a response object once the client disconnects, but must not send it
+    return SentResponse()
 
 
 class GeoPlacesClient:
     """Amazon Location Service geo-places client wrapper."""
 
     def __init__(self):
-        """Initialize the Amazon geo-places client."""
+        """Initialize the Amazon geo-places client wrapper."""
         self.aws_region = os.environ.get('AWS_REGION', 'us-east-1')
-        self.geo_places_client = None
-        config = botocore.config.Config(
-            connect_timeout=15, read_timeout=15, retries={'max_attempts': 3}
-        )
-        aws_access_key = os.environ.get('AWS_ACCESS_KEY_ID')
-        aws_secret_key = os.environ.get('AWS_SECRET_ACCESS_KEY')
-        aws_session_token = os.environ.get('AWS_SESSION_TOKEN')
-        try:
-            if aws_access_key and aws_secret_key:
-                client_args = {
-                    'aws_access_key_id': aws_access_key,
-                    'aws_secret_access_key': aws_secret_key,
-                    'region_name': self.aws_region,
-                    'config': config,
-                }
-                if aws_session_token:
-                    client_args['aws_session_token'] = aws_session_token
-                self.geo_places_client = boto3.client('geo-places', **client_args)
-            else:
-                self.geo_places_client = boto3.client(
-                    'geo-places', region_name=self.aws_region, config=config
-                )
-            logger.debug(f'Amazon geo-places client initialized for region {self.aws_region}')
-        except Exception as e:
-            logger.error(f'Failed to initialize Amazon geo-places client: {str(e)}')
-            self.geo_places_client = None
+
+    @property
+    def geo_places_client(self):
+        """Shared geo-places client from the process-wide registry."""
+        return registry.get('geo-places')
 
 
 class GeoRoutesClient:
     """Amazon Location Service geo-routes client wrapper."""
 
     def __init__(self):
-        """Initialize the Amazon geo-routes client."""
+        """Initialize the Amazon geo-routes client wrapper."""
         self.aws_region = os.environ.get('AWS_REGION', 'us-east-1')
-        self.geo_routes_client = None
-        config = botocore.config.Config(
-            connect_timeout=15, read_timeout=15, retries={'max_attempts': 3}
-        )
-        aws_access_key = os.environ.get('AWS_ACCESS_KEY_ID')
-        aws_secret_key = os.environ.get('AWS_SECRET_ACCESS_KEY')
-        aws_session_token = os.environ.get('AWS_SESSION_TOKEN')
-        try:
-            if aws_access_key and aws_secret_key:
-                client_args = {
-                    'aws_access_key_id': aws_access_key,
-                    'aws_secret_access_key': aws_secret_key,
-                    'region_name': self.aws_region,
-                    'config': config,
-                }
-                if aws_session_token:
-                    client_args['aws_session_token'] = aws_session_token
-                self.geo_routes_client = boto3.client('geo-routes', **client_args)
-            else:
-                self.geo_routes_client = boto3.client(
-                    'geo-routes', region_name=self.aws_region, config=config
-                )
-            logger.debug(f'Amazon geo-routes client initialized for region {self.aws_region}')
-        except Exception as e:
-            logger.error(f'Failed to initialize Amazon geo-routes client: {str(e)}')
-            self.geo_routes_client = None
 
+    @property
+    def geo_routes_client(self):
+        """Shared geo-routes client from the process-wide registry."""
+        return registry.get('geo-routes')
+
+
+# Geo backend: 'aws' for Amazon Location Service, 'fake' for an offline synthetic dataset
+GEO_BACKEND = os.environ.get('GEO_BACKEND', 'aws')
+
+if GEO_BACKEND == 'fake':
+    fake_geo_backend = install_fake_backend(registry)
+    logger.info(f'Using the fake geo backend with {len(fake_geo_backend.places)} places')
 
 # Initialize the geo-places client
 geo_places_client = GeoPlacesClient()
@@ -191,6 +211,210 @@ geo_places_client = GeoPlacesClient()
 # Initialize the geo-routes client
 geo_routes_client = GeoRoutesClient()
 
+# Geocoded BiasPositions shared by search_places and search_places_open_now
+geocode_cache = TTLCache(
+    'geocode',
+    ttl_seconds=float(os.environ.get('GEOCODE_CACHE_TTL_SECONDS', 86400)),
+    max_entries=int(os.environ.get('GEOCODE_CACHE_MAX_ENTRIES', 1024)),
+    path=os.environ.get('GEOCODE_CACHE_PATH') or None,
+)
+
+# Grid cell size in meters used to share reverse_geocode results between nearby points
+REVERSE_GEOCODE_CACHE_PRECISION_METERS = float(
+    os.environ.get('REVERSE_GEOCODE_CACHE_PRECISION_METERS', 10)
+)
+
+# Reverse geocoded addresses keyed by quantized grid cell
+reverse_geocode_cache = TTLCache(
+    'reverse_geocode',
+    ttl_seconds=float(os.environ.get('REVERSE_GEOCODE_CACHE_TTL_SECONDS', 7 * 86400)),
+    max_entries=int(os.environ.get('REVERSE_GEOCODE_CACHE_MAX_ENTRIES', 4096)),
+)
+
+
+async def geocode_position(query: str) -> Optional[list]:
+    """Return the [longitude, latitude] of the best geocode match for a query, or None."""
+    key = normalize_query(query)
+    position = geocode_cache.get(key)
+    if position is None:
+        geo_response = await geo_places('geocode', QueryText=query)
+        geo_items = geo_response.get('ResultItems', [])
+        if not geo_items:
+            return None
+        position = geo_items[0]['Position']
+        geocode_cache.set(key, position)
+    return position
+
+
+# PlaceId details served fresh for PLACE_CACHE_FRESH_SECONDS, then stale while refreshed
+place_cache = StaleWhileRevalidateCache(
+    'place',
+    fresh_seconds=float(os.environ.get('PLACE_CACHE_FRESH_SECONDS', 3600)),
+    stale_seconds=float(os.environ.get('PLACE_CACHE_STALE_SECONDS', 86400)),
+    max_entries=int(os.environ.get('PLACE_CACHE_MAX_ENTRIES', 4096)),
+)
+
+# Places seen in any geo-places response, answering search_nearby locally when dense enough
+place_index = PlaceIndex(int(os.environ.get('PLACE_INDEX_MAX_ENTRIES', 20000)))
+
+# Oldest indexed place search_nearby may return without calling the API
+PLACE_INDEX_MAX_AGE_SECONDS = float(os.environ.get('PLACE_INDEX_MAX_AGE_SECONDS', 6 * 3600))
+
+# Keep references to background refreshes so they are not garbage collected
+background_tasks = set()
+
+
+# Compiled weekly opening hours per PlaceId (False for places without structured hours)
+opening_hours_cache = TTLCache(
+    'opening_hours',
+    ttl_seconds=float(os.environ.get('PLACE_CACHE_FRESH_SECONDS', 3600))
+    + float(os.environ.get('PLACE_CACHE_STALE_SECONDS', 86400)),
+    max_entries=int(os.environ.get('PLACE_CACHE_MAX_ENTRIES', 4096)),
+)
+
+
+def compiled_opening_hours(place: Dict) -> Optional[OpeningHours]:
+    """Return the compiled opening hours of a place, compiling them once per PlaceId."""
+    place_id = place.get('PlaceId')
+    compiled = opening_hours_cache.get(place_id) if place_id else None
+    if compiled is None:
+        compiled = OpeningHours.from_place(place, LOCAL_TIMEZONE.utcoffset(None)) or False
+        if place_id:
+            opening_hours_cache.set(place_id, compiled)
+    return compiled or None
+
+
+def parse_open_window(open_at: Optional[str], window_minutes: int = 0) -> Tuple[datetime, datetime]:
+    """Return the [start, end) window to check; a date alone covers the whole local day."""
+    start = parse_departure_time(open_at)
+    if open_at and len(open_at.strip()) == 10:
+        return start, start + timedelta(days=1)
+    return start, start + timedelta(minutes=window_minutes)
+
+
+async def fetch_place(place_id: str) -> Dict:
+    """Call get_place and store the response in the place and opening hours caches."""
+    response = await geo_places('get_place', PlaceId=place_id, AdditionalFeatures=['Contact'])
+    place = {k: v for k, v in response.items() if k != 'ResponseMetadata'}
+    place_cache.set(place_id, place)
+    place_index.add([place])
+    opening_hours_cache.set(
+        place_id, OpeningHours.from_place(place, LOCAL_TIMEZONE.utcoffset(None)) or False
+    )
+    return response
+
+
+async def refresh_place(place_id: str):
+    """Background refresh of a stale place cache entry."""
+    try:
+        with bulk_priority():
+            await fetch_place(place_id)
+    except Exception as e:
+        logger.warning(f'Background get_place refresh failed for {place_id}: {str(e)}')
+    finally:
+        place_cache.end_refresh(place_id)
+
+
+def schedule_place_refresh(place_id: str):
+    """Refresh a stale place in the background unless a refresh is already running."""
+    if not place_cache.begin_refresh(place_id):
+        return
+    task = asyncio.create_task(refresh_place(place_id))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+
+def seed_place_cache(items: list):
+    """Seed the place cache and index with search results, which carry most get_place fields."""
+    place_index.add(items)
+    for item in items:
+        if item.get('PlaceId'):
+            place_cache.seed(item['PlaceId'], item)
+
+
+# How search_nearby and search_places_open_now grow their radius:
+# 'serial' (one radius per round trip), 'two_wave' (smaller half, then the rest) or 'parallel'
+RADIUS_EXPANSION_STRATEGY = os.environ.get('RADIUS_EXPANSION_STRATEGY', 'two_wave')
+
+
+def expansion_radii(initial_radius: float, max_radius: float, expansion_factor: float) -> list:
+    """Return the radii a serial expansion would try, smallest first."""
+    radii = []
+    current_radius = initial_radius
+    while current_radius <= max_radius:
+        radii.append(current_radius)
+        current_radius *= expansion_factor
+    return radii
+
+
+async def expand_radius(radii: list, fetch, satisfied, strategy: Optional[str] = None):
+    """Search growing radii until satisfied(fetch(radius)) holds, issuing radii speculatively.
+
+    Radii of a wave are requested concurrently and consumed smallest first, so the
+    answer is the same as with a serial expansion; outstanding larger radii are
+    cancelled as soon as a smaller one is satisfied. A call already sent to the API
+    cannot be taken back, so only radii cancelled before their call went out count
+    as cancelled, and api_calls counts the calls actually sent.
+
+    Returns:
+        (index of the satisfying radius or None, results of every radius up to it,
+        expansion metadata with API calls issued and round trips saved).
+    """
+
+    async def counted(radius, counter):
+        with count_geo_calls(counter):
+            return await fetch(radius)
+
+    strategy = strategy or RADIUS_EXPANSION_STRATEGY
+    indices = list(range(len(radii)))
+    if strategy == 'serial':
+        waves = [[i] for i in indices]
+    elif strategy == 'parallel':
+        waves = [indices]
+    else:
+        half = (len(indices) + 1) // 2
+        waves = [indices[:half], indices[half:]]
+    results = []
+    found = None
+    counters = []
+    cancelled = round_trips = 0
+    for wave in filter(None, waves):
+        round_trips += 1
+        wave_counters = [{'issued': 0} for _ in wave]
+        counters.extend(wave_counters)
+        tasks = [
+            asyncio.ensure_future(counted(radii[i], counter))
+            for i, counter in zip(wave, wave_counters)
+        ]
+        try:
+            for position, task in enumerate(tasks):
+                results.append(await task)
+                if satisfied(results[-1]):
+                    found = wave[position]
+                    break
+        finally:
+            for task, counter in zip(tasks, wave_counters):
+                if not task.done():
+                    task.cancel()
+                    if not counter['issued']:
+                        cancelled += 1
+                # Errors of speculative calls that were not needed are not reported
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        if found is not None:
+            break
+    serial_round_trips = found + 1 if found is not None else len(radii)
+    return (
+        found,
+        results,
+        {
+            'strategy': strategy,
+            'api_calls': sum(counter['issued'] for counter in counters),
+            'cancelled': cancelled,
+            'round_trips': round_trips,
+            'round_trips_saved': serial_round_trips - round_trips,
+        },
+    )
+
 
 @mcp.tool()
 async def search_places(
@@ -210,12 +434,10 @@ async def search_places(
         await ctx.error(error_msg)
         return {'error': error_msg}
     try:
-        geo_response = geo_places_client.geo_places_client.geocode(QueryText=query)
-        geo_items = geo_response.get('ResultItems', [])
-        if geo_items:
-            geo_point = geo_items[0]['Position']
-            bias_position = geo_point
-            response = geo_places_client.geo_places_client.search_text(
+        bias_position = await geocode_position(query)
+        if bias_position:
+            response = await geo_places(
+                'search_text',
                 QueryText=query,
                 MaxResults=max_results,
                 BiasPosition=bias_position,
@@ -225,13 +447,15 @@ async def search_places(
             if not places:
                 lon, lat = bias_position
                 bounding_box = [lon - 0.05, lat - 0.05, lon + 0.05, lat + 0.05]
-                response = geo_places_client.geo_places_client.search_text(
+                response = await geo_places(
+                    'search_text',
                     QueryText=query,
                     MaxResults=max_results,
                     Filter={'BoundingBox': bounding_box},
                     AdditionalFeatures=['Contact'],
                 )
                 places = response.get('ResultItems', [])
+            seed_place_cache(places)
         else:
             error_msg = f'Could not geocode query "{query}" for BiasPosition.'
             await ctx.error(error_msg)
@@ -248,30 +472,6 @@ async def search_places(
                 'faxes': [f['Value'] for f in contacts.get('Faxes', [])] if contacts else [],
             }
 
-        def parse_opening_hours(result):
-            oh = result.get('OpeningHours')
-            if not oh:
-                contacts = result.get('Contacts', {})
-                oh = contacts.get('OpeningHours') if contacts else None
-            if not oh:
-                return []
-            # Normalize to list of dicts with display and components
-            if isinstance(oh, dict):
-                oh = [oh]
-            parsed = []
-            for entry in oh:
-                parsed.append(
-                    {
-                        'display': entry.get('Display', []) or entry.get('display', []),
-                        'components': entry.get('Components', []) or entry.get('components', []),
-                        'open_now': entry.get('OpenNow', None),
-                        'categories': [cat.get('Name') for cat in entry.get('Categories', [])]
-                        if 'Categories' in entry
-                        else [],
-                    }
-                )
-            return parsed
-
         result_places = []
         for result in places:
             if mode == 'raw':
@@ -323,9 +523,13 @@ async def get_place(
         await ctx.error(error_msg)
         return {'error': error_msg}
     try:
-        response = geo_places_client.geo_places_client.get_place(
-            PlaceId=place_id, AdditionalFeatures=['Contact']
-        )
+        response = None
+        if mode != 'raw':
+            response, fresh = place_cache.lookup(place_id)
+            if response is not None and not fresh:
+                schedule_place_refresh(place_id)
+        if response is None:
+            response = await fetch_place(place_id)
         if mode == 'raw':
             return response
         contacts = {
@@ -343,29 +547,6 @@ async def get_place(
             else [],
         }
 
-        def parse_opening_hours(result):
-            oh = result.get('OpeningHours')
-            if not oh:
-                contacts = result.get('Contacts', {})
-                oh = contacts.get('OpeningHours') if contacts else None
-            if not oh:
-                return []
-            if isinstance(oh, dict):
-                oh = [oh]
-            parsed = []
-            for entry in oh:
-                parsed.append(
-                    {
-                        'display': entry.get('Display', []) or entry.get('display', []),
-                        'components': entry.get('Components', []) or entry.get('components', []),
-                        'open_now': entry.get('OpenNow', None),
-                        'categories': [cat.get('Name') for cat in entry.get('Categories', [])]
-                        if 'Categories' in entry
-                        else [],
-                    }
-                )
-            return parsed
-
         opening_hours = parse_opening_hours(response)
         result = {
             'name': response.get('Title', 'Not available'),
@@ -387,6 +568,38 @@ async def get_place(
         return {'error': str(e)}
 
 
+async def reverse_geocode_position(
+    longitude: float,
+    latitude: float,
+    precision_m: float = REVERSE_GEOCODE_CACHE_PRECISION_METERS,
+) -> Tuple[Dict, bool]:
+    """Return the address of a position and whether it came from the cache.
+
+    Results are shared by every point in the same precision_m grid cell. A
+    response without a place is returned as {'raw_response': ...} and not cached.
+    """
+    cache_key = cell_key(longitude, latitude, precision_m)
+    cached = reverse_geocode_cache.get(cache_key)
+    if cached is not None:
+        return cached, True
+    response = await geo_places('reverse_geocode', QueryPosition=[longitude, latitude])
+    logger.debug(f'reverse_geocode raw response: {response}')
+    place = response.get('Place', {})
+    if not place:
+        return {'raw_response': response}, False
+    result = {
+        'name': place.get('Label') or place.get('Title', 'Unknown'),
+        'coordinates': {
+            'longitude': place.get('Geometry', {}).get('Point', [0, 0])[0],
+            'latitude': place.get('Geometry', {}).get('Point', [0, 0])[1],
+        },
+        'categories': [cat.get('Name') for cat in place.get('Categories', [])],
+        'address': place.get('Address', {}).get('Label', ''),
+    }
+    reverse_geocode_cache.set(cache_key, result)
+    return result, False
+
+
 @mcp.tool()
 async def reverse_geocode(
     ctx: Context,
@@ -401,23 +614,9 @@ async def reverse_geocode(
         return {'error': error_msg}
     logger.debug(f'Reverse geocoding for longitude: {longitude}, latitude: {latitude}')
     try:
-        response = geo_places_client.geo_places_client.reverse_geocode(
-            QueryPosition=[longitude, latitude]
-        )
-        print(f'reverse_geocode raw response: {response}')
-        place = response.get('Place', {})
-        if not place:
-            return {'raw_response': response}
-        result = {
-            'name': place.get('Label') or place.get('Title', 'Unknown'),
-            'coordinates': {
-                'longitude': place.get('Geometry', {}).get('Point', [0, 0])[0],
-                'latitude': place.get('Geometry', {}).get('Point', [0, 0])[1],
-            },
-            'categories': [cat.get('Name') for cat in place.get('Categories', [])],
-            'address': place.get('Address', {}).get('Label', ''),
-        }
-        logger.debug(f'Reverse geocoded address for coordinates: {longitude}, {latitude}')
+        result, from_cache = await reverse_geocode_position(longitude, latitude)
+        if not from_cache:
+            logger.debug(f'Reverse geocoded address for coordinates: {longitude}, {latitude}')
         return result
     except botocore.exceptions.ClientError as e:
         error_msg = f'AWS geo-places Service error: {str(e)}'
@@ -431,6 +630,43 @@ async def reverse_geocode(
         return {'error': error_msg}
 
 
+def summarize_nearby_place(item: Dict) -> Dict:
+    """Return the search_nearby summary of a place result item."""
+    contacts = {
+        'phones': [p['Value'] for p in item.get('Contacts', {}).get('Phones', [])]
+        if item.get('Contacts')
+        else [],
+        'websites': [w['Value'] for w in item.get('Contacts', {}).get('Websites', [])]
+        if item.get('Contacts')
+        else [],
+        'emails': [e['Value'] for e in item.get('Contacts', {}).get('Emails', [])]
+        if item.get('Contacts')
+        else [],
+        'faxes': [f['Value'] for f in item.get('Contacts', {}).get('Faxes', [])]
+        if item.get('Contacts')
+        else [],
+    }
+    opening_hours = parse_opening_hours(item)
+    return {
+        'place_id': item.get('PlaceId', 'Not available'),
+        'name': item.get('Title', 'Not available'),
+        'address': item.get('Address', {}).get('Label', 'Not available'),
+        'coordinates': {
+            'longitude': item.get('Position', [None, None])[0],
+            'latitude': item.get('Position', [None, None])[1],
+        },
+        'categories': [cat.get('Name') for cat in item.get('Categories', [])]
+        if item.get('Categories')
+        else [],
+        'contacts': contacts,
+        'opening_hours': opening_hours,
+    }
+
+
+# Results requested per search_nearby call when a query is filtered locally (API maximum: 100)
+SEARCH_NEARBY_QUERY_PAGE_SIZE = int(os.environ.get('SEARCH_NEARBY_QUERY_PAGE_SIZE', 50))
+
+
 @mcp.tool()
 async def search_nearby(
     ctx: Context,
@@ -442,7 +678,7 @@ async def search_nearby(
     query: Optional[str] = Field(default=None, description='Optional search query'),
     radius: int = Field(default=500, description='Search radius in meters', ge=1, le=50000),
 ) -> Dict:
-    """Search for places near a location using Amazon Location Service geo-places search_nearby API. If no results, expand the radius up to max_radius. Output is standardized and includes all fields, even if empty or not available."""
+    """Search for places near a location using Amazon Location Service geo-places search_nearby API. If no results, expand the radius up to max_radius. Output is standardized and includes all fields, even if empty or not available. Answered from the local index of previously seen places when it holds enough fresh ones inside the radius. A query keeps only places whose title or category names contain it, whether they come from the index or the API."""
     # Moved from parameters to local variables
     max_results = 5  # Maximum number of results to return
     max_radius = 10000  # Maximum search radius in meters for expansion
@@ -458,86 +694,47 @@ async def search_nearby(
         await ctx.error(error_msg)
         return {'error': error_msg}
     try:
-        current_radius = radius
-        while current_radius <= max_radius:
+
+        async def fetch(current_radius):
             params = {
                 'QueryPosition': [longitude, latitude],
-                'MaxResults': max_results,
+                # The API cannot filter by text, so a query needs a wider page to filter locally
+                'MaxResults': SEARCH_NEARBY_QUERY_PAGE_SIZE if query else max_results,
                 'QueryRadius': int(current_radius),
                 'AdditionalFeatures': ['Contact'],
             }
-            response = geo_places_client.geo_places_client.search_nearby(**params)
+            response = await geo_places('search_nearby', **params)
             items = response.get('ResultItems', [])
-            results = []
-            for item in items:
-                if mode == 'raw':
-                    results.append(item)
-                else:
-                    contacts = {
-                        'phones': [p['Value'] for p in item.get('Contacts', {}).get('Phones', [])]
-                        if item.get('Contacts')
-                        else [],
-                        'websites': [
-                            w['Value'] for w in item.get('Contacts', {}).get('Websites', [])
-                        ]
-                        if item.get('Contacts')
-                        else [],
-                        'emails': [e['Value'] for e in item.get('Contacts', {}).get('Emails', [])]
-                        if item.get('Contacts')
-                        else [],
-                        'faxes': [f['Value'] for f in item.get('Contacts', {}).get('Faxes', [])]
-                        if item.get('Contacts')
-                        else [],
-                    }
+            seed_place_cache(items)
+            # Same keyword match as the place index, so both sources filter alike
+            items = [item for item in items if matches_keyword(item, query)][:max_results]
+            return [item if mode == 'raw' else summarize_nearby_place(item) for item in items]
 
-                    def parse_opening_hours(result):
-                        oh = result.get('OpeningHours')
-                        if not oh:
-                            contacts = result.get('Contacts', {})
-                            oh = contacts.get('OpeningHours') if contacts else None
-                        if not oh:
-                            return []
-                        if isinstance(oh, dict):
-                            oh = [oh]
-                        parsed = []
-                        for entry in oh:
-                            parsed.append(
-                                {
-                                    'display': entry.get('Display', [])
-                                    or entry.get('display', []),
-                                    'components': entry.get('Components', [])
-                                    or entry.get('components', []),
-                                    'open_now': entry.get('OpenNow', None),
-                                    'categories': [
-                                        cat.get('Name') for cat in entry.get('Categories', [])
-                                    ]
-                                    if 'Categories' in entry
-                                    else [],
-                                }
-                            )
-                        return parsed
-
-                    opening_hours = parse_opening_hours(item)
-                    results.append(
-                        {
-                            'place_id': item.get('PlaceId', 'Not available'),
-                            'name': item.get('Title', 'Not available'),
-                            'address': item.get('Address', {}).get('Label', 'Not available'),
-                            'coordinates': {
-                                'longitude': item.get('Position', [None, None])[0],
-                                'latitude': item.get('Position', [None, None])[1],
-                            },
-                            'categories': [cat.get('Name') for cat in item.get('Categories', [])]
-                            if item.get('Categories')
-                            else [],
-                            'contacts': contacts,
-                            'opening_hours': opening_hours,
-                        }
-                    )
-            if results:
-                return {'places': results, 'radius_used': current_radius}
-            current_radius *= expansion_factor
-        return {'places': [], 'radius_used': current_radius / expansion_factor}
+        indexed = place_index.nearby(
+            longitude, latitude, radius, PLACE_INDEX_MAX_AGE_SECONDS, max_results, query
+        )
+        if indexed is not None:
+            return {
+                'places': [summarize_nearby_place(entry['item']) for entry in indexed],
+                'radius_used': radius,
+                'source': 'index',
+                'oldest_seconds': round(max(entry['age_seconds'] for entry in indexed)),
+            }
+        radii = expansion_radii(radius, max_radius, expansion_factor)
+        found, attempts, expansion = await expand_radius(radii, fetch, bool)
+        if found is not None:
+            return {
+                'places': attempts[-1],
+                'radius_used': radii[found],
+                'source': 'api',
+                'expansion': expansion,
+            }
+        return {
+            'places': [],
+            'radius_used': radii[-1] if radii else radius,
+            'source': 'api',
+            'expansion': expansion,
+        }
     except Exception as e:
         print(f'search_nearby error: {e}')
         await ctx.error(f'search_nearby error: {e}')
@@ -551,8 +748,12 @@ async def search_places_open_now(
     initial_radius: int = Field(
         default=500, description='Initial search radius in meters for expansion', ge=1, le=50000
     ),
+    open_at: Optional[str] = Field(
+        default=None,
+        description='Optional ISO 8601 time (e.g. entregas.data_prevista) to check instead of now; a date alone means any time that day',
+    ),
 ) -> Dict:
-    """Search for places that are open now using Amazon Location Service geo-places search_text API and filter by opening hours. If no open places, expand the search radius up to max_radius. Uses BiasPosition from geocode."""
+    """Search for places that are open now using Amazon Location Service geo-places search_text API and filter by opening hours. If no open places, expand the search radius up to max_radius. Uses BiasPosition from geocode. With open_at, places are checked against their compiled weekly opening hours instead of the OpenNow flag."""
     # Moved from parameters to local variables
     max_results = 5  # Maximum number of results to return
     max_radius = 50000  # Maximum search radius in meters for expansion
@@ -568,35 +769,33 @@ async def search_places_open_now(
         return {'error': error_msg}
     logger.debug(f'Searching for places open now with query: {query}, max_results: {max_results}')
     try:
-        geo_response = geo_places_client.geo_places_client.geocode(QueryText=query)
-        geo_items = geo_response.get('ResultItems', [])
-        if not geo_items:
+        bias_position = await geocode_position(query)
+        if not bias_position:
             error_msg = f'Could not geocode query "{query}" for BiasPosition.'
             logger.error(error_msg)
             await ctx.error(error_msg)
             return {'error': error_msg}
-        bias_position = geo_items[0]['Position']
-        current_radius = initial_radius
-        open_places = []
-        all_places = []
-        first_attempt = True
-        while current_radius <= max_radius and len(open_places) < max_results:
+        window = parse_open_window(open_at) if open_at else None
+        radii = expansion_radii(initial_radius, max_radius, expansion_factor)
+
+        async def fetch(current_radius):
             search_kwargs = {
                 'QueryText': query,
                 'MaxResults': max_results * 2,  # Fetch more to allow filtering
                 'AdditionalFeatures': ['Contact'],
             }
-            if first_attempt:
+            if current_radius == radii[0]:
                 # Use BiasPosition for the first (smallest) search
                 search_kwargs['BiasPosition'] = bias_position
-                first_attempt = False
             else:
                 # Use Filter.Circle for expanded radius searches
                 search_kwargs['Filter'] = {
                     'Circle': {'Center': bias_position, 'Radius': int(current_radius)}
                 }
-            response = geo_places_client.geo_places_client.search_text(**search_kwargs)
+            response = await geo_places('search_text', **search_kwargs)
             result_items = response.get('ResultItems', [])
+            seed_place_cache(result_items)
+            attempt_places = []
             for idx, result in enumerate(result_items):
                 opening_hours = result.get('OpeningHours')
                 open_now = False
@@ -639,6 +838,9 @@ async def search_places_open_now(
                     elif isinstance(ch, dict):
                         if ch.get('OpenNow', False):
                             open_now = True
+                if window is not None:
+                    compiled = compiled_opening_hours(result)
+                    open_now = compiled is not None and compiled.is_open_between(*window)
                 place_data = {
                     'place_id': result.get('PlaceId', ''),
                     'name': result.get('Title', 'Unknown'),
@@ -655,12 +857,14 @@ async def search_places_open_now(
                     'opening_hours': opening_hours_info,
                     'open_now': open_now,
                 }
-                all_places.append(place_data)
-                if open_now and len(open_places) < max_results:
-                    open_places.append(place_data)
-            if open_places:
-                break
-            current_radius *= expansion_factor
+                attempt_places.append(place_data)
+            return attempt_places
+
+        found, attempts, expansion = await expand_radius(
+            radii, fetch, lambda places: any(place['open_now'] for place in places)
+        )
+        all_places = [place for attempt in attempts for place in attempt]
+        open_places = [place for place in all_places if place['open_now']][:max_results]
         if not open_places:
             print(
                 'search_places_open_now: No places found open now after expanding radius. Check OpeningHours and OpenNow fields above.'
@@ -669,8 +873,11 @@ async def search_places_open_now(
             'query': query,
             'open_places': open_places,
             'all_places': all_places,
-            'radius_used': current_radius / expansion_factor,
+            'radius_used': radii[found if found is not None else -1] if radii else initial_radius,
+            'expansion': expansion,
         }
+        if window is not None:
+            result['open_at'] = window[0].isoformat()
         logger.debug(f'Found {len(open_places)} places open now for query: {query}')
         return result
     except botocore.exceptions.ClientError as e:
@@ -685,6 +892,213 @@ async def search_places_open_now(
         return {'error': str(e)}
 
 
+# Largest number of PlaceIds accepted by places_open_at
+OPEN_AT_MAX_PLACES = int(os.environ.get('OPEN_AT_MAX_PLACES', 200))
+
+
+@mcp.tool()
+async def places_open_at(
+    ctx: Context,
+    place_ids: str = Field(description='JSON array of PlaceIds, e.g. from search_places'),
+    open_at: Optional[str] = Field(
+        default=None,
+        description='ISO 8601 time to check, e.g. entregas.data_prevista (default: now); a date alone means any time that day',
+    ),
+    window_minutes: int = Field(
+        default=0,
+        description='Also count a place as open if it opens within this many minutes after open_at',
+        ge=0,
+        le=7 * 24 * 60,
+    ),
+) -> Dict:
+    """Check which places are open at a time, or during a delivery window, from their opening hours.
+
+    Opening hours come from cached places, compiled once into weekly intervals, so checking
+    any time is a local lookup; only places not seen before are fetched with get_place.
+
+    Returns:
+        dict with the checked window and, per place, whether it is open (None when the place
+        has no structured opening hours) and its displayed hours.
+    """
+    if not geo_places_client.geo_places_client:
+        error_msg = 'AWS geo-places client not initialized'
+        await ctx.error(error_msg)
+        return {'error': error_msg}
+    try:
+        ids = parse_json_list(place_ids, 'place_ids')
+        if len(ids) > OPEN_AT_MAX_PLACES:
+            raise ValueError(f'Too many places ({len(ids)}), the maximum is {OPEN_AT_MAX_PLACES}')
+        start, end = parse_open_window(open_at, window_minutes)
+    except ValueError as e:
+        await ctx.error(str(e))
+        return {'error': str(e)}
+
+    async def load(place_id: str):
+        place, fresh = place_cache.lookup(place_id)
+        if place is not None:
+            if not fresh:
+                schedule_place_refresh(place_id)
+            return place, True
+        return await fetch_place(place_id), False
+
+    loaded = await asyncio.gather(*(load(str(p)) for p in ids), return_exceptions=True)
+    places = []
+    for place_id, outcome in zip(ids, loaded):
+        if isinstance(outcome, Exception):
+            places.append({'place_id': place_id, 'error': str(outcome)})
+            continue
+        place, cached = outcome
+        place = {**place, 'PlaceId': place_id}
+        compiled = compiled_opening_hours(place)
+        places.append(
+            {
+                'place_id': place_id,
+                'name': place.get('Title', 'Not available'),
+                'open': None if compiled is None else compiled.is_open_between(start, end),
+                'opening_hours': [entry['display'] for entry in parse_opening_hours(place)],
+                'from_cache': cached,
+            }
+        )
+    return {
+        'open_at': start.isoformat(),
+        'window_end': end.isoformat() if end > start else None,
+        'places': places,
+        'open_count': sum(p.get('open') is True for p in places),
+    }
+
+
+# Origin/destination snapping used for route cache keys, in meters
+ROUTE_CACHE_PRECISION_METERS = float(os.environ.get('ROUTE_CACHE_PRECISION_METERS', 50))
+
+# Route cache TTL for off-peak and peak (weekday rush hour) departure buckets
+ROUTE_CACHE_TTL_SECONDS = float(os.environ.get('ROUTE_CACHE_TTL_SECONDS', 6 * 3600))
+ROUTE_CACHE_PEAK_TTL_SECONDS = float(os.environ.get('ROUTE_CACHE_PEAK_TTL_SECONDS', 900))
+
+# Local hours (start inclusive, end exclusive) treated as weekday rush hour
+ROUTE_CACHE_PEAK_HOURS = ((6, 10), (16, 20))
+
+# Offset of the operation's local time from UTC; Brazil has no DST since 2019
+LOCAL_TIMEZONE = timezone(timedelta(hours=float(os.environ.get('LOCAL_UTC_OFFSET_HOURS', -3))))
+
+# Route summaries keyed by snapped endpoints, travel mode, optimization and hour of week
+route_cache = TTLCache(
+    'route',
+    ttl_seconds=ROUTE_CACHE_TTL_SECONDS,
+    max_entries=int(os.environ.get('ROUTE_CACHE_MAX_ENTRIES', 8192)),
+)
+
+# Encoded leg geometries under the same keys as route_cache; polylines are large, so fewer
+route_geometry_cache = TTLCache(
+    'route_geometry',
+    ttl_seconds=ROUTE_CACHE_TTL_SECONDS,
+    max_entries=int(os.environ.get('ROUTE_GEOMETRY_CACHE_MAX_ENTRIES', 1024)),
+)
+
+# Default Douglas-Peucker tolerance and size limit of geometries returned by route_geometry
+ROUTE_GEOMETRY_TOLERANCE_METERS = float(os.environ.get('ROUTE_GEOMETRY_TOLERANCE_METERS', 10))
+ROUTE_GEOMETRY_MAX_BYTES = int(os.environ.get('ROUTE_GEOMETRY_MAX_BYTES', 4000))
+
+
+def parse_departure_time(departure_time: Optional[str]) -> datetime:
+    """Parse an ISO 8601 departure time; naive values are local time, None means now."""
+    if not departure_time:
+        return datetime.now(LOCAL_TIMEZONE)
+    departure = datetime.fromisoformat(departure_time)
+    if departure.tzinfo is None:
+        departure = departure.replace(tzinfo=LOCAL_TIMEZONE)
+    return departure
+
+
+def departure_bucket(departure: datetime) -> int:
+    """Return the local hour of week (0 = Monday 00h) of a departure time."""
+    local = departure.astimezone(LOCAL_TIMEZONE)
+    return local.weekday() * 24 + local.hour
+
+
+def route_cache_ttl(bucket: int) -> float:
+    """Return the route cache TTL for an hour-of-week bucket."""
+    day, hour = divmod(bucket, 24)
+    if day < 5 and any(start <= hour < end for start, end in ROUTE_CACHE_PEAK_HOURS):
+        return ROUTE_CACHE_PEAK_TTL_SECONDS
+    return ROUTE_CACHE_TTL_SECONDS
+
+
+async def route_summary(
+    departure_position: list,
+    destination_position: list,
+    travel_mode: str = 'Car',
+    optimize_for: str = 'FastestRoute',
+    departure_time: Optional[str] = None,
+    include_geometry: bool = False,
+) -> Dict:
+    """Return the calculate_route summary for one origin/destination pair, using the route cache.
+
+    With include_geometry the summary also carries 'leg_polylines', the
+    FlexiblePolyline of each leg, kept in a cache of its own.
+    """
+    params = {
+        'Origin': departure_position,
+        'Destination': destination_position,
+        'TravelMode': travel_mode,
+        'TravelStepType': 'TurnByTurn',
+        'OptimizeRoutingFor': optimize_for,
+    }
+    if include_geometry:
+        params['LegGeometryFormat'] = 'FlexiblePolyline'
+    departure = parse_departure_time(departure_time)
+    if departure_time:
+        params['DepartureTime'] = departure.isoformat()
+    bucket = departure_bucket(departure)
+    cache_key = (
+        cell_key(*departure_position, ROUTE_CACHE_PRECISION_METERS),
+        cell_key(*destination_position, ROUTE_CACHE_PRECISION_METERS),
+        travel_mode,
+        optimize_for,
+        bucket,
+    )
+    cached = route_cache.get(cache_key)
+    if cached is not None and include_geometry:
+        leg_polylines = route_geometry_cache.get(cache_key)
+        cached = None if leg_polylines is None else {**cached, 'leg_polylines': leg_polylines}
+    if cached is not None:
+        return {**cached, 'from_cache': True}
+    response = await geo_routes('calculate_routes', **params)
+    routes = response.get('Routes', [])
+    if not routes:
+        return {'error': 'No route found'}
+    route = routes[0]
+    distance_meters = route.get('Distance', None)
+    duration_seconds = route.get('DurationSeconds', None)
+    turn_by_turn = []
+    for leg in route.get('Legs', []):
+        vehicle_leg_details = leg.get('VehicleLegDetails', {})
+        for step in vehicle_leg_details.get('TravelSteps', []):
+            step_summary = {
+                'distance_meters': step.get('Distance'),
+                'duration_seconds': step.get('Duration'),
+                'type': step.get('Type'),
+                'road_name': step.get('NextRoad', {}).get('RoadName')
+                if step.get('NextRoad')
+                else None,
+            }
+            turn_by_turn.append(step_summary)
+    result = {
+        'distance_meters': distance_meters,
+        'duration_seconds': duration_seconds,
+        'turn_by_turn': turn_by_turn,
+    }
+    route_cache.set(cache_key, result, ttl_seconds=route_cache_ttl(bucket))
+    if include_geometry:
+        leg_polylines = [
+            leg['Geometry']['Polyline']
+            for leg in route.get('Legs', [])
+            if leg.get('Geometry', {}).get('Polyline')
+        ]
+        route_geometry_cache.set(cache_key, leg_polylines, ttl_seconds=route_cache_ttl(bucket))
+        result = {**result, 'leg_polylines': leg_polylines}
+    return {**result, 'from_cache': False}
+
+
 @mcp.tool()
 async def calculate_route(
     ctx: Context,
@@ -700,6 +1114,10 @@ async def calculate_route(
         default='FastestRoute',
         description="Optimize route for 'FastestRoute' or 'ShortestRoute' (default: 'FastestRoute')",
     ),
+    departure_time: Optional[str] = Field(
+        default=None,
+        description='Optional ISO 8601 departure time, e.g. 2025-05-20T08:00:00-03:00 (default: now)',
+    ),
 ) -> dict:
     """Calculate a route and return summary info and turn-by-turn directions.
 
@@ -708,138 +1126,1525 @@ async def calculate_route(
         destination_position: [lon, lat]
         travel_mode: 'Car', 'Truck', 'Walking', or 'Bicycle' (default: 'Car')
         optimize_for: 'FastestRoute' or 'ShortestRoute' (default: 'FastestRoute')
+        departure_time: ISO 8601 departure time (default: now)
 
     Returns:
-        dict with distance, duration, and turn_by_turn directions (list of step summaries).
+        dict with distance, duration, turn_by_turn directions (list of step summaries)
+        and from_cache, which is true when the route was served from the route cache.
     """
-    include_leg_geometry = False
-    mode = 'summary'
-    client = GeoRoutesClient().geo_routes_client
+    client = geo_routes_client.geo_routes_client
 
     # Check if client is None before proceeding
     if client is None:
         return {'error': 'Failed to initialize Amazon geo-routes client'}
 
-    params = {
-        'Origin': departure_position,
-        'Destination': destination_position,
-        'TravelMode': travel_mode,
-        'TravelStepType': 'TurnByTurn',
-        'OptimizeRoutingFor': optimize_for,
-    }
-    if include_leg_geometry:
-        params['LegGeometryFormat'] = 'FlexiblePolyline'
     try:
-        response = await asyncio.to_thread(client.calculate_routes, **params)
-        if mode == 'raw':
-            return response
-        routes = response.get('Routes', [])
-        if not routes:
-            return {'error': 'No route found'}
-        route = routes[0]
-        distance_meters = route.get('Distance', None)
-        duration_seconds = route.get('DurationSeconds', None)
-        turn_by_turn = []
-        for leg in route.get('Legs', []):
-            vehicle_leg_details = leg.get('VehicleLegDetails', {})
-            for step in vehicle_leg_details.get('TravelSteps', []):
-                step_summary = {
-                    'distance_meters': step.get('Distance'),
-                    'duration_seconds': step.get('Duration'),
-                    'type': step.get('Type'),
-                    'road_name': step.get('NextRoad', {}).get('RoadName')
-                    if step.get('NextRoad')
-                    else None,
-                }
-                turn_by_turn.append(step_summary)
-        return {
-            'distance_meters': distance_meters,
-            'duration_seconds': duration_seconds,
-            'turn_by_turn': turn_by_turn,
-        }
+        return await route_summary(
+            departure_position, destination_position, travel_mode, optimize_for, departure_time
+        )
     except Exception as e:
         return {'error': str(e)}
 
 
+def route_points(leg_polylines: list) -> np.ndarray:
+    """Decode and join the leg polylines of a route into one (n, 2) [lon, lat] array."""
+    legs = [decode_flexible_polyline(encoded)[0] for encoded in leg_polylines]
+    # Each leg starts where the previous one ended
+    legs = [legs[0]] + [leg[1:] for leg in legs[1:]] if legs else []
+    return np.concatenate(legs) if legs else np.empty((0, 2))
+
+
 @mcp.tool()
-async def optimize_waypoints(
+async def route_geometry(
     ctx: Context,
-    origin_position: list = Field(description='Origin position as [longitude, latitude]'),
+    departure_position: list = Field(description='Departure position as [longitude, latitude]'),
     destination_position: list = Field(
         description='Destination position as [longitude, latitude]'
     ),
-    waypoints: list = Field(
-        description='List of intermediate waypoints, each as a dict with at least Position [longitude, latitude], optionally Id'
-    ),
     travel_mode: str = Field(
         default='Car',
         description="Travel mode: 'Car', 'Truck', 'Walking', or 'Bicycle' (default: 'Car')",
     ),
-    mode: str = Field(
-        default='summary',
-        description="Output mode: 'summary' (default) or 'raw' for all AWS fields",
+    output_format: str = Field(
+        default='polyline',
+        description="'polyline' for a FlexiblePolyline string or 'coordinates' for a [[lon, lat], ...] array",
+    ),
+    max_bytes: int = Field(
+        default=ROUTE_GEOMETRY_MAX_BYTES,
+        description='Size limit of the returned geometry in bytes',
+        ge=200,
+        le=100000,
     ),
 ) -> Dict:
-    """Optimize the order of waypoints using Amazon Location Service geo-routes optimize_waypoints API (V2).
+    """Return the shape of the fastest route, simplified to fit a size limit, for drawing maps.
 
-    Returns summary (optimized order, total distance, duration, etc.) or full response if mode='raw'.
-    """
-    client = GeoRoutesClient().geo_routes_client
+    The route's FlexiblePolyline legs are decoded, joined and simplified with Douglas-Peucker,
+    starting at ROUTE_GEOMETRY_TOLERANCE_METERS and coarsening only as much as max_bytes
+    requires. Geometries are cached with the route summaries.
 
-    # Check if client is None before proceeding
-    if client is None:
+    Returns:
+        dict with distance, duration, the geometry as 'polyline' (decode with any
+        FlexiblePolyline library) or 'coordinates', point counts before and after
+        simplification, the tolerance used and from_cache.
+    """
+    if geo_routes_client.geo_routes_client is None:
         return {'error': 'Failed to initialize Amazon geo-routes client'}
-
-    params = {
-        'Origin': origin_position,
-        'Destination': destination_position,
-        'Waypoints': [{'Position': wp['Position']} for wp in waypoints],
-        'TravelMode': travel_mode,
-    }
+    if output_format not in ('polyline', 'coordinates'):
+        error_msg = "output_format must be 'polyline' or 'coordinates'"
+        await ctx.error(error_msg)
+        return {'error': error_msg}
     try:
-        response = await asyncio.to_thread(client.optimize_waypoints, **params)
-        if mode == 'raw':
-            return response
-        routes = response.get('Routes', [])
-        if not routes:
-            return {'error': 'No route found'}
-        route = routes[0]
-        distance_meters = route.get('Distance', None)
-        duration_seconds = route.get('DurationSeconds', None)
-        optimized_order = [wp.get('Position') for wp in route.get('Waypoints', [])]
-        return {
-            'distance_meters': distance_meters,
-            'duration_seconds': duration_seconds,
-            'optimized_order': optimized_order,
+        summary = await route_summary(
+            departure_position, destination_position, travel_mode, include_geometry=True
+        )
+        if 'error' in summary:
+            return summary
+        points = route_points(summary['leg_polylines'])
+        if not len(points):
+            return {'error': 'Route has no geometry'}
+        if output_format == 'coordinates':
+            # A [lon, lat] pair with 5 decimals takes about 24 bytes of JSON
+            budget = {'max_bytes': np.inf, 'max_points': max(2, max_bytes // 24)}
+        else:
+            budget = {'max_bytes': max_bytes}
+        kept, encoded, tolerance = await asyncio.to_thread(
+            fit_to_budget, points, ROUTE_GEOMETRY_TOLERANCE_METERS, **budget
+        )
+        result = {
+            'distance_meters': summary['distance_meters'],
+            'duration_seconds': summary['duration_seconds'],
+            'points_total': len(points),
+            'points_returned': len(kept),
+            'tolerance_meters': round(tolerance, 1),
+            'from_cache': summary['from_cache'],
         }
+        if output_format == 'coordinates':
+            result['coordinates'] = np.round(kept, 5).tolist()
+        else:
+            result['polyline'] = encoded
+        return result
+    except ValueError as e:
+        await ctx.error(f'Invalid route geometry: {str(e)}')
+        return {'error': str(e)}
     except Exception as e:
-        # import traceback
-        # return {'error': str(e), 'traceback': traceback.format_exc()}
         return {'error': str(e)}
 
 
-# Add a health check route handler
-async def health_check(request):
-    return JSONResponse({'status': 'healthy', 'service': 'aws-location-mcp-server'})
+# Maximum concurrent route calculations per calculate_routes_batch call
+BATCH_ROUTE_CONCURRENCY = int(os.environ.get('BATCH_ROUTE_CONCURRENCY', 8))
 
+# Maximum number of origin/destination pairs accepted by calculate_routes_batch
+BATCH_ROUTE_MAX_PAIRS = int(os.environ.get('BATCH_ROUTE_MAX_PAIRS', 200))
 
-if __name__ == '__main__':
-    # Get port from environment or use default
-    port = int(os.environ.get('PORT', 5500))
 
-    # Create a custom Starlette app that includes our health check
-    # AND properly integrates with the MCP SSE implementation
-    app = Starlette(
-        routes=[
-            Route(f'{BASE_PATH}/', health_check),
-            Route(f'{BASE_PATH}/sse', endpoint=handle_sse),
-            Mount(f'{BASE_PATH}/messages/', app=sse.handle_post_message),
-        ],
-        middleware=[
-            Middleware(AuthMiddleware)
-        ]
+def parse_json_list(value, name: str) -> list:
+    """Parse a tool argument given either as a JSON array string or as a list."""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError as e:
+            raise ValueError(f'Invalid JSON for {name}: {str(e)}. Please provide a JSON array.')
+    if not isinstance(value, list):
+        raise ValueError(f'Expected {name} to be a JSON array, got {type(value).__name__}')
+    return value
+
+
+def is_position(value) -> bool:
+    """Return True if value looks like a [longitude, latitude] pair."""
+    return (
+        isinstance(value, (list, tuple))
+        and len(value) == 2
+        and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value)
     )
 
+
+@mcp.tool()
+async def calculate_routes_batch(
+    ctx: Context,
+    pairs: str = Field(
+        description='JSON array of pairs, each {"id": optional label, "origin": [longitude, latitude], "destination": [longitude, latitude]}'
+    ),
+    travel_mode: str = Field(
+        default='Car',
+        description="Travel mode: 'Car', 'Truck', 'Walking', or 'Bicycle' (default: 'Car')",
+    ),
+    optimize_for: str = Field(
+        default='FastestRoute',
+        description="Optimize route for 'FastestRoute' or 'ShortestRoute' (default: 'FastestRoute')",
+    ),
+    departure_time: Optional[str] = Field(
+        default=None,
+        description='Optional ISO 8601 departure time, e.g. 2025-05-20T08:00:00-03:00 (default: now)',
+    ),
+) -> Dict:
+    """Calculate routes for many origin/destination pairs in a single call.
+
+    Use this instead of repeated calculate_route calls when comparing candidates (e.g. several
+    vehicles for one order). Identical pairs are computed once and pairs run concurrently.
+
+    Returns:
+        dict with routes (one entry per input pair, in order, with id, distance_meters,
+        duration_seconds and from_cache, or id and error), plus pair and API call counts.
+    """
+    if geo_routes_client.geo_routes_client is None:
+        return {'error': 'Failed to initialize Amazon geo-routes client'}
+    try:
+        items = parse_json_list(pairs, 'pairs')
+    except ValueError as e:
+        await ctx.error(str(e))
+        return {'error': str(e)}
+    if len(items) > BATCH_ROUTE_MAX_PAIRS:
+        error_msg = f'Too many pairs ({len(items)}), the maximum is {BATCH_ROUTE_MAX_PAIRS}'
+        await ctx.error(error_msg)
+        return {'error': error_msg}
+
+    semaphore = asyncio.Semaphore(BATCH_ROUTE_CONCURRENCY)
+
+    async def run(origin, destination):
+        async with semaphore:
+            try:
+                with bulk_priority():
+                    return await route_summary(
+                        origin, destination, travel_mode, optimize_for, departure_time
+                    )
+            except Exception as e:
+                return {'error': str(e)}
+
+    keys = []
+    for item in items:
+        if isinstance(item, dict):
+            origin, destination = item.get('origin'), item.get('destination')
+        elif isinstance(item, list) and len(item) == 2:
+            origin, destination = item
+        else:
+            origin = destination = None
+        if is_position(origin) and is_position(destination):
+            keys.append((tuple(origin), tuple(destination)))
+        else:
+            keys.append(None)
+    unique = list(dict.fromkeys(key for key in keys if key is not None))
+    summaries = await asyncio.gather(*(run(list(o), list(d)) for o, d in unique))
+    by_key = dict(zip(unique, summaries))
+
+    routes = []
+    for index, (item, key) in enumerate(zip(items, keys)):
+        label = item.get('id', index) if isinstance(item, dict) else index
+        summary = by_key.get(key) if key is not None else {
+            'error': 'Expected origin and destination as [longitude, latitude]'
+        }
+        if 'error' in summary:
+            routes.append({'id': label, 'error': summary['error']})
+        else:
+            routes.append(
+                {
+                    'id': label,
+                    'distance_meters': summary.get('distance_meters'),
+                    'duration_seconds': summary.get('duration_seconds'),
+                    'from_cache': summary.get('from_cache'),
+                }
+            )
+    return {
+        'routes': routes,
+        'pairs': len(items),
+        'unique_pairs': len(unique),
+        'api_calls': sum(1 for summary in summaries if summary.get('from_cache') is False),
+    }
+
+
+# Maximum concurrent reverse geocode calls per reverse_geocode_batch call
+REVERSE_GEOCODE_BATCH_CONCURRENCY = int(os.environ.get('REVERSE_GEOCODE_BATCH_CONCURRENCY', 8))
+
+# Maximum number of points accepted by reverse_geocode_batch, after expanding historico lists
+REVERSE_GEOCODE_BATCH_MAX_POINTS = int(os.environ.get('REVERSE_GEOCODE_BATCH_MAX_POINTS', 2000))
+
+
+@mcp.tool()
+async def reverse_geocode_batch(
+    ctx: Context,
+    points: str = Field(
+        description='JSON array of [longitude, latitude] pairs, tracking events with localizacao/coordenadas, or entregas items whose historico events are all resolved'
+    ),
+    cell_meters: float = Field(
+        default=REVERSE_GEOCODE_CACHE_PRECISION_METERS,
+        description='Grid cell size in meters; points in the same cell share one address (default: 10)',
+        ge=1,
+        le=1000,
+    ),
+) -> Dict:
+    """Reverse geocode many points in one call, e.g. the historico of a set of entregas.
+
+    Points are deduplicated by grid cell, so repeated or nearby coordinates (the same CD in
+    many histories, a vehicle parked at a customer) cost one lookup. Unique cells are
+    resolved concurrently with bounded parallelism, through the reverse_geocode cache, and
+    the results are mapped back onto every input point.
+
+    Returns:
+        dict with results (one entry per point, in order, with id, position and the address
+        fields of reverse_geocode, or an error; historico points also carry event, status and
+        data), plus point and unique cell counts and the number of successful API calls.
+    """
+    if not geo_places_client.geo_places_client:
+        return {'error': 'AWS geo-places client not initialized'}
+    try:
+        items = parse_tracking_points(parse_json_list(points, 'points'))
+    except ValueError as e:
+        await ctx.error(str(e))
+        return {'error': str(e)}
+    if len(items) > REVERSE_GEOCODE_BATCH_MAX_POINTS:
+        error_msg = (
+            f'Too many points ({len(items)}), the maximum is {REVERSE_GEOCODE_BATCH_MAX_POINTS}'
+        )
+        await ctx.error(error_msg)
+        return {'error': error_msg}
+
+    semaphore = asyncio.Semaphore(REVERSE_GEOCODE_BATCH_CONCURRENCY)
+
+    async def run(position):
+        async with semaphore:
+            try:
+                with bulk_priority():
+                    return await reverse_geocode_position(*position, cell_meters)
+            except Exception as e:
+                return {'error': str(e)}, False
+
+    # The first point seen in a cell is the one looked up for the whole cell
+    keys = [cell_key(*item['position'], cell_meters) for item in items]
+    unique = {}
+    for key, item in zip(keys, items):
+        unique.setdefault(key, item['position'])
+    resolved = await asyncio.gather(*(run(position) for position in unique.values()))
+    by_key = dict(zip(unique, resolved))
+
+    results = []
+    for key, item in zip(keys, items):
+        result, _ = by_key[key]
+        if 'raw_response' in result:
+            result = {'error': 'No address found'}
+        results.append({**item, **result})
+    return {
+        'results': results,
+        'points': len(items),
+        'unique_cells': len(unique),
+        'api_calls': sum(
+            1 for result, from_cache in resolved if not from_cache and 'error' not in result
+        ),
+    }
+
+
+# Largest origins x destinations product accepted by the route_matrix tool
+ROUTE_MATRIX_MAX_CELLS = int(os.environ.get('ROUTE_MATRIX_MAX_CELLS', 10000))
+
+
+def parse_points(value, name: str) -> Tuple[list, np.ndarray]:
+    """Parse a JSON array of [lon, lat] or {"id", "position"} items into ids and an (n, 2) array."""
+    ids, positions = [], []
+    for index, item in enumerate(parse_json_list(value, name)):
+        position = item.get('position') if isinstance(item, dict) else item
+        if not is_position(position):
+            raise ValueError(
+                f'{name}[{index}] must be [longitude, latitude] or '
+                '{"id": ..., "position": [longitude, latitude]}'
+            )
+        ids.append(item.get('id', index) if isinstance(item, dict) else index)
+        positions.append(position)
+    return ids, np.array(positions, dtype=np.float64).reshape(-1, 2)
+
+
+@mcp.tool()
+async def route_matrix(
+    ctx: Context,
+    origins: str = Field(
+        description='JSON array of origins, each [longitude, latitude] or {"id": label, "position": [longitude, latitude]}'
+    ),
+    destinations: str = Field(
+        description='JSON array of destinations, each [longitude, latitude] or {"id": label, "position": [longitude, latitude]}'
+    ),
+    travel_mode: str = Field(
+        default='Car',
+        description="Travel mode: 'Car', 'Truck', 'Walking', or 'Bicycle' (default: 'Car')",
+    ),
+    optimize_for: str = Field(
+        default='FastestRoute',
+        description="Optimize route for 'FastestRoute' or 'ShortestRoute' (default: 'FastestRoute')",
+    ),
+    departure_time: Optional[str] = Field(
+        default=None,
+        description='Optional ISO 8601 departure time, e.g. 2025-05-20T08:00:00-03:00 (default: now)',
+    ),
+) -> Dict:
+    """Calculate travel distance and duration between every origin and every destination.
+
+    Use this for many-to-many questions (e.g. N vehicles x M deliveries) instead of N x M
+    calculate_route calls.
+
+    Returns:
+        dict with origin_ids, destination_ids, shape [rows, cols] and flat row-major
+        distance_meters and duration_seconds arrays; cell (i, j) is at index i * cols + j.
+        Cells without a route hold unreachable_value.
+    """
+    if geo_routes_client.geo_routes_client is None:
+        return {'error': 'Failed to initialize Amazon geo-routes client'}
+    try:
+        origin_ids, origin_positions = parse_points(origins, 'origins')
+        destination_ids, destination_positions = parse_points(destinations, 'destinations')
+        if not origin_ids or not destination_ids:
+            raise ValueError('origins and destinations must not be empty')
+        if len(origin_ids) * len(destination_ids) > ROUTE_MATRIX_MAX_CELLS:
+            raise ValueError(
+                f'Matrix of {len(origin_ids)} x {len(destination_ids)} exceeds '
+                f'the maximum of {ROUTE_MATRIX_MAX_CELLS} cells'
+            )
+    except ValueError as e:
+        await ctx.error(str(e))
+        return {'error': str(e)}
+    try:
+        departure = parse_departure_time(departure_time)
+        bucket = departure_bucket(departure)
+        distances, durations, stats = await fetch_route_matrix(
+            origin_positions,
+            destination_positions,
+            travel_mode,
+            optimize_for,
+            departure.isoformat() if departure_time else None,
+            cache_scope=(bucket,),
+            ttl_seconds=route_cache_ttl(bucket),
+        )
+    except Exception as e:
+        return {'error': str(e)}
+    return {
+        'origin_ids': origin_ids,
+        'destination_ids': destination_ids,
+        'shape': [len(origin_ids), len(destination_ids)],
+        'distance_meters': distances.ravel().tolist(),
+        'duration_seconds': durations.ravel().tolist(),
+        'unreachable_value': UNREACHABLE,
+        **stats,
+    }
+
+
+# Most bases whose areas one service_area call computes
+SERVICE_AREA_MAX_BASES = int(os.environ.get('SERVICE_AREA_MAX_BASES', 50))
+
+
+@mcp.tool()
+async def service_area(
+    ctx: Context,
+    bases: str = Field(
+        description='JSON array of mcp-veiculos items (their base_operacional is used) or depots with nome and coordenadas/position'
+    ),
+    max_minutes: int = Field(
+        default=30, description='Travel time limit in minutes (default: 30)', ge=1, le=180
+    ),
+    travel_mode: str = Field(
+        default='Car',
+        description="Travel mode: 'Car', 'Truck', 'Walking', or 'Bicycle' (default: 'Car')",
+    ),
+    customers: Optional[str] = Field(
+        default=None,
+        description='Optional JSON array of customers/orders/deliveries with coordenadas or position to test for reachability',
+    ),
+) -> Dict:
+    """Compute the area each base can reach within max_minutes, and which customers lie inside.
+
+    Areas are cached, so calling this once for the bases precomputes them and
+    later reachability questions ("which customers can CD Guarulhos reach in
+    45 minutes?") are answered locally without any API call.
+
+    Returns:
+        dict with one entry per base (id, position, vertices, from_cache, method) and,
+        when customers are given, per customer the ids of the bases that reach it.
+        Without customers, each base also has its area as FlexiblePolyline rings.
+    """
+    if geo_routes_client.geo_routes_client is None:
+        return {'error': 'Failed to initialize Amazon geo-routes client'}
+    try:
+        depots = parse_depots(parse_json_list(bases, 'bases'))
+        if not depots:
+            raise ValueError('bases must not be empty')
+        if len(depots) > SERVICE_AREA_MAX_BASES:
+            raise ValueError(f'At most {SERVICE_AREA_MAX_BASES} bases are allowed per call')
+        points = parse_candidates(parse_json_list(customers, 'customers')) if customers else []
+    except ValueError as e:
+        await ctx.error(str(e))
+        return {'error': str(e)}
+    try:
+        # Computing areas for many bases is a fan-out; keep interactive calls ahead of it
+        with bulk_priority():
+            areas = await asyncio.gather(
+                *(
+                    compute_service_area(depot['position'], max_minutes * 60, travel_mode)
+                    for depot in depots
+                )
+            )
+    except Exception as e:
+        return {'error': str(e)}
+    result = {
+        'max_minutes': max_minutes,
+        'travel_mode': travel_mode,
+        'bases': [
+            {
+                'id': depot['id'],
+                'position': depot['position'],
+                'vertices': area.vertices,
+                **info,
+                **({} if points else {'polylines': area.to_polylines()}),
+            }
+            for depot, (area, info) in zip(depots, areas)
+        ],
+        'api_calls': sum(info['api_calls'] for _, info in areas),
+    }
+    if points:
+        positions = np.array([p['position'] for p in points], dtype=np.float64)
+        inside = np.array([area.contains(positions) for area, _ in areas])
+        result['customers'] = [
+            {'id': point['id'], 'reachable_from': [depots[b]['id'] for b in np.flatnonzero(column)]}
+            for point, column in zip(points, inside.T)
+        ]
+        result['unreachable_ids'] = [
+            point['id'] for point, column in zip(points, inside.T) if not column.any()
+        ]
+    return result
+
+
+# Most waypoints accepted by one geo-routes optimize_waypoints request
+OPTIMIZE_WAYPOINTS_MAX_WAYPOINTS = int(os.environ.get('OPTIMIZE_WAYPOINTS_MAX_WAYPOINTS', 50))
+
+
+@mcp.tool()
+async def optimize_waypoints(
+    ctx: Context,
+    origin_position: list = Field(description='Origin position as [longitude, latitude]'),
+    destination_position: list = Field(
+        description='Destination position as [longitude, latitude]'
+    ),
+    waypoints: list = Field(
+        description='List of intermediate waypoints, each as a dict with at least Position [longitude, latitude], optionally Id'
+    ),
+    travel_mode: str = Field(
+        default='Car',
+        description="Travel mode: 'Car', 'Truck', 'Walking', or 'Bicycle' (default: 'Car')",
+    ),
+    mode: str = Field(
+        default='summary',
+        description="Output mode: 'summary' (default) or 'raw' for all AWS fields",
+    ),
+) -> Dict:
+    """Optimize the order of waypoints using Amazon Location Service geo-routes optimize_waypoints API (V2).
+
+    Returns summary (optimized order, total distance, duration, etc.) or full response if mode='raw'.
+    More waypoints than one request accepts are optimized in concurrent clusters and stitched
+    together; the summary then adds chunking details and raw mode the response of each cluster.
+    """
+    client = geo_routes_client.geo_routes_client
+
+    # Check if client is None before proceeding
+    if client is None:
+        return {'error': 'Failed to initialize Amazon geo-routes client'}
+
+    params = {
+        'Origin': origin_position,
+        'Destination': destination_position,
+        'Waypoints': [{'Position': wp['Position']} for wp in waypoints],
+        'TravelMode': travel_mode,
+    }
+    try:
+        if len(waypoints) > OPTIMIZE_WAYPOINTS_MAX_WAYPOINTS:
+            return await optimize_waypoints_in_clusters(
+                origin_position, destination_position, waypoints, travel_mode, mode
+            )
+        response = await geo_routes('optimize_waypoints', **params)
+        if mode == 'raw':
+            return response
+        summary = summarize_optimized_route(response)
+        if summary is None:
+            return {'error': 'No route found'}
+        return summary
+    except Exception as e:
+        # import traceback
+        # return {'error': str(e), 'traceback': traceback.format_exc()}
+        return {'error': str(e)}
+
+
+def summarize_optimized_route(response: Dict) -> Optional[Dict]:
+    """Return distance, duration and optimized order of an optimize_waypoints response."""
+    routes = response.get('Routes', [])
+    if not routes:
+        return None
+    route = routes[0]
+    distance_meters = route.get('Distance', None)
+    duration_seconds = route.get('DurationSeconds', None)
+    optimized_order = [wp.get('Position') for wp in route.get('Waypoints', [])]
+    return {
+        'distance_meters': distance_meters,
+        'duration_seconds': duration_seconds,
+        'optimized_order': optimized_order,
+    }
+
+
+def match_positions(returned: list, start: list, end: list, candidates: list) -> list:
+    """Map positions returned by the API back to candidate indices, in the returned order.
+
+    Returned positions may be snapped to the road or include the origin and
+    destination, so each one is matched to the nearest unused candidate and
+    dropped when it is closer to start or end. Unmatched candidates are appended.
+    """
+    order = []
+    if returned:
+        references = [start, end] + candidates
+        distances = haversine_matrix(returned, references)
+        used = set()
+        for row in distances:
+            for index in np.argsort(row, kind='stable').tolist():
+                if index < 2:
+                    break
+                if index - 2 not in used:
+                    used.add(index - 2)
+                    order.append(index - 2)
+                    break
+    return order + [i for i in range(len(candidates)) if i not in order]
+
+
+def total_or_none(values: list):
+    """Sum values, or None if any of them is unknown."""
+    return None if any(v is None for v in values) else sum(values)
+
+
+async def optimize_waypoints_in_clusters(
+    origin_position: list,
+    destination_position: list,
+    waypoints: list,
+    travel_mode: str,
+    mode: str = 'summary',
+) -> Dict:
+    """Optimize more waypoints than one optimize_waypoints request accepts.
+
+    Waypoints are swept into angular clusters around the origin, clusters are
+    ordered by great-circle length from origin to destination, and each cluster
+    is optimized concurrently between its entry and exit waypoints. Clusters are
+    stitched with calculate_routes legs between the exit of one and the entry of
+    the next, so totals cover the whole path.
+    """
+    positions = np.array([wp['Position'] for wp in waypoints], dtype=np.float64)
+    clusters = sweep_clusters(origin_position, positions, OPTIMIZE_WAYPOINTS_MAX_WAYPOINTS)
+    centroids = np.array([positions[c].mean(axis=0) for c in clusters])
+    clusters = [
+        clusters[k] for k in order_clusters(origin_position, destination_position, centroids)
+    ]
+    junctions = cluster_junctions(origin_position, destination_position, positions, clusters)
+
+    def position_of_index(index: int, default: list) -> list:
+        return default if index < 0 else waypoints[index]['Position']
+
+    async def solve(members: np.ndarray, entry: int, exit_: int):
+        start = position_of_index(entry, origin_position)
+        end = position_of_index(exit_, destination_position)
+        inner = [int(i) for i in members if i not in (entry, exit_)]
+        response = None
+        if inner:
+            response = await geo_routes(
+                'optimize_waypoints',
+                Origin=start,
+                Destination=end,
+                Waypoints=[{'Position': waypoints[i]['Position']} for i in inner],
+                TravelMode=travel_mode,
+            )
+            summary = summarize_optimized_route(response)
+            if summary is None:
+                raise RuntimeError('No route found')
+            matched = match_positions(
+                summary['optimized_order'], start, end, [waypoints[i]['Position'] for i in inner]
+            )
+            order = [inner[i] for i in matched]
+        elif entry != exit_:
+            summary = await leg(start, end)
+            order = []
+        else:
+            summary = {'distance_meters': 0, 'duration_seconds': 0}
+            order = []
+        visits = ([entry] if entry >= 0 else []) + order
+        if exit_ >= 0 and exit_ != entry:
+            visits.append(exit_)
+        return summary, visits, response
+
+    async def leg(start: list, end: list) -> Dict:
+        summary = await route_summary(start, end, travel_mode)
+        if 'error' in summary:
+            raise RuntimeError(summary['error'])
+        return summary
+
+    solved, links = await asyncio.gather(
+        asyncio.gather(*(solve(c, entry, exit_) for c, (entry, exit_) in zip(clusters, junctions))),
+        asyncio.gather(
+            *(
+                leg(waypoints[exit_]['Position'], waypoints[entry]['Position'])
+                for (_, exit_), (entry, _) in zip(junctions, junctions[1:])
+            )
+        ),
+    )
+    parts = [summary for summary, _, _ in solved] + list(links)
+    result = {
+        'distance_meters': total_or_none([p.get('distance_meters') for p in parts]),
+        'duration_seconds': total_or_none([p.get('duration_seconds') for p in parts]),
+        'optimized_order': [
+            waypoints[i]['Position'] for _, visits, _ in solved for i in visits
+        ],
+        'chunking': {
+            'clusters': len(clusters),
+            'cluster_sizes': [len(c) for c in clusters],
+            'optimize_calls': sum(response is not None for _, _, response in solved),
+            'stitch_legs': len(links),
+        },
+    }
+    if mode == 'raw':
+        result['responses'] = [response for _, _, response in solved if response is not None]
+    return result
+
+
+# Largest number of deliveries accepted by plan_fleet_routes
+VRP_MAX_STOPS = int(os.environ.get('VRP_MAX_STOPS', 500))
+
+# Cost given to pairs without a road route so the planner never chooses them
+UNREACHABLE_COST = 1e9
+
+
+async def road_matrices(
+    origins: np.ndarray,
+    destinations: np.ndarray,
+    travel_mode: str = 'Car',
+    optimize_for: str = 'FastestRoute',
+) -> Tuple[np.ndarray, np.ndarray, Dict]:
+    """Return cached road (distances, durations) for departures now, see fetch_route_matrix."""
+    bucket = departure_bucket(parse_departure_time(None))
+    return await fetch_route_matrix(
+        origins,
+        destinations,
+        travel_mode,
+        optimize_for,
+        cache_scope=(bucket,),
+        ttl_seconds=route_cache_ttl(bucket),
+    )
+
+
+def planning_cost(distances: np.ndarray, durations: np.ndarray, optimize_for: str) -> np.ndarray:
+    """Return the float cost matrix a planner should minimize, unreachable pairs priced out."""
+    matrix = durations if optimize_for == 'FastestRoute' else distances
+    return np.where(matrix == UNREACHABLE, UNREACHABLE_COST, matrix).astype(np.float64)
+
+
+@mcp.tool()
+async def plan_fleet_routes(
+    ctx: Context,
+    deliveries: str = Field(
+        description='JSON array of deliveries, each {"id": label, "position": [longitude, latitude] or "coordenadas": {"latitude", "longitude"}, "peso_kg": weight, "volume_m3": volume}; mcp-entregas items are located at their destino'
+    ),
+    vehicles: str = Field(
+        description='JSON array of mcp-veiculos items with veiculo_id, capacidade_kg, capacidade_m3 and base_operacional.coordenadas'
+    ),
+    time_budget_seconds: float = Field(
+        default=2.0, description='Planning time budget in seconds', ge=0.1, le=30
+    ),
+    travel_mode: str = Field(
+        default='Car',
+        description="Travel mode: 'Car', 'Truck', 'Walking', or 'Bicycle' (default: 'Car')",
+    ),
+    optimize_for: str = Field(
+        default='FastestRoute',
+        description="Minimize total time ('FastestRoute') or distance ('ShortestRoute')",
+    ),
+) -> Dict:
+    """Plan capacitated routes for several vehicles, each starting and ending at its base_operacional.
+
+    Road distances and durations come from the cached route matrix; planning runs locally
+    (Clarke-Wright savings, then 2-opt and or-opt) and returns the best plan found within the
+    time budget. Vehicles with status 'Em Manutenção' are skipped.
+
+    Returns:
+        dict with routes (vehicle_id, depot, ordered stop ids, load and route totals per used
+        vehicle), unassigned delivery ids that did not fit any vehicle, and plan totals.
+    """
+    if geo_routes_client.geo_routes_client is None:
+        return {'error': 'Failed to initialize Amazon geo-routes client'}
+    try:
+        stops = parse_deliveries(parse_json_list(deliveries, 'deliveries'))
+        fleet = parse_vehicles(parse_json_list(vehicles, 'vehicles'))
+        skipped = [v['id'] for v in fleet if v['status'] == 'Em Manutenção']
+        fleet = [v for v in fleet if v['status'] != 'Em Manutenção']
+        if not stops or not fleet:
+            raise ValueError('At least one delivery and one available vehicle are required')
+        if len(stops) > VRP_MAX_STOPS:
+            raise ValueError(f'Too many deliveries ({len(stops)}), the maximum is {VRP_MAX_STOPS}')
+    except ValueError as e:
+        await ctx.error(str(e))
+        return {'error': str(e)}
+
+    depots = list(dict.fromkeys(tuple(v['depot']) for v in fleet))
+    positions = np.array(depots + [s['position'] for s in stops], dtype=np.float64)
+    demands = np.zeros((len(positions), 2))
+    demands[len(depots):] = [s['demand'] for s in stops]
+    try:
+        distances, durations, matrix_stats = await road_matrices(
+            positions, positions, travel_mode, optimize_for
+        )
+        vehicle_depots = [depots.index(tuple(v['depot'])) for v in fleet]
+        routes, unassigned = await asyncio.to_thread(
+            solve_vrp,
+            planning_cost(distances, durations, optimize_for),
+            np.arange(len(depots), len(positions)),
+            demands,
+            vehicle_depots,
+            np.array([v['capacity'] for v in fleet]),
+            time_budget_seconds,
+        )
+    except Exception as e:
+        return {'error': str(e)}
+
+    planned = []
+    for vehicle, depot, route in zip(fleet, vehicle_depots, routes):
+        if not route:
+            continue
+        path = route_path(depot, route)
+        load = demands[route].sum(axis=0)
+        planned.append(
+            {
+                'vehicle_id': vehicle['id'],
+                'depot': vehicle['depot_name'] or vehicle['depot'],
+                'stops': [stops[node - len(depots)]['id'] for node in route],
+                'load_kg': round(float(load[0]), 3),
+                'load_m3': round(float(load[1]), 3),
+                'distance_meters': int(distances[path[:-1], path[1:]].sum()),
+                'duration_seconds': int(durations[path[:-1], path[1:]].sum()),
+            }
+        )
+    return {
+        'routes': planned,
+        'unassigned': [stops[node - len(depots)]['id'] for node in unassigned],
+        'skipped_vehicles': skipped,
+        'total_distance_meters': sum(r['distance_meters'] for r in planned),
+        'total_duration_seconds': sum(r['duration_seconds'] for r in planned),
+        'matrix': matrix_stats,
+    }
+
+
+# Most orders assigned by one assign_orders_to_depots call
+ASSIGN_MAX_ORDERS = int(os.environ.get('ASSIGN_MAX_ORDERS', 5000))
+
+
+@mcp.tool()
+async def assign_orders_to_depots(
+    ctx: Context,
+    orders: str = Field(
+        description='JSON array of mcp-pedidos/mcp-entregas orders, each with an id, coordenadas, position or destino (entregas are assigned by destino), and optional peso_kg and volume_m3'
+    ),
+    vehicles: str = Field(
+        description='JSON array of mcp-veiculos items with capacidade_kg, capacidade_m3 and base_operacional; their base_operacional CDs are the depots'
+    ),
+    travel_mode: str = Field(
+        default='Car',
+        description="Travel mode: 'Car', 'Truck', 'Walking', or 'Bicycle' (default: 'Car')",
+    ),
+    optimize_for: str = Field(
+        default='FastestRoute',
+        description="Minimize travel time ('FastestRoute') or distance ('ShortestRoute')",
+    ),
+) -> Dict:
+    """Decide which base_operacional CD should serve each order, for all orders at once.
+
+    Depots are the base_operacional of the vehicles; a depot's capacity is the sum of
+    capacidade_kg and capacidade_m3 of its vehicles, skipping those 'Em Manutenção'.
+    Depot-to-order travel costs come from the cached route matrix, and orders are assigned
+    locally with the regret heuristic, so thousands of orders take well under a second
+    once the matrix is warm. Use plan_fleet_routes per depot afterwards to build routes.
+
+    Returns:
+        dict with a compact assignments table (columns and rows of order_id, depot,
+        duration_seconds, distance_meters), per-depot load and capacity, and the ids of
+        orders no depot can reach or fit.
+    """
+    if geo_routes_client.geo_routes_client is None:
+        return {'error': 'Failed to initialize Amazon geo-routes client'}
+    try:
+        stops = parse_deliveries(parse_json_list(orders, 'orders'))
+        fleet = [
+            v for v in parse_vehicles(parse_json_list(vehicles, 'vehicles'))
+            if v['status'] != 'Em Manutenção'
+        ]
+        if not stops or not fleet:
+            raise ValueError('At least one order and one available vehicle are required')
+        if len(stops) > ASSIGN_MAX_ORDERS:
+            raise ValueError(f'Too many orders ({len(stops)}), the maximum is {ASSIGN_MAX_ORDERS}')
+    except ValueError as e:
+        await ctx.error(str(e))
+        return {'error': str(e)}
+
+    depots = {}
+    for vehicle in fleet:
+        depot = depots.setdefault(
+            tuple(vehicle['depot']),
+            {'id': vehicle['depot_name'] or vehicle['depot'], 'vehicles': 0, 'capacity': 0.0},
+        )
+        depot['vehicles'] += 1
+        depot['capacity'] = depot['capacity'] + np.array(vehicle['capacity'])
+    depot_list = list(depots.values())
+    try:
+        distances, durations, matrix_stats = await road_matrices(
+            np.array(list(depots), dtype=np.float64),
+            np.array([s['position'] for s in stops], dtype=np.float64),
+            travel_mode,
+            optimize_for,
+        )
+        demands = np.array([s['demand'] for s in stops], dtype=np.float64)
+        start = time.perf_counter()
+        assignment = await asyncio.to_thread(
+            assign_by_regret,
+            planning_cost(distances, durations, optimize_for),
+            demands,
+            np.array([d['capacity'] for d in depot_list]),
+            UNREACHABLE_COST,
+        )
+        solve_ms = (time.perf_counter() - start) * 1000
+    except Exception as e:
+        return {'error': str(e)}
+
+    order_index = np.arange(len(stops))
+    assigned = assignment >= 0
+    rows = [
+        [stops[i]['id'], depot_list[d]['id'], int(durations[d, i]), int(distances[d, i])]
+        for i, d in zip(order_index[assigned].tolist(), assignment[assigned].tolist())
+    ]
+    reachable = (durations != UNREACHABLE).any(axis=0)
+    summary = []
+    for index, depot in enumerate(depot_list):
+        load = demands[assignment == index].sum(axis=0)
+        # Vehicles without a capacity make the depot unlimited
+        capacity = [float(c) if np.isfinite(c) else None for c in depot['capacity']]
+        summary.append(
+            {
+                'depot': depot['id'],
+                'vehicles': depot['vehicles'],
+                'orders': int((assignment == index).sum()),
+                'load_kg': round(float(load[0]), 3),
+                'load_m3': round(float(load[1]), 3),
+                'capacity_kg': capacity[0],
+                'capacity_m3': capacity[1],
+            }
+        )
+    return {
+        'columns': ['order_id', 'depot', 'duration_seconds', 'distance_meters'],
+        'assignments': rows,
+        'depots': summary,
+        'unreachable': [stops[i]['id'] for i in np.flatnonzero(~reachable)],
+        'over_capacity': [stops[i]['id'] for i in np.flatnonzero(reachable & ~assigned)],
+        'solve_ms': round(solve_ms, 1),
+        'matrix': matrix_stats,
+    }
+
+
+# Most stops and vehicles evaluated by one plan_time_window_routes call
+TIME_WINDOW_MAX_STOPS = int(os.environ.get('TIME_WINDOW_MAX_STOPS', 100))
+TIME_WINDOW_MAX_VEHICLES = int(os.environ.get('TIME_WINDOW_MAX_VEHICLES', 20))
+
+# Minutes spent at a stop whose record has no tempo_servico_minutos
+TIME_WINDOW_SERVICE_MINUTES = float(os.environ.get('TIME_WINDOW_SERVICE_MINUTES', 5))
+
+
+def unserved_reason(
+    travel: np.ndarray, start: int, stop: int, windows: np.ndarray, demand, capacity
+) -> str:
+    """Explain why a stop is missing from a time-window route."""
+    if windows[stop, 1] < 0:
+        return 'deadline_passed'
+    if travel[start, stop] > windows[stop, 1]:
+        return 'deadline_unreachable'
+    if np.any(demand > capacity):
+        return 'exceeds_capacity'
+    return 'conflicts_with_other_stops'
+
+
+@mcp.tool()
+async def plan_time_window_routes(
+    ctx: Context,
+    stops: str = Field(
+        description='JSON array of entregas/pedidos with coordenadas/destino; data_prevista or data_pedido + prazo_entrega set the deadline, optional janela_inicio/janela_fim, tempo_servico_minutos, peso_kg'
+    ),
+    vehicles: str = Field(
+        description='JSON array of mcp-veiculos items; each vehicle starts at its localizacao_atual'
+    ),
+    departure_time: Optional[str] = Field(
+        default=None,
+        description='Optional ISO 8601 departure time, e.g. 2025-05-20T08:00:00-03:00 (default: now)',
+    ),
+    travel_mode: str = Field(
+        default='Car',
+        description="Travel mode: 'Car', 'Truck', 'Walking', or 'Bicycle' (default: 'Car')",
+    ),
+    return_to_base: bool = Field(
+        default=True, description='Whether each route must end at the base_operacional'
+    ),
+) -> Dict:
+    """Sequence deliveries with deadlines and time windows, separately for each candidate vehicle.
+
+    Each vehicle gets its own route over all the stops, so the answer shows at once which
+    vehicle can serve the most stops in time. Stops have an earliest and a latest service
+    start and a service time; travel times come from the cached route matrix for the
+    departure time. Vehicles with status 'Em Manutenção' are skipped.
+
+    Returns:
+        dict with one plan per vehicle: the feasible stop sequence with arrival, service start
+        and slack_seconds (time left before the stop's deadline) per stop, the unserved stops
+        with a reason, and totals; plus vehicle ids ranked by stops served, then finish time.
+    """
+    if geo_routes_client.geo_routes_client is None:
+        return {'error': 'Failed to initialize Amazon geo-routes client'}
+    try:
+        departure = parse_departure_time(departure_time)
+        items = parse_timed_stops(
+            parse_json_list(stops, 'stops'), departure, TIME_WINDOW_SERVICE_MINUTES
+        )
+        fleet = parse_vehicles(parse_json_list(vehicles, 'vehicles'))
+        skipped = [v['id'] for v in fleet if v['status'] == 'Em Manutenção']
+        fleet = [v for v in fleet if v['status'] != 'Em Manutenção']
+        if not items or not fleet:
+            raise ValueError('At least one stop and one available vehicle are required')
+        if len(items) > TIME_WINDOW_MAX_STOPS or len(fleet) > TIME_WINDOW_MAX_VEHICLES:
+            raise ValueError(
+                f'At most {TIME_WINDOW_MAX_STOPS} stops and {TIME_WINDOW_MAX_VEHICLES} '
+                'vehicles are allowed per call'
+            )
+    except ValueError as e:
+        await ctx.error(str(e))
+        return {'error': str(e)}
+
+    # Nodes: vehicle starts, then their bases, then the stops
+    depots = list(dict.fromkeys(tuple(v['depot']) for v in fleet))
+    first_stop = len(fleet) + len(depots)
+    positions = np.array(
+        [v['position'] for v in fleet] + depots + [item['position'] for item in items],
+        dtype=np.float64,
+    )
+    windows = np.zeros((len(positions), 2))
+    windows[:, 1] = np.inf
+    service = np.zeros(len(positions))
+    demands = np.zeros((len(positions), 2))
+    for node, item in enumerate(items, start=first_stop):
+        if item['earliest'] is not None:
+            windows[node, 0] = max(0.0, (item['earliest'] - departure).total_seconds())
+        if item['latest'] is not None:
+            windows[node, 1] = (item['latest'] - departure).total_seconds()
+        service[node] = item['service_minutes'] * 60
+        demands[node] = item['demand']
+    try:
+        bucket = departure_bucket(departure)
+        distances, durations, matrix_stats = await fetch_route_matrix(
+            positions,
+            positions,
+            travel_mode,
+            'FastestRoute',
+            departure.isoformat() if departure_time else None,
+            cache_scope=(bucket,),
+            ttl_seconds=route_cache_ttl(bucket),
+        )
+        travel = planning_cost(distances, durations, 'FastestRoute')
+        stop_nodes = list(range(first_stop, len(positions)))
+        ends = [
+            len(fleet) + depots.index(tuple(v['depot'])) if return_to_base else None for v in fleet
+        ]
+        solved = await asyncio.gather(
+            *(
+                asyncio.to_thread(
+                    solve_time_windows,
+                    travel,
+                    start,
+                    stop_nodes,
+                    windows,
+                    service,
+                    end,
+                    demands,
+                    np.array(vehicle['capacity']),
+                )
+                for start, (vehicle, end) in enumerate(zip(fleet, ends))
+            )
+        )
+    except Exception as e:
+        return {'error': str(e)}
+
+    def at(seconds: float) -> str:
+        return (departure + timedelta(seconds=float(seconds))).isoformat(timespec='seconds')
+
+    plans = []
+    for start, (vehicle, end, (route, unserved)) in enumerate(zip(fleet, ends, solved)):
+        path = [start, *route] + ([end] if end is not None else [])
+        arrival, begin, _ = schedule_path(travel, path, windows, service)
+        sequence = []
+        for k, node in enumerate(route, start=1):
+            latest = windows[node, 1]
+            sequence.append(
+                {
+                    'id': items[node - first_stop]['id'],
+                    'arrival': at(arrival[k]),
+                    'service_start': at(begin[k]),
+                    'slack_seconds': int(latest - begin[k]) if np.isfinite(latest) else None,
+                }
+            )
+        finish = begin[-1] + (service[path[-1]] if end is None else 0.0)
+        plans.append(
+            {
+                'vehicle_id': vehicle['id'],
+                'served': len(route),
+                'stops': sequence,
+                'unserved': [
+                    {
+                        'id': items[node - first_stop]['id'],
+                        'reason': unserved_reason(
+                            travel, start, node, windows, demands[node], vehicle['capacity']
+                        ),
+                    }
+                    for node in unserved
+                ],
+                'finish': at(finish),
+                'distance_meters': int(distances[path[:-1], path[1:]].sum()),
+                'waiting_seconds': int((begin[1:] - arrival[1:]).sum()),
+            }
+        )
+    ranking = sorted(plans, key=lambda plan: (-plan['served'], plan['finish']))
+    return {
+        'departure_time': departure.isoformat(timespec='seconds'),
+        'plans': plans,
+        'ranking': [plan['vehicle_id'] for plan in ranking],
+        'skipped_vehicles': skipped,
+        'matrix': matrix_stats,
+    }
+
+
+# Vehicles whose route plans are kept for insert_stop, least recently used dropped first
+ROUTE_PLAN_MAX_PLANS = int(os.environ.get('ROUTE_PLAN_MAX_PLANS', 1000))
+
+# Most stops in one route plan
+ROUTE_PLAN_MAX_STOPS = int(os.environ.get('ROUTE_PLAN_MAX_STOPS', 200))
+
+route_plans = RoutePlanStore(ROUTE_PLAN_MAX_PLANS)
+
+
+def plan_stops(items: list, departure: datetime) -> list:
+    """Parse stops for a route plan; bare [longitude, latitude] pairs are accepted too."""
+    items = [
+        {'id': i, 'position': item} if is_position(item) else item for i, item in enumerate(items)
+    ]
+    return [
+        {
+            'id': stop['id'],
+            'position': stop['position'],
+            'service_seconds': stop['service_minutes'] * 60,
+            'latest': (stop['latest'] - departure).total_seconds()
+            if stop['latest'] is not None
+            else np.inf,
+        }
+        for stop in parse_timed_stops(items, departure, TIME_WINDOW_SERVICE_MINUTES)
+    ]
+
+
+async def plan_leg(origin: list, destination: list, travel_mode: str) -> Dict:
+    """Road leg between two plan points, from the route cache or calculate_routes."""
+    summary = await route_summary(origin, destination, travel_mode)
+    if 'error' in summary:
+        raise ValueError(f'No route from {origin} to {destination}')
+    return {
+        'distance_meters': summary['distance_meters'],
+        'duration_seconds': summary['duration_seconds'],
+        'from_cache': summary.get('from_cache', False),
+    }
+
+
+@mcp.tool()
+async def set_route_plan(
+    ctx: Context,
+    vehicle_id: str = Field(description='veiculo_id the plan belongs to'),
+    stops: str = Field(
+        description='JSON array of stops in visiting order, each [longitude, latitude] or an entrega/pedido with coordenadas/destino and optional data_prevista deadline'
+    ),
+    start_position: list = Field(description='Vehicle start position as [longitude, latitude]'),
+    departure_time: Optional[str] = Field(
+        default=None,
+        description='Optional ISO 8601 departure time, e.g. 2025-05-20T08:00:00-03:00 (default: now)',
+    ),
+    travel_mode: str = Field(
+        default='Car',
+        description="Travel mode: 'Car', 'Truck', 'Walking', or 'Bicycle' (default: 'Car')",
+    ),
+) -> Dict:
+    """Store the route of a vehicle, e.g. the order from optimize_waypoints or plan_fleet_routes.
+
+    Legs between consecutive stops are computed once (route cache first) and kept with the
+    plan, so later insert_stop calls only route the legs they change.
+
+    Returns:
+        dict with the stored plan: stops with ETAs, total distance and duration.
+    """
+    try:
+        departure = parse_departure_time(departure_time)
+        items = plan_stops(parse_json_list(stops, 'stops'), departure)
+        if not is_position(start_position):
+            raise ValueError('start_position must be [longitude, latitude]')
+        if len(items) > ROUTE_PLAN_MAX_STOPS:
+            raise ValueError(f'At most {ROUTE_PLAN_MAX_STOPS} stops are allowed in a plan')
+    except ValueError as e:
+        await ctx.error(str(e))
+        return {'error': str(e)}
+    points = [list(start_position)] + [stop['position'] for stop in items]
+    try:
+        legs = await asyncio.gather(
+            *(plan_leg(a, b, travel_mode) for a, b in zip(points, points[1:]))
+        )
+    except Exception as e:
+        return {'error': str(e)}
+    plan = RoutePlan(vehicle_id, points[0], items, list(legs), departure, travel_mode)
+    route_plans.put(plan)
+    return {
+        **plan.to_dict(),
+        'legs_from_cache': sum(1 for leg in plan.legs if leg['from_cache']),
+    }
+
+
+@mcp.tool()
+async def insert_stop(
+    ctx: Context,
+    vehicle_id: str = Field(description='veiculo_id of a plan stored with set_route_plan'),
+    stop: str = Field(
+        description='JSON object of the new stop: {"id": label, "position": [longitude, latitude]} or an entrega/pedido with coordenadas/destino and optional data_prevista'
+    ),
+    max_delay_minutes: Optional[float] = Field(
+        default=None,
+        description='Largest delay allowed on the ETA of any stop already in the plan (default: no limit, deadlines still apply)',
+        ge=0,
+    ),
+) -> Dict:
+    """Insert a new order into a stored vehicle plan at its cheapest feasible position.
+
+    Unlike re-running optimize_waypoints, the existing order is kept, so ETAs already
+    communicated only move by the insertion delay. Travel times to and from the new stop
+    come from the cached route matrix (O(stops) cells), and only the one or two legs that
+    change are routed with calculate_routes.
+
+    Returns:
+        dict with the insertion index, the previous and next stop ids, the delay added to
+        every later stop, the ETA of the new stop and the updated plan.
+    """
+    plan = route_plans.get(vehicle_id)
+    if plan is None:
+        error = f'No route plan stored for vehicle {vehicle_id}; call set_route_plan first'
+        await ctx.error(error)
+        return {'error': error}
+    try:
+        value = json.loads(stop) if isinstance(stop, str) else stop
+        if not isinstance(value, dict):
+            raise ValueError('stop must be a JSON object')
+        new_stop = plan_stops([value], plan.departure)[0]
+        if any(str(s['id']) == str(new_stop['id']) for s in plan.stops):
+            raise ValueError(f'Stop {new_stop["id"]} is already in the plan')
+        if len(plan.stops) >= ROUTE_PLAN_MAX_STOPS:
+            raise ValueError(f'The plan already has {ROUTE_PLAN_MAX_STOPS} stops')
+    except (ValueError, json.JSONDecodeError) as e:
+        await ctx.error(str(e))
+        return {'error': str(e)}
+    max_delay = np.inf if max_delay_minutes is None else max_delay_minutes * 60
+    async with plan.lock:
+        points = np.array(plan.points, dtype=np.float64)
+        position = np.array([new_stop['position']], dtype=np.float64)
+        try:
+            (_, to_stop, to_stats), (_, from_stop, from_stats) = await asyncio.gather(
+                road_matrices(points, position, plan.travel_mode),
+                road_matrices(position, points[1:], plan.travel_mode),
+            )
+            to_stop = np.where(to_stop[:, 0] == UNREACHABLE, np.inf, to_stop[:, 0])
+            from_stop = np.where(from_stop[0] == UNREACHABLE, np.inf, from_stop[0])
+            index, delays, arrival = plan.best_insertion(
+                to_stop, from_stop, new_stop['service_seconds'], new_stop['latest'], max_delay
+            )
+            if index is None:
+                if not (arrival <= new_stop['latest']).any():
+                    return {'error': 'The new stop cannot be reached before its deadline'}
+                return {
+                    'error': 'No insertion position keeps every deadline and the delay limit',
+                    'smallest_delay_seconds': int(delays[arrival <= new_stop['latest']].min()),
+                }
+            # Only the legs around the new stop are routed
+            changed = [plan_leg(plan.points[index], new_stop['position'], plan.travel_mode)]
+            if index < len(plan.stops):
+                changed.append(
+                    plan_leg(new_stop['position'], plan.points[index + 1], plan.travel_mode)
+                )
+            legs = await asyncio.gather(*changed)
+        except Exception as e:
+            return {'error': str(e)}
+        old_etas = plan.etas()
+        plan.insert(index, new_stop, legs[0], legs[1] if len(legs) > 1 else None)
+        route_plans.insertions += 1
+        new_etas = plan.etas()
+        summary = plan.to_dict()
+    return {
+        'vehicle_id': plan.vehicle_id,
+        'index': index,
+        'after': plan.stops[index - 1]['id'] if index else None,
+        'before': plan.stops[index + 1]['id'] if index + 1 < len(plan.stops) else None,
+        'eta': summary['stops'][index]['eta'],
+        'delay_seconds': int(new_etas[-1] - old_etas[-1]) if index + 1 < len(plan.stops) else 0,
+        'delayed_stops': len(plan.stops) - index - 1,
+        'legs_routed': sum(1 for leg in legs if not leg['from_cache']),
+        'matrix_cells_from_cache': to_stats['cells_from_cache'] + from_stats['cells_from_cache'],
+        'plan': summary,
+    }
+
+
+@mcp.tool()
+async def get_route_plan(
+    ctx: Context,
+    vehicle_id: str = Field(description='veiculo_id of a plan stored with set_route_plan'),
+) -> Dict:
+    """Return a stored vehicle plan with the current ETA of every stop."""
+    plan = route_plans.get(vehicle_id)
+    if plan is None:
+        return {'error': f'No route plan stored for vehicle {vehicle_id}'}
+    return plan.to_dict()
+
+
+# Distance from the planned route beyond which eta_update treats a vehicle as off-route
+ETA_OFF_ROUTE_METERS = float(os.environ.get('ETA_OFF_ROUTE_METERS', 150))
+
+# Planned routes kept per vehicle for eta_update
+tracked_routes = TTLCache(
+    'tracked_route',
+    ttl_seconds=float(os.environ.get('ETA_TRACKED_ROUTE_TTL_SECONDS', 12 * 3600)),
+    max_entries=int(os.environ.get('ETA_TRACKED_ROUTE_MAX_ENTRIES', 2000)),
+)
+
+
+async def track_route(trip: Dict, travel_mode: str) -> Tuple[TrackedRoute, bool]:
+    """Route a vehicle from its position to its destination and keep the route for eta_update."""
+    summary = await route_summary(
+        trip['position'], trip['destination'], travel_mode, include_geometry=True
+    )
+    if 'error' in summary:
+        raise ValueError(f'No route from {trip["position"]} to {trip["destination"]}')
+    points = route_points(summary['leg_polylines'])
+    if not len(points):
+        raise ValueError('Route has no geometry')
+    route = TrackedRoute(
+        trip['id'],
+        trip['destination'],
+        points,
+        summary['turn_by_turn'],
+        summary['distance_meters'],
+        summary['duration_seconds'],
+        travel_mode,
+    )
+    tracked_routes.set(str(trip['id']), route)
+    return route, summary['from_cache']
+
+
+@mcp.tool()
+async def eta_update(
+    ctx: Context,
+    vehicle: str = Field(
+        description='JSON object of an mcp-veiculos item with veiculo_id, localizacao_atual, destino_atual and status'
+    ),
+    travel_mode: str = Field(
+        default='Car',
+        description="Travel mode: 'Car', 'Truck', 'Walking', or 'Bicycle' (default: 'Car')",
+    ),
+    off_route_meters: float = Field(
+        default=ETA_OFF_ROUTE_METERS,
+        description='Distance from the planned route beyond which the vehicle is re-routed',
+        ge=10,
+        le=5000,
+    ),
+) -> Dict:
+    """Estimate when a vehicle 'Em Rota' reaches its destino_atual from its live position.
+
+    The first call routes localizacao_atual -> destino_atual and keeps the route geometry
+    and steps for the vehicle. Later calls snap the new localizacao_atual onto that route
+    and add up the remaining step durations, without any API call. The vehicle is only
+    re-routed when it is more than off_route_meters away from the route or its destination
+    changed, so frequent ETA polling stays nearly free.
+
+    Returns:
+        dict with the ETA, remaining distance and duration, progress along the route, the
+        current road, distance from the route, whether it was re-routed (and why) and
+        from_cache.
+    """
+    try:
+        value = json.loads(vehicle) if isinstance(vehicle, str) else vehicle
+        trip = parse_vehicle_trip(value)
+        if trip['id'] is None:
+            raise ValueError('vehicle has no veiculo_id')
+        if trip['status'] not in (None, 'Em Rota'):
+            raise ValueError(f'Vehicle {trip["id"]} is not Em Rota (status: {trip["status"]})')
+    except (ValueError, json.JSONDecodeError) as e:
+        await ctx.error(str(e))
+        return {'error': str(e)}
+    route = tracked_routes.get(str(trip['id']))
+    reason = None
+    if route is None or route.travel_mode != travel_mode:
+        reason = 'new_route'
+    elif cell_key(*route.destination, ROUTE_CACHE_PRECISION_METERS) != cell_key(
+        *trip['destination'], ROUTE_CACHE_PRECISION_METERS
+    ):
+        reason = 'destination_changed'
+    else:
+        offset, distance = route.snap(trip['position'], off_route_meters)
+        if distance > off_route_meters:
+            reason = 'off_route'
+    from_cache = True
+    if reason is not None:
+        try:
+            route, from_cache = await track_route(trip, travel_mode)
+        except Exception as e:
+            return {'error': str(e)}
+        offset, distance = route.snap(trip['position'], off_route_meters)
+    route.advance(offset)
+    remaining = route.remaining(offset)
+    eta = datetime.now(LOCAL_TIMEZONE) + timedelta(seconds=remaining['remaining_seconds'])
+    return {
+        'vehicle_id': trip['id'],
+        'eta': eta.isoformat(timespec='seconds'),
+        **remaining,
+        'off_route_meters': int(round(distance)),
+        'rerouted': reason is not None,
+        'reason': reason,
+        'from_cache': from_cache,
+    }
+
+
+# Largest number of candidates ranked by nearest_candidates
+NEAREST_MAX_CANDIDATES = int(os.environ.get('NEAREST_MAX_CANDIDATES', 50000))
+
+
+@mcp.tool()
+async def nearest_candidates(
+    ctx: Context,
+    target_position: list = Field(description='Target position as [longitude, latitude]'),
+    candidates: str = Field(
+        description='JSON array of records with a position: [longitude, latitude], {"id", "position"} or DynamoDB items (vehicles are located by localizacao_atual)'
+    ),
+    k: int = Field(
+        default=5, description='Number of nearest candidates to return', ge=1, le=15
+    ),
+    use_road_routes: bool = Field(
+        default=True,
+        description='Also fetch road distance/duration for the k nearest and rank by duration',
+    ),
+    travel_mode: str = Field(
+        default='Car',
+        description="Travel mode: 'Car', 'Truck', 'Walking', or 'Bicycle' (default: 'Car')",
+    ),
+) -> Dict:
+    """Find the candidates (e.g. vehicles) closest to a target such as an order's delivery address.
+
+    All candidates are ranked locally by straight-line (great-circle) distance and only the k
+    nearest are sent to the routing API, in a single route matrix request. Prefer this over
+    calling calculate_route for every vehicle.
+
+    Returns:
+        dict with nearest (id, position, straight_line_meters and, with use_road_routes,
+        distance_meters and duration_seconds, sorted by duration) and the candidate count.
+    """
+    try:
+        if not is_position(target_position):
+            raise ValueError('target_position must be [longitude, latitude]')
+        located = parse_candidates(parse_json_list(candidates, 'candidates'))
+        if not located:
+            raise ValueError('candidates must not be empty')
+        if len(located) > NEAREST_MAX_CANDIDATES:
+            raise ValueError(
+                f'Too many candidates ({len(located)}), the maximum is {NEAREST_MAX_CANDIDATES}'
+            )
+    except ValueError as e:
+        await ctx.error(str(e))
+        return {'error': str(e)}
+
+    positions = np.array([c['position'] for c in located], dtype=np.float64)
+    straight_line = haversine_meters(target_position, positions)
+    nearest = nearest_indices(straight_line, k)
+    ranked = [
+        {
+            'id': located[i]['id'],
+            'position': located[i]['position'],
+            'straight_line_meters': int(straight_line[i]),
+        }
+        for i in nearest.tolist()
+    ]
+    result = {'nearest': ranked, 'candidates': len(located)}
+    if not use_road_routes:
+        return result
+    if geo_routes_client.geo_routes_client is None:
+        return {**result, 'error': 'Failed to initialize Amazon geo-routes client'}
+    try:
+        distances, durations, _ = await road_matrices(
+            positions[nearest], np.array([target_position], dtype=np.float64), travel_mode
+        )
+    except Exception as e:
+        return {**result, 'error': str(e)}
+    for entry, distance, duration in zip(ranked, distances[:, 0], durations[:, 0]):
+        entry['distance_meters'] = None if distance == UNREACHABLE else int(distance)
+        entry['duration_seconds'] = None if duration == UNREACHABLE else int(duration)
+    ranked.sort(
+        key=lambda e: float('inf') if e['duration_seconds'] is None else e['duration_seconds']
+    )
+    return result
+
+
+# Add a health check route handler
+async def health_check(request):
+    return JSONResponse(
+        {
+            'status': 'healthy',
+            'service': 'aws-location-mcp-server',
+            'clients': registry.stats(),
+            'executor': executor.stats(),
+            'caches': {
+                'geocode': geocode_cache.stats(),
+                'reverse_geocode': reverse_geocode_cache.stats(),
+                'place': place_cache.stats(),
+                'opening_hours': opening_hours_cache.stats(),
+                'place_index': place_index.stats(),
+                'route': route_cache.stats(),
+                'route_geometry': route_geometry_cache.stats(),
+                'route_matrix': matrix_cache.stats(),
+                'service_area': service_area_cache.stats(),
+                'tracked_route': tracked_routes.stats(),
+            },
+            'route_plans': route_plans.stats(),
+        }
+    )
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Build the shared clients before the first request arrives
+    await asyncio.to_thread(registry.warm_up)
+    yield
+
+
+def create_app() -> Starlette:
+    """Create a custom Starlette app that includes our health check
+    AND properly integrates with the MCP SSE implementation."""
+    return Starlette(
+        routes=[
+            Route(f'{BASE_PATH}/', health_check),
+            Route(f'{BASE_PATH}/sse', endpoint=handle_sse),
+            Mount(f'{BASE_PATH}/messages/', app=sse.handle_post_message),
+        ],
+        middleware=[
+            Middleware(AuthMiddleware)
+        ],
+        lifespan=lifespan,
+    )
+
+
+if __name__ == '__main__':
+    # Get port from environment or use default
+    port = int(os.environ.get('PORT', 5500))
+
+    app = create_app()
+
     print(f'Starting AWS Location Service MCP Server on port {port}. Press CTRL+C to exit.')
     
     # For container environments like Fargate/ECS, we need to bind to 0.0.0.0
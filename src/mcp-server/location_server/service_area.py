@@ -0,0 +1,211 @@
+import numpy as np
+import os
+from caches import TTLCache
+from geo_executor import geo_routes
+from geometry import METERS_PER_DEGREE, cell_key
+from polyline import decode_flexible_polyline, encode_flexible_polyline
+from route_matrix import fetch_route_matrix
+from typing import Dict, List, Tuple
+
+
+# How areas are computed: 'isolines' (geo-routes calculate_isolines) or 'matrix' (sampled
+# travel times); the fake geo backend has no isolines, so it defaults to 'matrix'
+SERVICE_AREA_METHOD = os.environ.get('SERVICE_AREA_METHOD') or (
+    'matrix' if os.environ.get('GEO_BACKEND') == 'fake' else 'isolines'
+)
+
+# Directions and distance steps sampled around a base by the matrix approximation
+SERVICE_AREA_BEARINGS = int(os.environ.get('SERVICE_AREA_BEARINGS', 24))
+SERVICE_AREA_RINGS = int(os.environ.get('SERVICE_AREA_RINGS', 10))
+
+# Upper bound of the average speed per travel mode in m/s, which sizes the sampled disc
+MAX_SPEEDS = {
+    'Car': 25.0,
+    'Truck': 22.0,
+    'Scooter': 14.0,
+    'Bicycle': 7.0,
+    'Walking': 1.8,
+    'Pedestrian': 1.8,
+}
+
+# Largest (points x edges) block evaluated at once by the point-in-polygon test
+POINT_IN_POLYGON_BLOCK_CELLS = int(os.environ.get('POINT_IN_POLYGON_BLOCK_CELLS', 2_000_000))
+
+# Encoded polygon rings per base, threshold and travel mode
+service_area_cache = TTLCache(
+    'service_area',
+    ttl_seconds=float(os.environ.get('SERVICE_AREA_CACHE_TTL_SECONDS', 86400)),
+    max_entries=int(os.environ.get('SERVICE_AREA_CACHE_MAX_ENTRIES', 1024)),
+    path=os.environ.get('SERVICE_AREA_CACHE_PATH') or None,
+)
+
+
+class ServiceArea:
+    """Reachability polygon of one base, kept as flat edge arrays for containment tests.
+
+    rings are (n, 2) [longitude, latitude] arrays, open or closed. Outer
+    boundaries and holes may be mixed: a point is inside when a ray from it
+    crosses an odd number of edges over all rings (even-odd rule).
+    """
+
+    __slots__ = ('rings', 'bbox', 'x1', 'y1', 'y2', 'slope')
+
+    def __init__(self, rings: List[np.ndarray]):
+        """Build the edge arrays and bounding box of the rings."""
+        self.rings = [np.asarray(ring, dtype=np.float64).reshape(-1, 2) for ring in rings]
+        self.rings = [ring for ring in self.rings if len(ring) >= 3]
+        if self.rings:
+            starts = np.concatenate(self.rings)
+            ends = np.concatenate([np.roll(ring, -1, axis=0) for ring in self.rings])
+            self.bbox = (*starts.min(axis=0), *starts.max(axis=0))
+        else:
+            starts = ends = np.empty((0, 2))
+            self.bbox = (np.inf, np.inf, -np.inf, -np.inf)
+        self.x1, self.y1, self.y2 = starts[:, 0], starts[:, 1], ends[:, 1]
+        # Horizontal edges never straddle a ray, so their infinite slope is masked out
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.slope = (ends[:, 0] - starts[:, 0]) / (ends[:, 1] - starts[:, 1])
+
+    @classmethod
+    def from_polylines(cls, polylines: List[str]) -> 'ServiceArea':
+        """Build an area from FlexiblePolyline encoded rings."""
+        return cls([decode_flexible_polyline(encoded)[0] for encoded in polylines])
+
+    def to_polylines(self) -> List[str]:
+        """Encode the rings as FlexiblePolylines."""
+        return [encode_flexible_polyline(ring) for ring in self.rings]
+
+    @property
+    def vertices(self) -> int:
+        return sum(len(ring) for ring in self.rings)
+
+    def contains(self, points) -> np.ndarray:
+        """Return a boolean array telling which (n, 2) points lie inside the area.
+
+        Points outside the bounding box are rejected first; the rest are tested
+        against every edge at once, in blocks that bound memory use.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        inside = np.zeros(len(points), dtype=bool)
+        west, south, east, north = self.bbox
+        candidates = np.flatnonzero(
+            (points[:, 0] >= west)
+            & (points[:, 0] <= east)
+            & (points[:, 1] >= south)
+            & (points[:, 1] <= north)
+        )
+        block = max(1, POINT_IN_POLYGON_BLOCK_CELLS // max(len(self.x1), 1))
+        for start in range(0, len(candidates), block):
+            index = candidates[start:start + block]
+            px, py = points[index, 0, None], points[index, 1, None]
+            straddles = (self.y1 > py) != (self.y2 > py)
+            with np.errstate(invalid='ignore'):
+                crossing_x = self.x1 + (py - self.y1) * self.slope
+            crossings = np.count_nonzero(straddles & (px < crossing_x), axis=1)
+            inside[index] = crossings % 2 == 1
+        return inside
+
+
+def sample_disc(
+    center, radius_m: float, bearings: int, rings: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (radii, points) sampled on `rings` circles up to radius_m around center.
+
+    points is (bearings * rings, 2), bearing-major: the samples of bearing b
+    are points[b * rings:(b + 1) * rings], from the innermost ring outwards.
+    """
+    lon, lat = center
+    radii = radius_m * np.arange(1, rings + 1) / rings
+    angles = 2 * np.pi * np.arange(bearings) / bearings
+    east = np.outer(np.sin(angles), radii) / (METERS_PER_DEGREE * np.cos(np.radians(lat)))
+    north = np.outer(np.cos(angles), radii) / METERS_PER_DEGREE
+    return radii, np.column_stack([lon + east.ravel(), lat + north.ravel()])
+
+
+def star_polygon(center, radii: np.ndarray, durations: np.ndarray, threshold_seconds: float):
+    """Return the ring reachable within threshold_seconds from sampled travel times.
+
+    durations is (bearings, rings) with negative values for samples without a
+    route. Along each bearing the boundary lies between the last sample
+    reached in time and the first one that is not, interpolated linearly in
+    travel time (the center counts as reached at time zero).
+    """
+    bearings, rings = durations.shape
+    reached = (durations >= 0) & (durations <= threshold_seconds)
+    # Index of the first sample out of reach on each bearing, `rings` if all are reached
+    first_out = np.where(reached.all(axis=1), rings, np.argmin(reached, axis=1))
+    inner = first_out - 1
+    inner_radius = np.where(inner >= 0, radii[np.maximum(inner, 0)], 0.0)
+    inner_time = np.where(inner >= 0, durations[np.arange(bearings), np.maximum(inner, 0)], 0.0)
+    outer = np.minimum(first_out, rings - 1)
+    outer_radius = radii[outer]
+    outer_time = durations[np.arange(bearings), outer].astype(np.float64)
+    interpolate = (first_out < rings) & (outer_time > inner_time)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = np.clip((threshold_seconds - inner_time) / (outer_time - inner_time), 0, 1)
+    radius = np.where(
+        interpolate, inner_radius + fraction * (outer_radius - inner_radius), inner_radius
+    )
+    radius = np.where(first_out == rings, radii[-1], radius)
+    # Keep a sliver around the base so a bearing without any route does not collapse the ring
+    radius = np.maximum(radius, radii[0] * 0.05)
+    lon, lat = center
+    angles = 2 * np.pi * np.arange(bearings) / bearings
+    return np.column_stack(
+        [
+            lon + radius * np.sin(angles) / (METERS_PER_DEGREE * np.cos(np.radians(lat))),
+            lat + radius * np.cos(angles) / METERS_PER_DEGREE,
+        ]
+    )
+
+
+def isoline_rings(response: Dict) -> List[np.ndarray]:
+    """Return every ring of the first isoline in a calculate_isolines response."""
+    rings = []
+    isolines = response.get('Isolines', [])
+    for geometry in isolines[0].get('Geometries', []) if isolines else []:
+        for encoded in geometry.get('PolylinePolygon', []):
+            rings.append(decode_flexible_polyline(encoded)[0])
+        for ring in geometry.get('Polygon', []):
+            rings.append(np.asarray(ring, dtype=np.float64))
+    return rings
+
+
+async def compute_service_area(
+    position: List[float],
+    threshold_seconds: int,
+    travel_mode: str = 'Car',
+    method: str = SERVICE_AREA_METHOD,
+) -> Tuple[ServiceArea, Dict]:
+    """Return the area reachable from position within threshold_seconds, and how it was obtained.
+
+    Areas are cached per 50 m cell, threshold, travel mode and method, so
+    repeated reachability questions about the same bases cost no API calls.
+    """
+    key = f'{cell_key(position[0], position[1], 50)}:{travel_mode}:{threshold_seconds}:{method}'
+    cached = service_area_cache.get(key)
+    if cached is not None:
+        area = ServiceArea.from_polylines(cached)
+        return area, {'method': method, 'from_cache': True, 'api_calls': 0}
+    if method == 'matrix':
+        radius = threshold_seconds * MAX_SPEEDS.get(travel_mode, MAX_SPEEDS['Car'])
+        radii, samples = sample_disc(position, radius, SERVICE_AREA_BEARINGS, SERVICE_AREA_RINGS)
+        _, durations, stats = await fetch_route_matrix(
+            np.array([position], dtype=np.float64), samples, travel_mode
+        )
+        durations = durations.reshape(SERVICE_AREA_BEARINGS, SERVICE_AREA_RINGS)
+        area = ServiceArea([star_polygon(position, radii, durations, threshold_seconds)])
+        api_calls = stats['tiles_fetched']
+    else:
+        response = await geo_routes(
+            'calculate_isolines',
+            Origin=position,
+            Thresholds={'Time': [int(threshold_seconds)]},
+            TravelMode=travel_mode,
+            IsolineGeometryFormat='FlexiblePolyline',
+            OptimizeIsolineFor='BalancedCalculation',
+        )
+        area = ServiceArea(isoline_rings(response))
+        api_calls = 1
+    service_area_cache.set(key, area.to_polylines())
+    return area, {'method': method, 'from_cache': False, 'api_calls': api_calls}
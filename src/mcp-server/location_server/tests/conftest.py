@@ -0,0 +1,26 @@
+import os
+import pytest
+import sys
+
+
+# The server modules are flat files in the directory above, as in the container image
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tool tests run on the offline fake geo backend, never against Amazon Location
+os.environ.setdefault('GEO_BACKEND', 'fake')
+os.environ.setdefault('FASTMCP_LOG_LEVEL', 'ERROR')
+
+
+class Context:
+    """Minimal MCP context for calling tool functions directly; keeps reported errors."""
+
+    def __init__(self):
+        self.errors = []
+
+    async def error(self, message):
+        self.errors.append(message)
+
+
+@pytest.fixture
+def ctx():
+    return Context()
@@ -0,0 +1,160 @@
+import caches
+import pytest
+from caches import StaleWhileRevalidateCache, TTLCache, normalize_query
+
+
+class Clock:
+    """Replacement for time.time that only moves when told to."""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(caches.time, 'time', clock)
+    return clock
+
+
+def test_normalize_query():
+    assert normalize_query('CD  Guarulhos') == normalize_query('cd guarulhos')
+    assert normalize_query('São Bernardo do Campo') == 'sao bernardo do campo'
+
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = TTLCache('test', ttl_seconds=60, max_entries=10)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl_seconds=5)
+    clock.now += 5
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    clock.now += 55
+    assert cache.get('a') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache('test', ttl_seconds=60, max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_set_if_absent_keeps_unexpired_entries(clock):
+    cache = TTLCache('test', ttl_seconds=60, max_entries=10)
+    assert cache.set_if_absent('a', 1)
+    assert not cache.set_if_absent('a', 2)
+    assert cache.get('a') == 1
+    # An expired entry counts as absent
+    clock.now += 60
+    assert cache.set_if_absent('a', 3)
+    assert cache.get('a') == 3
+
+
+def test_entries_persist_across_a_restart(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = TTLCache('geocode', ttl_seconds=60, max_entries=10, path=path)
+    cache.set('a', {'position': [-46.6, -23.5]})
+    cache.set('b', [1, 2])
+    cache.flush()
+    assert cache.stats()['persisted'] == 2
+    assert cache.stats()['pending_writes'] == 0
+    reopened = TTLCache('geocode', ttl_seconds=60, max_entries=10, path=path)
+    assert reopened.get('a') == {'position': [-46.6, -23.5]}
+    assert reopened.get('b') == [1, 2]
+    # Caches sharing a file keep their entries apart
+    assert TTLCache('places', ttl_seconds=60, max_entries=10, path=path).get('a') is None
+
+
+def test_expired_and_cleared_entries_are_not_reloaded(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = TTLCache('geocode', ttl_seconds=60, max_entries=10, path=path)
+    cache.set('old', 1, ttl_seconds=-1)
+    cache.set('new', 2)
+    cache.flush()
+    reopened = TTLCache('geocode', ttl_seconds=60, max_entries=10, path=path)
+    assert len(reopened) == 1
+    reopened.clear()
+    reopened.flush()
+    assert len(TTLCache('geocode', ttl_seconds=60, max_entries=10, path=path)) == 0
+
+
+def test_values_that_are_not_json_are_skipped(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = TTLCache('geocode', ttl_seconds=60, max_entries=10, path=path)
+    cache.set('bad', {1, 2})
+    cache.set('good', 'ok')
+    cache.flush()
+    assert cache.get('bad') == {1, 2}
+    reopened = TTLCache('geocode', ttl_seconds=60, max_entries=10, path=path)
+    assert reopened.get('bad') is None
+    assert reopened.get('good') == 'ok'
+
+
+def test_stale_entries_are_served_until_they_expire(clock):
+    cache = StaleWhileRevalidateCache('places', fresh_seconds=60, stale_seconds=300, max_entries=10)
+    cache.set('p1', {'Title': 'CD Guarulhos'})
+    assert cache.lookup('p1') == ({'Title': 'CD Guarulhos'}, True)
+    clock.now += 61
+    assert cache.lookup('p1') == ({'Title': 'CD Guarulhos'}, False)
+    clock.now += 300
+    assert cache.lookup('p1') == (None, False)
+    assert cache.stats()['stale_hits'] == 1
+
+
+def test_seeded_entries_are_stale_and_never_overwrite(clock):
+    cache = StaleWhileRevalidateCache('places', fresh_seconds=60, stale_seconds=300, max_entries=10)
+    cache.seed('p1', {'Title': 'partial'})
+    assert cache.lookup('p1') == ({'Title': 'partial'}, False)
+    cache.set('p2', {'Title': 'full'})
+    cache.seed('p2', {'Title': 'partial'})
+    assert cache.lookup('p2') == ({'Title': 'full'}, True)
+    cache.set('p1', {'Title': 'full'})
+    assert cache.lookup('p1') == ({'Title': 'full'}, True)
+    assert cache.stats()['seeded'] == 1
+
+
+class InterleavingLock:
+    """Lock that runs `between` once, right after it is first released."""
+
+    def __init__(self, lock, between):
+        self.lock = lock
+        self.between = between
+
+    def __enter__(self):
+        self.lock.acquire()
+
+    def __exit__(self, *exc):
+        self.lock.release()
+        between, self.between = self.between, None
+        if between is not None:
+            between()
+
+
+def test_a_lookup_stored_while_seeding_is_not_overwritten(clock):
+    cache = StaleWhileRevalidateCache('places', fresh_seconds=60, stale_seconds=300, max_entries=10)
+    # A real lookup lands as soon as the seed lets go of the lock
+    cache._lock = InterleavingLock(cache._lock, lambda: cache.set('p1', {'Title': 'full'}))
+    cache.seed('p1', {'Title': 'partial'})
+    assert cache.lookup('p1') == ({'Title': 'full'}, True)
+
+
+def test_only_one_refresh_runs_per_key():
+    cache = StaleWhileRevalidateCache('places', fresh_seconds=60, stale_seconds=300, max_entries=10)
+    assert cache.begin_refresh('p1')
+    assert not cache.begin_refresh('p1')
+    assert cache.begin_refresh('p2')
+    assert cache.stats()['refreshing'] == 2
+    cache.end_refresh('p1')
+    assert cache.begin_refresh('p1')
+    assert cache.stats()['refreshes'] == 3
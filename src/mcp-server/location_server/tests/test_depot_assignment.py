@@ -0,0 +1,54 @@
+import numpy as np
+from depot_assignment import assign_by_regret
+
+
+def test_order_with_most_regret_goes_first():
+    # Both orders prefer depot 0, which has room for one; order 1 loses more without it
+    cost = np.array([[1.0, 2.0], [2.0, 10.0]])
+    demands = np.ones((2, 1))
+    capacities = np.ones((2, 1))
+    assert assign_by_regret(cost, demands, capacities).tolist() == [1, 0]
+
+
+def test_unlimited_capacity_is_nearest_depot():
+    rng = np.random.default_rng(5)
+    cost = rng.uniform(1, 100, (4, 30))
+    assignment = assign_by_regret(cost, np.ones((30, 2)), np.full((4, 2), np.inf))
+    assert assignment.tolist() == np.argmin(cost, axis=0).tolist()
+
+
+def test_capacities_are_respected_in_every_dimension():
+    rng = np.random.default_rng(11)
+    cost = rng.uniform(1, 100, (3, 40))
+    demands = np.column_stack([rng.uniform(10, 50, 40), rng.uniform(0.1, 1.0, 40)])
+    capacities = np.array([[400.0, 6.0], [500.0, 4.0], [300.0, 10.0]])
+    assignment = assign_by_regret(cost, demands, capacities)
+    for depot in range(3):
+        load = demands[assignment == depot].sum(axis=0)
+        assert (load <= capacities[depot] + 1e-6).all()
+    # Unassigned orders fit in no depot's remaining room
+    for order in np.flatnonzero(assignment < 0):
+        room = capacities - [demands[assignment == d].sum(axis=0) for d in range(3)]
+        assert not (demands[order] <= room).all(axis=1).any()
+
+
+def test_exact_fit_is_accepted():
+    cost = np.array([[1.0, 1.0, 1.0]])
+    demands = np.array([[0.1], [0.2], [0.7]])
+    assert assign_by_regret(cost, demands, np.array([[1.0]])).tolist() == [0, 0, 0]
+
+
+def test_orders_without_a_depot_are_left_out():
+    cost = np.array([[5.0, 50.0, 1.0], [6.0, 60.0, 2.0]])
+    demands = np.array([[1.0], [1.0], [3.0]])
+    capacities = np.array([[2.0], [2.0]])
+    # Order 1 is beyond max_cost of both depots and order 2 fits in neither
+    assignment = assign_by_regret(cost, demands, capacities, max_cost=40.0)
+    assert assignment.tolist() == [0, -1, -1]
+
+
+def test_full_depot_sends_orders_to_the_next_one():
+    cost = np.array([[1.0, 1.0, 1.0, 1.0], [3.0, 4.0, 5.0, 6.0]])
+    assignment = assign_by_regret(cost, np.ones((4, 1)), np.array([[2.0], [2.0]]))
+    # The orders with the most to lose from depot 0 keep it
+    assert assignment.tolist() == [1, 1, 0, 0]
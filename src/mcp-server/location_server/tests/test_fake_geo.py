@@ -0,0 +1,34 @@
+import botocore.exceptions
+import pytest
+from fake_geo import SPEEDS, FakeGeoBackend, FakeGeoPlacesClient, FakeGeoRoutesClient
+
+
+@pytest.fixture(scope='module')
+def backend():
+    return FakeGeoBackend(places_per_city=20)
+
+
+@pytest.mark.parametrize('mode', ['Car', 'Truck', 'Walking', 'Bicycle'])
+def test_advertised_travel_modes_have_their_own_speed(backend, mode):
+    routes = FakeGeoRoutesClient(backend)
+    route = routes.calculate_routes([-46.6333, -23.5505], [-46.6, -23.54], TravelMode=mode)
+    distance = route['Routes'][0]['Distance']
+    assert route['Routes'][0]['DurationSeconds'] == pytest.approx(distance / SPEEDS[mode], abs=1)
+
+
+def test_walking_is_pedestrian_speed(backend):
+    routes = FakeGeoRoutesClient(backend)
+    walking = routes.calculate_routes([-46.6333, -23.5505], [-46.6, -23.54], TravelMode='Walking')
+    car = routes.calculate_routes([-46.6333, -23.5505], [-46.6, -23.54], TravelMode='Car')
+    assert walking['Routes'][0]['DurationSeconds'] > 5 * car['Routes'][0]['DurationSeconds']
+    assert SPEEDS['Walking'] == SPEEDS['Pedestrian']
+
+
+def test_get_place_finds_every_place_by_id(backend):
+    places = FakeGeoPlacesClient(backend)
+    for place in backend.places[::37]:
+        found = places.get_place(PlaceId=place['PlaceId'])
+        assert found['PlaceId'] == place['PlaceId']
+        assert found['Position'] == place['Position']
+    with pytest.raises(botocore.exceptions.ClientError):
+        places.get_place(PlaceId='fake-missing')
@@ -0,0 +1,105 @@
+import pytest
+from fleet import parse_deliveries, parse_vehicles, unwrap_attribute_values
+
+
+def coordinates(latitude, longitude):
+    return {'coordenadas': {'latitude': latitude, 'longitude': longitude}}
+
+
+VEICULO = {
+    'veiculo_id': 'V1',
+    'placa': 'ABC1D23',
+    'capacidade_kg': 1200,
+    'capacidade_m3': 8.5,
+    'status': 'Em Rota',
+    'base_operacional': {'nome': 'CD São Bernardo do Campo', **coordinates(-23.7214, -46.5658)},
+    'localizacao_atual': {'bairro': 'Vila Olímpia', **coordinates(-23.5959, -46.6847)},
+}
+
+ENTREGA = {
+    'entrega_id': 'E1',
+    'pedido_id': 'P1',
+    'veiculo_id': 'V1',
+    'origem': {'nome': 'CD São Bernardo do Campo', **coordinates(-23.7214, -46.5658)},
+    'destino': {'bairro': 'Moema', **coordinates(-23.6008, -46.6680)},
+    'localizacao_atual': {'bairro': 'Vila Olímpia', **coordinates(-23.5959, -46.6847)},
+    'peso_kg': 12.5,
+}
+
+PEDIDO = {
+    'pedido_id': 'P2',
+    'cliente_id': 'C9',
+    'localizacao_entrega': coordinates(-22.9056, -47.0608),
+    'peso': 3,
+    'volume_m3': 0.2,
+}
+
+
+def test_vehicle_from_veiculos_item():
+    (vehicle,) = parse_vehicles([VEICULO])
+    assert vehicle == {
+        'id': 'V1',
+        'depot': [-46.5658, -23.7214],
+        'depot_name': 'CD São Bernardo do Campo',
+        'position': [-46.6847, -23.5959],
+        'capacity': [1200.0, 8.5],
+        'status': 'Em Rota',
+    }
+
+
+def test_vehicle_without_position_or_capacity():
+    item = {'veiculo_id': 'V2', 'base_operacional': coordinates(-23.5, -46.6)}
+    (vehicle,) = parse_vehicles([item])
+    assert vehicle['position'] == vehicle['depot'] == [-46.6, -23.5]
+    assert vehicle['capacity'] == [float('inf'), float('inf')]
+
+
+def test_vehicle_without_base_is_rejected():
+    with pytest.raises(ValueError, match=r'vehicles\[0\]'):
+        parse_vehicles([{'veiculo_id': 'V3', **coordinates(-23.5, -46.6)}])
+
+
+def test_entrega_is_labelled_by_entrega_id_and_located_at_destino():
+    (delivery,) = parse_deliveries([ENTREGA])
+    # Not the veiculo_id, and not where the package is now
+    assert delivery == {'id': 'E1', 'position': [-46.6680, -23.6008], 'demand': [12.5, 0.0]}
+
+
+def test_entregas_on_the_same_vehicle_keep_their_own_ids():
+    deliveries = parse_deliveries([ENTREGA, {**ENTREGA, 'entrega_id': 'E2'}])
+    assert [d['id'] for d in deliveries] == ['E1', 'E2']
+
+
+def test_pedido_is_located_at_localizacao_entrega():
+    (delivery,) = parse_deliveries([PEDIDO])
+    assert delivery == {'id': 'P2', 'position': [-47.0608, -22.9056], 'demand': [3.0, 0.2]}
+
+
+def test_plain_delivery_with_position():
+    (delivery,) = parse_deliveries([{'position': [-46.6, -23.5], 'peso_kg': 1}])
+    assert delivery == {'id': 0, 'position': [-46.6, -23.5], 'demand': [1.0, 0.0]}
+
+
+def test_delivery_without_position_is_rejected():
+    with pytest.raises(ValueError, match=r'deliveries\[1\]'):
+        parse_deliveries([PEDIDO, {'pedido_id': 'P3'}])
+
+
+def test_dynamodb_attribute_values_are_unwrapped():
+    item = {
+        'M': {
+            'entrega_id': {'S': 'E7'},
+            'veiculo_id': {'S': 'V1'},
+            'peso_kg': {'N': '4.5'},
+            'destino': {
+                'M': {
+                    'coordenadas': {
+                        'M': {'latitude': {'N': '-23.6'}, 'longitude': {'N': '-46.7'}}
+                    }
+                }
+            },
+        }
+    }
+    assert unwrap_attribute_values(item)['peso_kg'] == 4.5
+    (delivery,) = parse_deliveries([item])
+    assert delivery == {'id': 'E7', 'position': [-46.7, -23.6], 'demand': [4.5, 0.0]}
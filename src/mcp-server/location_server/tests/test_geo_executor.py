@@ -0,0 +1,114 @@
+import asyncio
+import pytest
+import threading
+from client_registry import registry
+from geo_executor import GeoExecutor, count_geo_calls
+
+
+class GatedClient:
+    """Stub geo client whose calls block until the gate opens."""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+
+    def lookup(self, **params):
+        self.calls.append(params)
+        self.gate.wait(5)
+        return {'params': params}
+
+
+@pytest.fixture
+def client():
+    client = GatedClient()
+    registry.register('geo-test', client)
+    yield client
+    client.gate.set()
+    registry.register('geo-test', None)
+
+
+async def until(condition):
+    for _ in range(500):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError('condition not reached')
+
+
+def test_identical_concurrent_calls_share_one_backend_call(client):
+    executor = GeoExecutor(max_workers=4)
+
+    async def scenario():
+        calls = [executor.run('geo-test', 'lookup', Text='a') for _ in range(5)]
+        calls.append(executor.run('geo-test', 'lookup', Text='b'))
+        tasks = [asyncio.ensure_future(call) for call in calls]
+        await until(lambda: len(client.calls) == 2)
+        client.gate.set()
+        return await asyncio.gather(*tasks)
+
+    results = asyncio.run(scenario())
+    assert results[:5] == [{'params': {'Text': 'a'}}] * 5
+    assert results[5] == {'params': {'Text': 'b'}}
+    assert sorted(call['Text'] for call in client.calls) == ['a', 'b']
+    assert executor.coalesced == {'geo-test.lookup': 4}
+
+
+def test_cancelling_one_waiter_keeps_the_call_for_the_others(client):
+    executor = GeoExecutor(max_workers=4)
+
+    async def scenario():
+        first = asyncio.ensure_future(executor.run('geo-test', 'lookup', Text='a'))
+        second = asyncio.ensure_future(executor.run('geo-test', 'lookup', Text='a'))
+        await until(lambda: client.calls)
+        first.cancel()
+        await asyncio.sleep(0.05)
+        client.gate.set()
+        return first, await second
+
+    first, result = asyncio.run(scenario())
+    assert first.cancelled()
+    assert result == {'params': {'Text': 'a'}}
+    assert len(client.calls) == 1
+
+
+def test_cancelling_the_last_waiter_cancels_the_call(client):
+    # One call at a time, so the second call waits for the first to finish
+    executor = GeoExecutor(max_workers=4, api_limits={'geo-test.lookup': 1})
+
+    async def scenario():
+        busy = asyncio.ensure_future(executor.run('geo-test', 'lookup', Text='busy'))
+        await until(lambda: client.calls)
+        counter = {'issued': 0}
+        with count_geo_calls(counter):
+            waiters = [
+                asyncio.ensure_future(executor.run('geo-test', 'lookup', Text='queued'))
+                for _ in range(2)
+            ]
+        await asyncio.sleep(0.05)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.sleep(0.05)
+        client.gate.set()
+        await busy
+        await asyncio.sleep(0.05)
+        # The call is gone from the shared calls, so the next one is sent afresh
+        again = await executor.run('geo-test', 'lookup', Text='queued')
+        return counter, again
+
+    counter, again = asyncio.run(scenario())
+    assert again == {'params': {'Text': 'queued'}}
+    assert [call['Text'] for call in client.calls] == ['busy', 'queued']
+    assert counter == {'issued': 0}
+
+
+def test_without_coalescing_every_call_is_sent(client):
+    executor = GeoExecutor(max_workers=4, coalesce=False)
+    client.gate.set()
+
+    async def scenario():
+        return await asyncio.gather(
+            *(executor.run('geo-test', 'lookup', Text='a') for _ in range(3))
+        )
+
+    assert len(asyncio.run(scenario())) == 3
+    assert len(client.calls) == 3
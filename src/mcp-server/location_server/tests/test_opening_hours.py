@@ -0,0 +1,172 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from opening_hours import (
+    OpeningHours,
+    parse_duration,
+    parse_open_time,
+    parse_opening_hours,
+    recurrence_days,
+)
+
+
+SAO_PAULO = timezone(timedelta(hours=-3))
+UTC_OFFSET = timedelta(0)
+
+
+def place(components, offset_seconds=-10800, categories=None):
+    """A place in the shape returned by geo-places, with one OpeningHours entry."""
+    entry = {'Display': ['...'], 'Components': components}
+    if categories:
+        entry['Categories'] = [{'Name': name} for name in categories]
+    return {'PlaceId': 'p1', 'OpeningHours': [entry], 'TimeZone': {'OffsetSeconds': offset_seconds}}
+
+
+def at(day, hour, minute=0, tz=SAO_PAULO):
+    """A time in the week of Monday 2026-10-12."""
+    return datetime(2026, 10, 12 + day, hour, minute, tzinfo=tz)
+
+
+def test_parsers():
+    assert parse_open_time('T073000') == 7 * 60 + 30
+    assert parse_open_time('T22') == 22 * 60
+    assert parse_duration('PT10H30M') == 630
+    assert parse_duration('PT24H00M') == 24 * 60
+    assert parse_duration('P1DT2H') == 26 * 60
+    assert parse_duration('PT0H0M30S') == 1
+    with pytest.raises(ValueError):
+        parse_duration('10 hours')
+    assert recurrence_days('FREQ:DAILY;BYDAY:MO,TU,WE,TH,FR') == [0, 1, 2, 3, 4]
+    assert recurrence_days('FREQ=WEEKLY;BYDAY=SA') == [5]
+    assert recurrence_days('FREQ:DAILY') == list(range(7))
+    assert recurrence_days(None) == list(range(7))
+
+
+def test_parse_opening_hours_reads_place_and_contacts():
+    parsed = parse_opening_hours(place([{'OpenTime': 'T080000'}], categories=['Pharmacy']))
+    assert parsed[0]['categories'] == ['Pharmacy']
+    nested = {'Contacts': {'OpeningHours': {'Display': ['Mo-Fr'], 'OpenNow': True}}}
+    assert parse_opening_hours(nested) == [
+        {'display': ['Mo-Fr'], 'components': [], 'open_now': True, 'categories': []}
+    ]
+    assert parse_opening_hours({}) == []
+
+
+def test_weekday_recurrence():
+    hours = OpeningHours.from_place(
+        place(
+            [
+                {
+                    'OpenTime': 'T080000',
+                    'OpenDuration': 'PT10H00M',
+                    'Recurrence': 'FREQ:DAILY;BYDAY:MO,TU,WE,TH,FR',
+                }
+            ]
+        ),
+        UTC_OFFSET,
+    )
+    assert hours.is_open(at(0, 8))
+    assert hours.is_open(at(4, 17, 59))
+    assert not hours.is_open(at(4, 18))
+    assert not hours.is_open(at(0, 7, 59))
+    assert not hours.is_open(at(5, 12))
+    assert not hours.is_open(at(6, 12))
+
+
+def test_hours_past_midnight():
+    # Friday and Saturday 22:00 until 02:00 of the next day
+    hours = OpeningHours.from_place(
+        place(
+            [
+                {
+                    'OpenTime': 'T220000',
+                    'OpenDuration': 'PT04H00M',
+                    'Recurrence': 'FREQ:DAILY;BYDAY:FR,SA',
+                }
+            ]
+        ),
+        UTC_OFFSET,
+    )
+    assert hours.is_open(at(4, 23))
+    assert hours.is_open(at(5, 1, 30))
+    assert not hours.is_open(at(5, 2))
+    assert not hours.is_open(at(5, 21))
+    assert hours.is_open(at(6, 1))
+    assert not hours.is_open(at(4, 1))
+
+
+def test_sunday_night_wraps_into_monday():
+    hours = OpeningHours.from_place(
+        place([{'OpenTime': 'T200000', 'OpenDuration': 'PT08H00M', 'Recurrence': 'BYDAY:SU'}]),
+        UTC_OFFSET,
+    )
+    assert hours.is_open(at(6, 23))
+    assert hours.is_open(at(0, 3))
+    assert not hours.is_open(at(0, 4))
+    assert not hours.is_open(at(6, 19))
+
+
+def test_open_all_day():
+    hours = OpeningHours.from_place(
+        place([{'OpenTime': 'T000000', 'OpenDuration': 'PT24H00M', 'Recurrence': 'BYDAY:SA'}]),
+        UTC_OFFSET,
+    )
+    assert hours.is_open(at(5, 0))
+    assert hours.is_open(at(5, 23, 59))
+    assert not hours.is_open(at(6, 0))
+    assert not hours.is_open(at(4, 23, 59))
+    always = OpeningHours.from_place(
+        place([{'OpenTime': 'T000000', 'OpenDuration': 'PT24H00M', 'Recurrence': 'FREQ:DAILY'}]),
+        UTC_OFFSET,
+    )
+    assert list(always.boundaries) == [0, 7 * 24 * 60]
+    assert all(always.is_open(at(day, hour)) for day in range(7) for hour in (0, 12, 23))
+
+
+def test_timezone_offsets():
+    component = {'OpenTime': 'T090000', 'OpenDuration': 'PT09H00M', 'Recurrence': 'BYDAY:MO'}
+    hours = OpeningHours.from_place(place([component]), UTC_OFFSET)
+    # 09:00 in São Paulo is 12:00 UTC
+    assert hours.is_open(at(0, 12, tz=timezone.utc))
+    assert not hours.is_open(at(0, 11, 59, tz=timezone.utc))
+    assert hours.is_open(at(0, 20, 59, tz=timezone.utc))
+    assert not hours.is_open(at(0, 21, tz=timezone.utc))
+    # Monday 01:00 UTC is still Sunday evening in São Paulo
+    assert hours.minute_of_week(at(0, 1, tz=timezone.utc)) == 6 * 24 * 60 + 22 * 60
+    # Without a TimeZone the default offset applies
+    without = place([component])
+    del without['TimeZone']
+    hours = OpeningHours.from_place(without, timedelta(hours=1))
+    assert hours.is_open(at(0, 8, tz=timezone.utc))
+    assert not hours.is_open(at(0, 7, 59, tz=timezone.utc))
+    assert not hours.is_open(at(0, 17, tz=timezone.utc))
+
+
+def test_is_open_between():
+    component = {'OpenTime': 'T090000', 'OpenDuration': 'PT09H00M', 'Recurrence': 'BYDAY:MO'}
+    hours = OpeningHours.from_place(place([component]), UTC_OFFSET)
+    assert hours.is_open_between(at(0, 8), at(0, 9, 30))
+    assert not hours.is_open_between(at(0, 7), at(0, 9))
+    assert not hours.is_open_between(at(0, 18), at(1, 0))
+    # A whole Sunday window does not reach Monday's opening, a window into Monday does
+    assert not hours.is_open_between(at(6, 0), at(6, 23, 59))
+    assert hours.is_open_between(at(6, 20), at(0, 9, 30) + timedelta(weeks=1))
+    assert hours.is_open_between(at(1, 0), at(1, 0) + timedelta(weeks=1))
+
+
+def test_category_entries_are_ignored_when_general_hours_exist():
+    entries = place([{'OpenTime': 'T080000', 'OpenDuration': 'PT02H00M'}])
+    entries['OpeningHours'].append(
+        {
+            'Components': [{'OpenTime': 'T000000', 'OpenDuration': 'PT24H00M'}],
+            'Categories': [{'Name': 'Pharmacy'}],
+        }
+    )
+    hours = OpeningHours.from_place(entries, UTC_OFFSET)
+    assert hours.is_open(at(2, 9))
+    assert not hours.is_open(at(2, 12))
+
+
+def test_unstructured_hours_compile_to_none():
+    assert OpeningHours.from_place({'OpeningHours': [{'Display': ['24h']}]}, UTC_OFFSET) is None
+    bad = place([{'OpenTime': 'T080000', 'OpenDuration': 'eight hours'}])
+    assert OpeningHours.from_place(bad, UTC_OFFSET) is None
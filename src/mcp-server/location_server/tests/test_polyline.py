@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+from geometry import METERS_PER_DEGREE
+from polyline import (
+    decode_flexible_polyline,
+    encode_flexible_polyline,
+    fit_to_budget,
+    significance,
+    simplify,
+)
+
+
+# Reference vector of the FlexiblePolyline specification, as [longitude, latitude]
+REFERENCE = 'BFoz5xJ67i1B1B7PzIhaxL7Y'
+REFERENCE_3D = 'BlBoz5xJ67i1BU1B7PUzIhaUxL7YU'
+REFERENCE_POINTS = [
+    [8.69821, 50.10228],
+    [8.69567, 50.10201],
+    [8.69150, 50.10063],
+    [8.68752, 50.09878],
+]
+
+
+def wiggly_route(count=2000, seed=3):
+    """A route in São Paulo with GPS-like noise around a gentle curve."""
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0, 1, count)
+    lon = -46.70 + 0.10 * t + 0.01 * np.sin(6 * t)
+    lat = -23.60 + 0.05 * t + rng.normal(0, 2e-5, count)
+    return np.column_stack([lon, lat])
+
+
+def test_decodes_the_reference_vector():
+    points, precision = decode_flexible_polyline(REFERENCE)
+    assert precision == 5
+    np.testing.assert_allclose(points, REFERENCE_POINTS)
+
+
+def test_encodes_the_reference_vector():
+    assert encode_flexible_polyline(np.array(REFERENCE_POINTS)) == REFERENCE
+
+
+def test_third_dimension_is_dropped():
+    points, precision = decode_flexible_polyline(REFERENCE_3D)
+    assert precision == 5
+    np.testing.assert_allclose(points, REFERENCE_POINTS)
+
+
+@pytest.mark.parametrize('precision', [5, 6, 7])
+def test_round_trip(precision):
+    points = wiggly_route(300)
+    decoded, decoded_precision = decode_flexible_polyline(
+        encode_flexible_polyline(points, precision)
+    )
+    assert decoded_precision == precision
+    np.testing.assert_allclose(decoded, points, atol=0.5 * 10.0**-precision + 1e-12)
+
+
+def test_round_trip_of_large_deltas():
+    points = np.array([[-179.99999, -89.99999], [179.99999, 89.99999], [0.0, 0.0]])
+    decoded, _ = decode_flexible_polyline(encode_flexible_polyline(points))
+    np.testing.assert_allclose(decoded, points)
+
+
+@pytest.mark.parametrize(
+    'encoded, message',
+    [
+        ('BFoz5xJ67i1B1B7PzIhaxL7', 'Truncated'),
+        ('BFoz5x!J', 'Invalid'),
+        ('CFoz5xJ67i1B', 'version'),
+    ],
+)
+def test_invalid_polylines_are_rejected(encoded, message):
+    with pytest.raises(ValueError, match=message):
+        decode_flexible_polyline(encoded)
+
+
+def test_collinear_points_simplify_to_the_endpoints():
+    points = np.column_stack([np.linspace(-46.7, -46.6, 50), np.linspace(-23.6, -23.5, 50)])
+    assert simplify(points, 1.0).tolist() == [0, 49]
+
+
+def test_a_corner_beyond_the_tolerance_is_kept():
+    corner = 100 / METERS_PER_DEGREE
+    points = np.array(
+        [[-46.6, -23.5], [-46.6 + corner, -23.5 + corner], [-46.6 + 2 * corner, -23.5]]
+    )
+    assert simplify(points, 10.0).tolist() == [0, 1, 2]
+    assert simplify(points, 500.0).tolist() == [0, 2]
+
+
+def test_coarser_tolerances_keep_subsets():
+    points = wiggly_route()
+    values = significance(points, 1.0)
+    assert np.isinf(values[[0, -1]]).all()
+    previous = set(simplify(points, 1.0).tolist())
+    for tolerance in (5.0, 20.0, 100.0):
+        kept = set(np.flatnonzero(values > tolerance).tolist())
+        assert kept <= previous
+        assert kept == set(simplify(points, tolerance).tolist())
+        previous = kept
+
+
+@pytest.mark.parametrize('max_bytes', [200, 500, 1000, 4000])
+def test_fit_to_budget_stays_under_the_size_limit(max_bytes):
+    points = wiggly_route()
+    kept, encoded, tolerance = fit_to_budget(points, 10.0, max_bytes=max_bytes)
+    assert len(encoded) <= max_bytes
+    assert tolerance >= 10.0
+    np.testing.assert_allclose(kept[[0, -1]], points[[0, -1]])
+    np.testing.assert_allclose(decode_flexible_polyline(encoded)[0], kept, atol=1e-5)
+
+
+def test_fit_to_budget_uses_the_smallest_tolerance_that_fits():
+    points = wiggly_route()
+    _, encoded, tolerance = fit_to_budget(points, 10.0, max_bytes=1000)
+    # The next finer tolerance that drops fewer points would not fit
+    finer = significance(points, 10.0)
+    finer = np.unique(finer[np.isfinite(finer) & (finer > 10.0) & (finer < tolerance)])
+    if len(finer):
+        looser = points[significance(points, 10.0) > finer[-1]]
+        assert len(encode_flexible_polyline(looser)) > 1000
+
+
+def test_fit_to_budget_limits_points():
+    kept, _, _ = fit_to_budget(wiggly_route(), 1.0, max_bytes=np.inf, max_points=25)
+    assert 2 <= len(kept) <= 25
+
+
+def test_fit_to_budget_keeps_a_route_that_already_fits():
+    points = wiggly_route(20)
+    kept, encoded, tolerance = fit_to_budget(points, 0.0, max_bytes=10000)
+    assert tolerance == 0.0
+    assert len(kept) == len(points)
+    assert encoded == encode_flexible_polyline(points)
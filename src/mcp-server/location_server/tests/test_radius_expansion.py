@@ -0,0 +1,124 @@
+import asyncio
+import numpy as np
+import pytest
+import server_location
+import time
+from client_registry import registry
+from geo_executor import executor
+from great_circle import haversine_meters
+from place_index import PlaceIndex
+
+
+# Radii tried from 500 m: 500, 1000, 2000, 4000 and 8000
+RADII = [500, 1000, 2000, 4000, 8000]
+
+# In the Atlantic, far from every place of the fake dataset
+OCEAN = [-30.0, -20.0]
+
+API = 'geo-places.search_nearby'
+
+
+@pytest.fixture(autouse=True)
+def api_only(monkeypatch):
+    """Keep the place index empty so every search goes to the (fake) API.
+
+    Rate limiters start over too: a drained bucket would let queued radii
+    take their token, and then the concurrency slot, in any order.
+    """
+    monkeypatch.setattr(server_location, 'place_index', PlaceIndex(1000))
+    monkeypatch.setattr(executor, '_limiters', {})
+    backend = server_location.fake_geo_backend
+    monkeypatch.setattr(backend, 'latency_ms', 0.0)
+    return backend
+
+
+def position_with_nearest_place_between(low, high):
+    """A position east of Manaus whose nearest fake place is low..high meters away."""
+    backend = server_location.fake_geo_backend
+    lon, lat = -60.0217, -3.1190
+    for step in range(400):
+        position = [lon + step * 250 / (111320 * np.cos(np.radians(lat))), lat]
+        if low < haversine_meters(position, backend.positions).min() < high:
+            return position
+    raise AssertionError('no such position in the fake dataset')
+
+
+def search(ctx, position, strategy, monkeypatch):
+    monkeypatch.setattr(server_location, 'RADIUS_EXPANSION_STRATEGY', strategy)
+    backend = server_location.fake_geo_backend
+
+    async def scenario():
+        before = backend.calls.get('search_nearby', 0)
+        result = await server_location.search_nearby(ctx, position[0], position[1], 5, None, 500)
+        # Let calls that were cancelled after they went out reach the backend
+        await asyncio.sleep(0.2)
+        return result, backend.calls.get('search_nearby', 0) - before
+
+    return asyncio.run(scenario())
+
+
+def test_expansion_radii():
+    assert server_location.expansion_radii(500, 10000, 2.0) == RADII
+    assert server_location.expansion_radii(20000, 10000, 2.0) == []
+
+
+def test_early_hit_makes_one_call(ctx, monkeypatch):
+    place = server_location.fake_geo_backend.places[0]['Position']
+    result, sent = search(ctx, place, 'serial', monkeypatch)
+    assert result['radius_used'] == 500
+    assert result['places']
+    assert result['expansion']['api_calls'] == sent == 1
+    assert result['expansion']['round_trips'] == 1
+
+
+@pytest.mark.parametrize('strategy, round_trips', [('serial', 5), ('two_wave', 2), ('parallel', 1)])
+def test_full_expansion_calls_every_radius(ctx, monkeypatch, strategy, round_trips):
+    result, sent = search(ctx, OCEAN, strategy, monkeypatch)
+    assert result['places'] == []
+    assert result['radius_used'] == 8000
+    assert result['expansion']['api_calls'] == sent == len(RADII)
+    assert result['expansion']['cancelled'] == 0
+    assert result['expansion']['round_trips'] == round_trips
+    assert result['expansion']['round_trips_saved'] == len(RADII) - round_trips
+
+
+def test_hit_inside_the_first_wave(ctx, monkeypatch):
+    position = position_with_nearest_place_between(1100, 1900)
+    result, sent = search(ctx, position, 'two_wave', monkeypatch)
+    assert result['radius_used'] == 2000
+    assert result['expansion']['api_calls'] == sent == 3
+    assert result['expansion']['round_trips'] == 1
+    assert result['expansion']['round_trips_saved'] == 2
+
+
+def test_speculative_calls_already_sent_are_counted(ctx, monkeypatch, api_only):
+    # Larger radii answer later, so every one is still in flight when the smallest answers
+    client = registry.get('geo-places')
+    search_nearby = client.search_nearby
+
+    def slow_search_nearby(**params):
+        response = search_nearby(**params)
+        time.sleep(params['QueryRadius'] / 10000)
+        return response
+
+    monkeypatch.setattr(client, 'search_nearby', slow_search_nearby)
+    place = api_only.places[0]['Position']
+    result, sent = search(ctx, place, 'parallel', monkeypatch)
+    assert result['radius_used'] == 500
+    assert result['expansion']['api_calls'] == sent == len(RADII)
+    assert result['expansion']['cancelled'] == 0
+
+
+def test_speculative_calls_cancelled_before_they_start_are_not_counted(
+    ctx, monkeypatch, api_only
+):
+    # One call at a time: the larger radii are still queued when the smallest answers. The
+    # slot it frees may let the next radius go out before the expansion cancels it.
+    api_only.latency_ms = 50.0
+    monkeypatch.setitem(executor.api_limits, API, 1)
+    place = api_only.places[0]['Position']
+    result, sent = search(ctx, place, 'parallel', monkeypatch)
+    assert result['radius_used'] == 500
+    assert result['expansion']['api_calls'] == sent
+    assert sent in (1, 2)
+    assert result['expansion']['api_calls'] + result['expansion']['cancelled'] == len(RADII)
@@ -0,0 +1,104 @@
+import asyncio
+import pytest
+import rate_limiter
+from rate_limiter import BULK, INTERACTIVE, AdaptiveRateLimiter
+
+
+class Clock:
+    """Replacement for time.monotonic that only moves when told to."""
+
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', clock)
+    return clock
+
+
+def test_throttling_halves_the_rate_once_per_second(clock):
+    limiter = AdaptiveRateLimiter(rate=20.0, max_rate=40.0, min_rate=2.0)
+    limiter.on_throttle()
+    assert limiter.rate == 10.0
+    # A burst of throttled calls is a single congestion signal
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.rate == 10.0
+    assert limiter.throttles == 3
+    assert limiter.tokens <= 0
+    clock.now += 1.0
+    limiter.on_throttle()
+    assert limiter.rate == 5.0
+    for _ in range(5):
+        clock.now += 1.0
+        limiter.on_throttle()
+    assert limiter.rate == 2.0
+
+
+def test_success_raises_the_rate_additively(clock):
+    limiter = AdaptiveRateLimiter(rate=10.0, max_rate=12.0)
+    limiter.on_success()
+    assert limiter.rate == pytest.approx(10.1)
+    # About one request per second more for every second of successful calls
+    for _ in range(9):
+        limiter.on_success()
+    assert limiter.rate == pytest.approx(11.0, abs=0.1)
+    for _ in range(1000):
+        limiter.on_success()
+    assert limiter.rate == 12.0
+
+
+def test_rate_recovers_after_throttling(clock):
+    limiter = AdaptiveRateLimiter(rate=8.0, max_rate=8.0)
+    limiter.on_throttle()
+    assert limiter.rate == 4.0
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.rate == 8.0
+    assert limiter.stats()['throttles'] == 1
+
+
+def test_cold_burst_within_capacity_is_not_delayed(clock):
+    limiter = AdaptiveRateLimiter(rate=20.0, max_rate=100.0)
+    # A full second of tokens is available before any refill
+    assert [limiter._take(INTERACTIVE) for _ in range(20)] == [0.0] * 20
+    assert limiter._take(INTERACTIVE) == pytest.approx(0.05)
+
+
+def test_bucket_refills_at_the_rate(clock):
+    limiter = AdaptiveRateLimiter(rate=10.0, max_rate=10.0)
+    while limiter._take(INTERACTIVE) == 0.0:
+        pass
+    assert limiter._take(INTERACTIVE) == pytest.approx(0.1)
+    clock.now += 0.11
+    assert limiter._take(INTERACTIVE) == 0.0
+    # At most one second of tokens accumulates
+    clock.now += 60
+    assert sum(limiter._take(INTERACTIVE) == 0.0 for _ in range(20)) == 10
+
+
+def test_bulk_calls_yield_to_waiting_interactive_calls(clock):
+    limiter = AdaptiveRateLimiter(rate=10.0, max_rate=10.0)
+    limiter.waiting[INTERACTIVE] = 1
+    assert limiter._take(BULK) > 0
+    assert limiter._take(INTERACTIVE) == 0.0
+    limiter.waiting[INTERACTIVE] = 0
+    clock.now += 0.11
+    assert limiter._take(BULK) == 0.0
+
+
+def test_acquire_admits_a_burst_then_waits_for_a_token():
+    limiter = AdaptiveRateLimiter(rate=50.0, max_rate=50.0)
+
+    async def burst(count):
+        return await asyncio.gather(*(limiter.acquire() for _ in range(count)))
+
+    assert asyncio.run(burst(50)) == [0.0] * 50
+    waited = asyncio.run(burst(3))
+    assert all(0 < seconds < 0.2 for seconds in waited)
+    assert limiter.waiting == {INTERACTIVE: 0, BULK: 0}
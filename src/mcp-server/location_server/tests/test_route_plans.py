@@ -0,0 +1,95 @@
+import numpy as np
+from datetime import datetime, timezone
+from route_plans import RoutePlan, RoutePlanStore
+
+
+DEPARTURE = datetime(2026, 10, 19, 8, 0, tzinfo=timezone.utc)
+
+
+def leg(seconds):
+    return {'distance_meters': seconds * 10, 'duration_seconds': seconds, 'from_cache': False}
+
+
+def line_plan(latest=(np.inf, np.inf, np.inf), vehicle_id='V1'):
+    """Stops at x = 1, 2, 3 east of the start, 100 s apart, without service times."""
+    stops = [
+        {'id': f'E{x}', 'position': [float(x), 0.0], 'service_seconds': 0.0, 'latest': limit}
+        for x, limit in zip((1, 2, 3), latest)
+    ]
+    return RoutePlan(vehicle_id, [0.0, 0.0], stops, [leg(100), leg(100), leg(100)], DEPARTURE)
+
+
+def travel_to(x):
+    """to_stop and from_stop of a new stop at x on the line of line_plan."""
+    points = np.array([0.0, 1.0, 2.0, 3.0])
+    to_stop = 100 * np.abs(points - x)
+    from_stop = np.append(100 * np.abs(points[1:] - x), 0.0)
+    return to_stop, from_stop
+
+
+def test_etas_add_legs_and_previous_service():
+    plan = line_plan()
+    plan.stops[0]['service_seconds'] = 30.0
+    assert plan.etas().tolist() == [100.0, 230.0, 330.0]
+
+
+def test_best_insertion_picks_the_smallest_detour():
+    index, delays, arrival = line_plan().best_insertion(*travel_to(1.5), service_seconds=10.0)
+    assert index == 1
+    assert delays.tolist() == [110.0, 10.0, 110.0, 0.0]
+    assert arrival.tolist() == [150.0, 150.0, 250.0, 450.0]
+
+
+def test_a_deadline_blocks_insertions_before_its_stop_only():
+    # Stop E2 has 5 s to spare; inserting after it delays nothing it cares about
+    plan = line_plan(latest=(np.inf, 205.0, np.inf))
+    index, _, _ = plan.best_insertion(*travel_to(1.5), service_seconds=10.0)
+    assert index == 2
+
+
+def test_a_deadline_on_the_last_stop_leaves_only_appending():
+    plan = line_plan(latest=(np.inf, np.inf, 300.0))
+    index, _, _ = plan.best_insertion(*travel_to(1.5), service_seconds=10.0)
+    assert index == 3
+
+
+def test_max_delay_limits_every_later_stop():
+    plan = line_plan()
+    index, _, _ = plan.best_insertion(*travel_to(1.5), 10.0, max_delay_seconds=5.0)
+    assert index == 3
+    index, _, _ = plan.best_insertion(*travel_to(1.5), 10.0, max_delay_seconds=10.0)
+    assert index == 1
+
+
+def test_new_stop_deadline_can_make_every_index_infeasible():
+    plan = line_plan()
+    index, _, arrival = plan.best_insertion(*travel_to(1.5), service_seconds=10.0, latest=100.0)
+    assert index is None
+    assert (arrival > 100.0).all()
+    index, _, _ = plan.best_insertion(*travel_to(1.5), service_seconds=10.0, latest=150.0)
+    assert index == 1
+
+
+def test_insert_splits_the_leg_and_shifts_later_etas():
+    plan = line_plan()
+    stop = {'id': 'N', 'position': [1.5, 0.0], 'service_seconds': 10.0, 'latest': np.inf}
+    plan.insert(1, stop, leg(50), leg(50))
+    assert [s['id'] for s in plan.stops] == ['E1', 'N', 'E2', 'E3']
+    assert plan.etas().tolist() == [100.0, 150.0, 210.0, 310.0]
+    summary = plan.to_dict()
+    assert summary['duration_seconds'] == 310
+    assert summary['distance_meters'] == 3000
+    assert summary['stops'][1]['eta'] == '2026-10-19T08:02:30+00:00'
+    plan.insert(4, dict(stop, id='L'), leg(20), None)
+    assert len(plan.legs) == len(plan.stops) == 5
+
+
+def test_store_evicts_the_least_recently_used_plan():
+    store = RoutePlanStore(max_plans=2)
+    store.put(line_plan(vehicle_id='A'))
+    store.put(line_plan(vehicle_id='B'))
+    assert store.get('A') is not None
+    store.put(line_plan(vehicle_id='C'))
+    assert store.get('B') is None
+    assert store.get('A') is not None and store.get('C') is not None
+    assert store.stats()['plans'] == 2
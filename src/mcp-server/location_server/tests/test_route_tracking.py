@@ -0,0 +1,173 @@
+import asyncio
+import json
+import numpy as np
+import pytest
+import server_location
+from geometry import METERS_PER_DEGREE
+from route_tracking import TrackedRoute
+
+
+START = np.array([-46.6333, -23.5505])
+EAST = METERS_PER_DEGREE * np.cos(np.radians(START[1]))
+
+
+def east_of_start(meters, north=0.0):
+    """Position `meters` east and `north` meters north of START."""
+    return (START + [meters / EAST, north / METERS_PER_DEGREE]).tolist()
+
+
+def straight_route(length=1000.0, steps=(), distance_meters=None, duration_seconds=400):
+    """A route heading east from START with a point every 100 m."""
+    points = np.array([east_of_start(x) for x in np.arange(0, length + 1, 100)])
+    return TrackedRoute(
+        'V1',
+        points[-1].tolist(),
+        points,
+        list(steps),
+        distance_meters or length,
+        duration_seconds,
+    )
+
+
+def test_snap_projects_onto_the_closest_segment():
+    route = straight_route()
+    offset, distance = route.snap(east_of_start(250, north=30), backtrack_meters=100)
+    assert offset == pytest.approx(250, abs=0.5)
+    assert distance == pytest.approx(30, abs=0.5)
+    # Beyond the ends the position snaps to the end points
+    offset, distance = route.snap(east_of_start(1100), backtrack_meters=100)
+    assert offset == pytest.approx(1000, abs=0.5)
+    assert distance == pytest.approx(100, abs=0.5)
+
+
+def test_backtrack_window_keeps_the_second_pass_of_a_revisited_street():
+    # East for 1 km, then back west along the same street
+    out = [east_of_start(x) for x in np.arange(0, 1001, 100)]
+    back = [east_of_start(x) for x in np.arange(900, -1, -100)]
+    points = np.array(out + back)
+    route = TrackedRoute('V1', back[-1], points, [], 2000, 800)
+    position = east_of_start(300)
+    # Without progress the first pass wins
+    offset, _ = route.snap(position, backtrack_meters=100)
+    assert offset == pytest.approx(300, abs=0.5)
+    # Once past the turn, the same street is the way back
+    route.advance(1200)
+    offset, distance = route.snap(position, backtrack_meters=100)
+    assert offset == pytest.approx(1700, abs=0.5)
+    assert distance == pytest.approx(0, abs=0.5)
+    # A window that reaches back to the first pass lets it win again
+    offset, _ = route.snap(position, backtrack_meters=1000)
+    assert offset == pytest.approx(300, abs=0.5)
+
+
+def test_step_ends_are_scaled_to_the_polyline_length():
+    # Step distances add up to 2 km over a 1 km polyline; each step covers half of it
+    steps = [
+        {'distance_meters': 1000, 'duration_seconds': 100, 'road_name': 'Rua A'},
+        {'distance_meters': 1000, 'duration_seconds': 300, 'road_name': 'Rua B'},
+    ]
+    route = straight_route(steps=steps, distance_meters=2000, duration_seconds=None)
+    assert route.duration_seconds == 400
+    remaining = route.remaining(250)
+    assert remaining['remaining_seconds'] == 350
+    assert remaining['remaining_meters'] == 1500
+    assert (remaining['current_step'], remaining['road_name']) == (0, 'Rua A')
+    remaining = route.remaining(750)
+    assert remaining['remaining_seconds'] == 150
+    assert remaining['progress'] == 0.75
+    assert (remaining['current_step'], remaining['road_name']) == (1, 'Rua B')
+    assert route.remaining(1000)['remaining_seconds'] == 0
+    # Offsets outside the route are clamped
+    assert route.remaining(-50)['remaining_seconds'] == 400
+
+
+def test_time_is_spread_evenly_without_usable_steps():
+    route = straight_route(steps=[{'distance_meters': 0, 'duration_seconds': 0}])
+    remaining = route.remaining(250)
+    assert remaining['remaining_seconds'] == 300
+    assert remaining['current_step'] is None
+    assert remaining['road_name'] is None
+
+
+def test_zero_length_route():
+    # A vehicle already at its destination: one point, or the same point twice
+    for points in ([START], [START, START]):
+        route = TrackedRoute('V1', START.tolist(), np.array(points), [], 0, 0)
+        offset, distance = route.snap(east_of_start(50), backtrack_meters=100)
+        assert offset == 0.0
+        assert distance == pytest.approx(50, abs=0.5)
+        remaining = route.remaining(offset)
+        assert remaining['remaining_meters'] == 0
+        assert remaining['remaining_seconds'] == 0
+        assert remaining['progress'] == 1.0
+
+
+def test_progress_never_moves_backwards():
+    route = straight_route()
+    route.advance(600)
+    route.advance(200)
+    assert route.progress == 600
+    assert route.updates == 2
+
+
+def eta_update(ctx, vehicle, travel_mode='Car', off_route_meters=150.0):
+    return asyncio.run(
+        server_location.eta_update(ctx, json.dumps(vehicle), travel_mode, off_route_meters)
+    )
+
+
+def vehicle(position, destination, vehicle_id='V-ETA', status='Em Rota'):
+    return {
+        'veiculo_id': vehicle_id,
+        'status': status,
+        'localizacao_atual': {'longitude': position[0], 'latitude': position[1]},
+        'destino_atual': {'longitude': destination[0], 'latitude': destination[1]},
+    }
+
+
+def route_calls():
+    return server_location.fake_geo_backend.calls.get('calculate_routes', 0)
+
+
+def point_on(route, fraction):
+    """A position on a tracked route, `fraction` of the way along its segments."""
+    k = int(fraction * len(route.starts))
+    return (route.origin + route.starts[k] / route.scale).tolist()
+
+
+def test_eta_update_reuses_the_tracked_route(ctx):
+    destination = east_of_start(4000, north=1500)
+    first = eta_update(ctx, vehicle(START.tolist(), destination))
+    assert first['rerouted'] and first['reason'] == 'new_route'
+    assert first['progress'] == 0.0
+    route = server_location.tracked_routes.get('V-ETA')
+    calls = route_calls()
+    second = eta_update(ctx, vehicle(point_on(route, 0.5), destination))
+    assert not second['rerouted'] and second['reason'] is None
+    assert second['from_cache']
+    assert route_calls() == calls
+    assert 0.4 < second['progress'] < 0.6
+    assert second['remaining_seconds'] < first['remaining_seconds']
+    assert second['off_route_meters'] == 0
+
+
+def test_eta_update_reroutes_off_route_and_on_a_new_destination(ctx):
+    destination = east_of_start(4000, north=1500)
+    eta_update(ctx, vehicle(START.tolist(), destination, vehicle_id='V-OFF'))
+    route = server_location.tracked_routes.get('V-OFF')
+    detour = (np.array(point_on(route, 0.5)) + [0, 1000 / METERS_PER_DEGREE]).tolist()
+    result = eta_update(ctx, vehicle(detour, destination, vehicle_id='V-OFF'))
+    assert result['rerouted'] and result['reason'] == 'off_route'
+    # The new route starts at the detour, so the vehicle is back on it
+    assert result['off_route_meters'] == 0
+    result = eta_update(ctx, vehicle(detour, east_of_start(-3000), vehicle_id='V-OFF'))
+    assert result['reason'] == 'destination_changed'
+    result = eta_update(ctx, vehicle(detour, east_of_start(-3000), vehicle_id='V-OFF'), 'Truck')
+    assert result['reason'] == 'new_route'
+
+
+def test_eta_update_rejects_vehicles_not_en_route(ctx):
+    trip = vehicle(START.tolist(), east_of_start(1000), status='Disponível')
+    result = eta_update(ctx, trip)
+    assert 'not Em Rota' in result['error']
+    assert ctx.errors == [result['error']]
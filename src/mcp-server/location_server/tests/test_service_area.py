@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+import service_area
+from geometry import METERS_PER_DEGREE
+from polyline import encode_flexible_polyline
+from service_area import ServiceArea, isoline_rings, sample_disc, star_polygon
+
+
+OUTER = np.array([[0.0, 0.0], [4.0, 0.0], [4.0, 4.0], [0.0, 4.0]])
+HOLE = np.array([[1.0, 1.0], [3.0, 1.0], [3.0, 3.0], [1.0, 3.0]])
+CENTER = [-46.63, -23.55]
+
+
+def distance_m(points, center):
+    scale = METERS_PER_DEGREE * np.array([np.cos(np.radians(center[1])), 1.0])
+    offsets = (np.asarray(points) - center) * scale
+    return np.hypot(offsets[:, 0], offsets[:, 1])
+
+
+def test_contains_square():
+    area = ServiceArea([OUTER])
+    points = [[2.0, 2.0], [0.5, 3.5], [5.0, 2.0], [2.0, -0.1], [-1.0, -1.0]]
+    assert area.contains(points).tolist() == [True, True, False, False, False]
+
+
+def test_holes_follow_the_even_odd_rule():
+    area = ServiceArea([OUTER, HOLE])
+    points = [[2.0, 2.0], [0.5, 2.0], [3.5, 3.5], [2.0, 0.5], [5.0, 2.0]]
+    assert area.contains(points).tolist() == [False, True, True, True, False]
+    # A closed ring (first point repeated) gives the same answer
+    closed = ServiceArea([np.vstack([OUTER, OUTER[:1]]), np.vstack([HOLE, HOLE[:1]])])
+    assert closed.contains(points).tolist() == [False, True, True, True, False]
+
+
+def test_concave_ring():
+    # A U shape open to the north
+    ring = [[0, 0], [3, 0], [3, 3], [2, 3], [2, 1], [1, 1], [1, 3], [0, 3]]
+    area = ServiceArea([ring])
+    points = [[0.5, 2.5], [1.5, 2.5], [2.5, 2.5], [1.5, 0.5]]
+    assert area.contains(points).tolist() == [True, False, True, True]
+
+
+def test_points_outside_the_bounding_box_are_rejected():
+    area = ServiceArea([OUTER])
+    assert area.bbox == (0.0, 0.0, 4.0, 4.0)
+    assert not area.contains([[10.0, 10.0], [-3.0, 2.0]]).any()
+    empty = ServiceArea([[[0.0, 0.0], [1.0, 1.0]]])
+    assert empty.rings == []
+    assert not empty.contains([[0.5, 0.5]]).any()
+
+
+def test_blocks_give_the_same_answer(monkeypatch):
+    rng = np.random.default_rng(7)
+    points = rng.uniform(-1, 5, (500, 2))
+    area = ServiceArea([OUTER, HOLE])
+    expected = area.contains(points)
+    monkeypatch.setattr(service_area, 'POINT_IN_POLYGON_BLOCK_CELLS', 16)
+    assert area.contains(points).tolist() == expected.tolist()
+    assert expected.sum() == (
+        (np.abs(points - 2) < 2).all(axis=1) & ~(np.abs(points - 2) < 1).all(axis=1)
+    ).sum()
+
+
+def test_polylines_round_trip():
+    area = ServiceArea([OUTER, HOLE])
+    restored = ServiceArea.from_polylines(area.to_polylines())
+    assert restored.vertices == 8
+    assert restored.contains([[2.0, 2.0], [0.5, 0.5]]).tolist() == [False, True]
+
+
+def test_sample_disc_is_bearing_major():
+    radii, points = sample_disc(CENTER, 1000.0, bearings=4, rings=2)
+    assert radii.tolist() == [500.0, 1000.0]
+    assert points.shape == (8, 2)
+    assert distance_m(points, CENTER) == pytest.approx([500, 1000] * 4, rel=1e-6)
+    # Bearing 0 points north, bearing 1 east
+    assert points[1, 1] > CENTER[1] and points[1, 0] == pytest.approx(CENTER[0])
+    assert points[3, 0] > CENTER[0] and points[3, 1] == pytest.approx(CENTER[1])
+
+
+def test_star_polygon_interpolates_travel_times():
+    radii = np.array([1000.0, 2000.0, 3000.0, 4000.0])
+    # Ten meters per second in every direction
+    durations = np.tile(radii / 10, (8, 1))
+    ring = star_polygon(CENTER, radii, durations, threshold_seconds=250)
+    assert distance_m(ring, CENTER) == pytest.approx(2500, rel=1e-6)
+    ring = star_polygon(CENTER, radii, durations, threshold_seconds=50)
+    assert distance_m(ring, CENTER) == pytest.approx(500, rel=1e-6)
+
+
+def test_star_polygon_handles_unreached_and_fully_reached_bearings():
+    radii = np.array([1000.0, 2000.0])
+    durations = np.array(
+        [
+            [100.0, 200.0],  # everything reached: the outermost sample
+            [-1.0, -1.0],  # no route: a sliver around the base
+            [100.0, -1.0],  # outer sample unroutable: the last reached sample
+            [500.0, 600.0],  # nothing in time: interpolated from the base
+        ]
+    )
+    ring = star_polygon(CENTER, radii, durations, threshold_seconds=300)
+    assert distance_m(ring, CENTER) == pytest.approx([2000, 50, 1000, 600], rel=1e-6)
+    area = ServiceArea([ring])
+    assert area.contains([CENTER]).tolist() == [True]
+
+
+def test_isoline_rings_reads_encoded_and_plain_polygons():
+    response = {
+        'Isolines': [
+            {
+                'Geometries': [
+                    {'PolylinePolygon': [encode_flexible_polyline(OUTER)]},
+                    {'Polygon': [HOLE.tolist()]},
+                ]
+            }
+        ]
+    }
+    rings = isoline_rings(response)
+    assert len(rings) == 2
+    assert np.allclose(rings[0], OUTER) and np.allclose(rings[1], HOLE)
+    assert isoline_rings({}) == []
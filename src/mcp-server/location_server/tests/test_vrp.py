@@ -0,0 +1,241 @@
+import numpy as np
+import time
+from vrp import (
+    insert_time_windows,
+    relocate_segments,
+    route_cost,
+    savings_routes,
+    schedule_path,
+    solve_time_windows,
+    solve_vrp,
+    two_opt,
+)
+
+
+# Nodes on a line: depot 0 at x=0, stops 1..3 to the east and 4..5 to the west
+LINE = np.array([0.0, 1.0, 2.0, 3.0, -1.0, -2.0])
+LINE_COST = np.abs(LINE[:, None] - LINE[None, :])
+
+# Depot 0 at the origin and three stops on the corners of the unit square
+SQUARE = np.array([[0.0, 0.0], [0.0, 1.0], [1.0, 1.0], [1.0, 0.0]])
+SQUARE_COST = np.hypot(*(SQUARE[:, None, :] - SQUARE[None, :, :]).transpose(2, 0, 1))
+
+
+# One minute of driving per unit of distance along the line
+LINE_TRAVEL = 60.0 * LINE_COST
+
+
+def unit_demands(nodes):
+    demands = np.ones((nodes, 1))
+    demands[0] = 0
+    return demands
+
+
+def test_savings_joins_stops_on_the_same_side_only():
+    routes = savings_routes(LINE_COST, 0, [1, 2, 3, 4, 5], unit_demands(6), np.array([np.inf]))
+    # Opposite sides save nothing by sharing a route
+    assert sorted(sorted(route) for route in routes) == [[1, 2, 3], [4, 5]]
+    for route in routes:
+        assert route_cost(LINE_COST, 0, route) == 2 * LINE_COST[0, route].max()
+
+
+def test_savings_respects_capacity():
+    routes = savings_routes(LINE_COST, 0, [1, 2, 3], unit_demands(6), np.array([2.0]))
+    # The largest saving (2 with 3) is merged first; adding 1 would exceed the capacity
+    assert sorted(sorted(route) for route in routes) == [[1], [2, 3]]
+
+
+def test_savings_without_stops():
+    assert savings_routes(LINE_COST, 0, [], unit_demands(6), np.array([1.0])) == []
+
+
+def test_two_opt_removes_a_crossing():
+    route, improved = two_opt(SQUARE_COST, 0, [2, 1, 3])
+    assert improved
+    assert route_cost(SQUARE_COST, 0, route) == 4.0
+    assert sorted(route) == [1, 2, 3]
+
+
+def test_two_opt_keeps_an_optimal_route():
+    route, improved = two_opt(SQUARE_COST, 0, [1, 2, 3])
+    assert not improved
+    assert route == [1, 2, 3]
+
+
+def test_two_opt_is_exact_for_asymmetric_costs():
+    cost = SQUARE_COST.copy()
+    # Driving the square clockwise is cheap, counter-clockwise expensive
+    cost[0, 3] = cost[3, 2] = cost[2, 1] = cost[1, 0] = 10.0
+    route, _ = two_opt(cost, 0, [3, 2, 1])
+    assert route == [1, 2, 3]
+    assert route_cost(cost, 0, route) == 4.0
+
+
+def test_or_opt_moves_a_stop_off_the_wrong_side():
+    # Vehicle 1 crosses the depot to reach stop 2, which lies next to vehicle 0's stop
+    routes = [[3], [5, 2]]
+    loads = np.array([[1.0], [2.0]])
+    capacities = np.array([[10.0], [10.0]])
+    demands = unit_demands(6)
+    moved = relocate_segments(
+        LINE_COST, [0, 0], routes, loads, capacities, demands, time.perf_counter() + 10
+    )
+    assert moved
+    assert sum(route_cost(LINE_COST, 0, route) for route in routes) == 10.0
+    assert sorted(stop for route in routes for stop in route) == [2, 3, 5]
+    assert loads.tolist() == [[demands[route].sum()] for route in routes]
+
+
+def test_or_opt_never_overloads_a_vehicle():
+    # Both vehicles are full, so no stop may change vehicle however much it would save
+    routes = [[3], [5, 2]]
+    loads = np.array([[1.0], [2.0]])
+    capacities = np.array([[1.0], [2.0]])
+    moved = relocate_segments(
+        LINE_COST, [0, 0], routes, loads, capacities, unit_demands(6), time.perf_counter() + 10
+    )
+    assert not moved
+    assert routes == [[3], [5, 2]]
+    assert loads.tolist() == [[1.0], [2.0]]
+
+
+def test_solve_vrp_serves_every_stop_within_capacity():
+    demands = unit_demands(6)
+    routes, unassigned = solve_vrp(
+        LINE_COST, [1, 2, 3, 4, 5], demands, [0, 0], np.array([[3.0], [3.0]])
+    )
+    assert unassigned == []
+    assert sorted(stop for route in routes for stop in route) == [1, 2, 3, 4, 5]
+    assert all(demands[route].sum() <= 3 for route in routes)
+    # One vehicle per side is optimal: 2 * 3 + 2 * 2
+    assert sum(route_cost(LINE_COST, 0, route) for route in routes) == 10.0
+
+
+def test_solve_vrp_reports_stops_no_vehicle_can_carry():
+    demands = unit_demands(6)
+    demands[3] = 5.0
+    routes, unassigned = solve_vrp(
+        LINE_COST, [1, 2, 3], demands, [0, 0], np.array([[2.0], [4.0]])
+    )
+    assert unassigned == [3]
+    assert sorted(stop for route in routes for stop in route) == [1, 2]
+
+
+def test_solve_vrp_checks_every_capacity_dimension():
+    # Stops weigh little but are bulky: the volume limit forces a second vehicle
+    demands = np.zeros((6, 2))
+    demands[1:4] = [1.0, 2.0]
+    capacities = np.array([[100.0, 4.0], [100.0, 4.0]])
+    routes, unassigned = solve_vrp(LINE_COST, [1, 2, 3], demands, [0, 0], capacities)
+    assert unassigned == []
+    assert all(demands[route].sum(axis=0)[1] <= 4 for route in routes)
+    assert sum(1 for route in routes if route) == 2
+
+
+def test_solve_vrp_starts_each_vehicle_at_its_own_depot():
+    # Two depots at the ends of a line, stops clustered near each one
+    x = np.array([0.0, 10.0, 1.0, 2.0, 8.0, 9.0])
+    cost = np.abs(x[:, None] - x[None, :])
+    demands = unit_demands(6)
+    demands[1] = 0
+    routes, unassigned = solve_vrp(cost, [2, 3, 4, 5], demands, [0, 1], np.array([[5.0], [5.0]]))
+    assert unassigned == []
+    assert sorted(routes[0]) == [2, 3]
+    assert sorted(routes[1]) == [4, 5]
+
+
+def open_windows(nodes):
+    windows = np.zeros((nodes, 2))
+    windows[:, 1] = np.inf
+    return windows
+
+
+def assert_within_windows(route, windows, service, end=None):
+    path = [0, *route] + ([end] if end is not None else [])
+    arrival, begin, _ = schedule_path(LINE_TRAVEL, path, windows, service)
+    assert (arrival <= windows[path, 1]).all()
+    assert (begin >= windows[path, 0]).all()
+
+
+def test_schedule_path_waits_and_bounds_the_shift():
+    windows = open_windows(6)
+    windows[1] = [0.0, 100.0]
+    windows[2] = [300.0, 400.0]
+    arrival, begin, max_shift = schedule_path(LINE_TRAVEL, [0, 1, 2], windows, np.zeros(6))
+    assert arrival.tolist() == [0.0, 60.0, 120.0]
+    assert begin.tolist() == [0.0, 60.0, 300.0]
+    # Stop 1 can slip 40 s; the wait at stop 2 absorbs more than that
+    assert max_shift.tolist() == [40.0, 40.0, 100.0]
+
+
+def test_schedule_path_adds_service_times():
+    service = np.full(6, 30.0)
+    arrival, begin, _ = schedule_path(LINE_TRAVEL, [0, 1, 2, 0], open_windows(6), service)
+    assert arrival.tolist() == [0.0, 90.0, 180.0, 330.0]
+    assert (begin == arrival).all()
+
+
+def test_time_windows_order_stops_by_deadline():
+    # Stop 3 must be reached by 200 s and stop 5 by 600 s: east first, then west
+    windows = open_windows(6)
+    windows[3, 1] = 200.0
+    windows[5, 1] = 600.0
+    route, unserved = solve_time_windows(LINE_TRAVEL, 0, [5, 3], windows, np.zeros(6), end=0)
+    assert unserved == []
+    assert route == [3, 5]
+    assert_within_windows(route, windows, np.zeros(6), end=0)
+
+
+def test_time_windows_leave_out_conflicting_deadlines():
+    # Stops on opposite sides that must both be reached within 3 minutes
+    windows = open_windows(6)
+    windows[3, 1] = 200.0
+    windows[5, 1] = 130.0
+    route, unserved = solve_time_windows(LINE_TRAVEL, 0, [3, 5], windows, np.zeros(6), end=0)
+    assert len(route) == 1 and len(unserved) == 1
+    assert sorted(route + unserved) == [3, 5]
+    assert_within_windows(route, windows, np.zeros(6), end=0)
+
+
+def test_time_windows_never_delay_a_stop_past_its_deadline():
+    windows = open_windows(6)
+    windows[1] = [0.0, 70.0]
+    windows[2] = [0.0, 130.0]
+    service = np.full(6, 10.0)
+    service[0] = 0.0
+    for rule in ('cheapest', 'earliest', 'deadline'):
+        route, unserved = insert_time_windows(
+            LINE_TRAVEL, 0, [1, 2, 3, 4], windows, service, end=0, rule=rule
+        )
+        assert sorted(route + unserved) == [1, 2, 3, 4]
+        assert_within_windows(route, windows, service, end=0)
+    # Only 1 then 2 meets both deadlines, with the service time at stop 1 in between
+    route, unserved = solve_time_windows(LINE_TRAVEL, 0, [1, 2, 3, 4], windows, service, end=0)
+    assert unserved == []
+    assert route.index(1) < route.index(2)
+
+
+def test_time_windows_respect_capacity():
+    demands = unit_demands(6)
+    route, unserved = solve_time_windows(
+        LINE_TRAVEL,
+        0,
+        [1, 2, 3],
+        open_windows(6),
+        np.zeros(6),
+        end=0,
+        demands=demands,
+        capacity=np.array([2.0]),
+    )
+    assert len(route) == 2
+    assert len(unserved) == 1
+
+
+def test_open_route_ends_at_its_last_stop():
+    windows = open_windows(6)
+    windows[1, 0] = 600.0
+    route, unserved = solve_time_windows(LINE_TRAVEL, 0, [1, 2], windows, np.zeros(6))
+    assert unserved == []
+    _, begin, _ = schedule_path(LINE_TRAVEL, [0, *route], windows, np.zeros(6))
+    assert begin[route.index(1) + 1] >= 600.0
+    assert_within_windows(route, windows, np.zeros(6))
@@ -0,0 +1,392 @@
+import numpy as np
+import time
+from typing import List, Optional, Sequence, Tuple
+
+
+# Improvements smaller than this are treated as noise
+EPSILON = 1e-6
+
+
+def route_path(depot: int, route: Sequence[int]) -> np.ndarray:
+    """Return the node sequence of a route that starts and ends at its depot."""
+    return np.array([depot, *route, depot], dtype=np.int64)
+
+
+def route_cost(cost: np.ndarray, depot: int, route: Sequence[int]) -> float:
+    """Return the total cost of driving a route from and back to its depot."""
+    if not len(route):
+        return 0.0
+    path = route_path(depot, route)
+    return float(cost[path[:-1], path[1:]].sum())
+
+
+def insertion_costs(cost: np.ndarray, depot: int, route: Sequence[int], first: int, last: int):
+    """Return the extra cost of inserting a segment first..last at every position of a route.
+
+    Entry k is the cost of placing the segment before route[k] (k == len(route)
+    appends it). The cost inside the segment itself is not included.
+    """
+    path = route_path(depot, route)
+    return cost[path[:-1], first] + cost[last, path[1:]] - cost[path[:-1], path[1:]]
+
+
+def savings_routes(
+    cost: np.ndarray, depot: int, stops: Sequence[int], demands: np.ndarray, capacity: np.ndarray
+) -> List[List[int]]:
+    """Build routes for one depot with the Clarke-Wright savings heuristic.
+
+    Savings are directional (the tail of one route joined to the head of
+    another), so asymmetric road durations are handled correctly.
+    """
+    stops = np.asarray(stops, dtype=np.int64)
+    n = len(stops)
+    if n == 0:
+        return []
+    savings = (
+        cost[stops, depot][:, None] + cost[depot, stops][None, :] - cost[np.ix_(stops, stops)]
+    )
+    np.fill_diagonal(savings, -np.inf)
+    candidates = np.flatnonzero(savings > 0)
+    candidates = candidates[np.argsort(savings.ravel()[candidates])[::-1]]
+    tails, heads = np.divmod(candidates, n)
+
+    route_of = list(range(n))
+    routes = {i: [i] for i in range(n)}
+    loads = {i: demands[stops[i]].astype(np.float64) for i in range(n)}
+    for a, b in zip(tails.tolist(), heads.tolist()):
+        ra, rb = route_of[a], route_of[b]
+        if ra == rb or routes[ra][-1] != a or routes[rb][0] != b:
+            continue
+        load = loads[ra] + loads[rb]
+        if np.any(load > capacity):
+            continue
+        for k in routes[rb]:
+            route_of[k] = ra
+        routes[ra].extend(routes.pop(rb))
+        loads[ra] = load
+        del loads[rb]
+    return [stops[route].tolist() for route in routes.values()]
+
+
+def two_opt(cost: np.ndarray, depot: int, route: List[int]) -> Tuple[List[int], bool]:
+    """Apply best-improvement 2-opt moves to a route until none improves it.
+
+    All segment reversals are evaluated at once with prefix sums of the
+    forward and backward edge costs, which keeps the move exact for
+    asymmetric cost matrices.
+    """
+    improved = False
+    while len(route) >= 2:
+        path = route_path(depot, route)
+        forward = np.concatenate(([0.0], np.cumsum(cost[path[:-1], path[1:]])))
+        backward = np.concatenate(([0.0], np.cumsum(cost[path[1:], path[:-1]])))
+        size = len(path) - 1
+        i = np.arange(size)[:, None]
+        j = np.arange(size)[None, :]
+        # Reverse path[i + 1..j]: edges i..j are replaced by the reversed segment
+        delta = (
+            cost[path[i], path[j]]
+            + cost[path[i + 1], path[j + 1]]
+            + backward[j]
+            - backward[i + 1]
+            - forward[j + 1]
+            + forward[i]
+        )
+        delta = np.where(j >= i + 2, delta, np.inf)
+        best = int(np.argmin(delta))
+        bi, bj = divmod(best, size)
+        if delta[bi, bj] >= -EPSILON:
+            break
+        route = route[:bi] + route[bi:bj][::-1] + route[bj:]
+        improved = True
+    return route, improved
+
+
+def relocate_segments(
+    cost: np.ndarray,
+    depots: Sequence[int],
+    routes: List[List[int]],
+    loads: np.ndarray,
+    capacities: np.ndarray,
+    demands: np.ndarray,
+    deadline: float,
+    max_segment: int = 3,
+) -> bool:
+    """Or-opt: move segments of 1..max_segment stops to their cheapest feasible position.
+
+    Targets include the same route and every other vehicle, empty ones too.
+    Routes and loads are updated in place; returns True if anything moved.
+    """
+    improved = False
+    for length in range(1, max_segment + 1):
+        for r in range(len(routes)):
+            start = 0
+            while start + length <= len(routes[r]):
+                if time.perf_counter() > deadline:
+                    return improved
+                route = routes[r]
+                segment = route[start:start + length]
+                prev = route[start - 1] if start else depots[r]
+                nxt = route[start + length] if start + length < len(route) else depots[r]
+                gain = cost[prev, segment[0]] + cost[segment[-1], nxt] - cost[prev, nxt]
+                segment_load = demands[segment].sum(axis=0)
+                best_delta, best_target, best_pos = -EPSILON, None, None
+                remainder = route[:start] + route[start + length:]
+                for t in range(len(routes)):
+                    if t == r:
+                        target = remainder
+                    else:
+                        if np.any(loads[t] + segment_load > capacities[t]):
+                            continue
+                        target = routes[t]
+                    extra = insertion_costs(cost, depots[t], target, segment[0], segment[-1])
+                    if t == r:
+                        # Re-inserting where it came from is not a move
+                        extra[start] = np.inf
+                    pos = int(np.argmin(extra))
+                    delta = extra[pos] - gain
+                    if delta < best_delta:
+                        best_delta, best_target, best_pos = delta, t, pos
+                if best_target is None:
+                    start += 1
+                    continue
+                if best_target == r:
+                    routes[r] = remainder[:best_pos] + segment + remainder[best_pos:]
+                else:
+                    routes[r] = remainder
+                    target = routes[best_target]
+                    routes[best_target] = target[:best_pos] + segment + target[best_pos:]
+                    loads[r] -= segment_load
+                    loads[best_target] += segment_load
+                improved = True
+    return improved
+
+
+def solve_vrp(
+    cost: np.ndarray,
+    stops: Sequence[int],
+    demands: np.ndarray,
+    vehicle_depots: Sequence[int],
+    capacities: np.ndarray,
+    time_budget_seconds: float = 2.0,
+) -> Tuple[List[List[int]], List[int]]:
+    """Plan capacitated routes for a heterogeneous, possibly multi-depot fleet.
+
+    Args:
+        cost: (N, N) travel cost between all nodes (depots and stops).
+        stops: node indices that must be visited.
+        demands: (N, D) demand of every node in D capacity dimensions (e.g. kg, m3).
+        vehicle_depots: depot node of each vehicle; routes start and end there.
+        capacities: (V, D) capacity of each vehicle.
+        time_budget_seconds: wall clock budget; the best plan found so far is returned.
+
+    Returns:
+        (routes, unassigned): the ordered stop nodes of each vehicle, and the stops
+        that no vehicle could take within its capacity.
+
+    Stops are attached to their closest depot, routed with Clarke-Wright savings
+    and matched to vehicles by best fit. Leftovers are placed by cheapest
+    feasible insertion, then 2-opt and or-opt improve the plan until the budget
+    runs out or no move helps.
+    """
+    deadline = time.perf_counter() + time_budget_seconds
+    cost = np.asarray(cost, dtype=np.float64)
+    demands = np.asarray(demands, dtype=np.float64).reshape(len(cost), -1)
+    capacities = np.asarray(capacities, dtype=np.float64).reshape(len(vehicle_depots), -1)
+    vehicle_depots = [int(d) for d in vehicle_depots]
+    stops = np.asarray(stops, dtype=np.int64)
+    routes: List[List[int]] = [[] for _ in vehicle_depots]
+    loads = np.zeros_like(capacities)
+    if len(stops) == 0 or not vehicle_depots:
+        return routes, stops.tolist()
+
+    depots = np.array(sorted(set(vehicle_depots)), dtype=np.int64)
+    round_trip = cost[np.ix_(depots, stops)] + cost[np.ix_(stops, depots)].T
+    closest = depots[np.argmin(round_trip, axis=0)]
+
+    leftovers: List[int] = []
+    for depot in depots.tolist():
+        vehicles = [v for v, d in enumerate(vehicle_depots) if d == depot]
+        capacity = capacities[vehicles].max(axis=0)
+        built = savings_routes(cost, depot, stops[closest == depot], demands, capacity)
+        built.sort(key=lambda route: -demands[route].sum(axis=0)[0])
+        free = list(vehicles)
+        for route in built:
+            load = demands[route].sum(axis=0)
+            fits = [v for v in free if np.all(load <= capacities[v])]
+            if not fits:
+                leftovers.extend(route)
+                continue
+            vehicle = min(fits, key=lambda v: capacities[v][0])
+            free.remove(vehicle)
+            routes[vehicle] = route
+            loads[vehicle] = load
+
+    unassigned = []
+    for stop in sorted(leftovers, key=lambda s: -demands[s][0]):
+        best = None
+        for v, depot in enumerate(vehicle_depots):
+            if np.any(loads[v] + demands[stop] > capacities[v]):
+                continue
+            extra = insertion_costs(cost, depot, routes[v], stop, stop)
+            pos = int(np.argmin(extra))
+            if best is None or extra[pos] < best[0]:
+                best = (extra[pos], v, pos)
+        if best is None:
+            unassigned.append(stop)
+            continue
+        _, v, pos = best
+        routes[v].insert(pos, stop)
+        loads[v] += demands[stop]
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for v, depot in enumerate(vehicle_depots):
+            routes[v], changed = two_opt(cost, depot, routes[v])
+            improved |= changed
+        improved |= relocate_segments(
+            cost, vehicle_depots, routes, loads, capacities, demands, deadline
+        )
+    return routes, unassigned
+
+
+def schedule_path(
+    travel: np.ndarray, path: Sequence[int], windows: np.ndarray, service: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return (arrival, begin, max_shift) of every node of a path leaving path[0] at time 0.
+
+    Service begins at max(arrival, earliest). max_shift is how far the begin
+    time of a node may be pushed back without any node from there on missing
+    its latest time: a push shrinks by the waiting time at each later node.
+    """
+    path = np.asarray(path, dtype=np.int64)
+    arrival = np.zeros(len(path))
+    begin = np.zeros(len(path))
+    for k in range(1, len(path)):
+        arrival[k] = begin[k - 1] + service[path[k - 1]] + travel[path[k - 1], path[k]]
+        begin[k] = max(arrival[k], windows[path[k], 0])
+    max_shift = windows[path, 1] - begin
+    for k in range(len(path) - 2, -1, -1):
+        max_shift[k] = min(max_shift[k], begin[k + 1] - arrival[k + 1] + max_shift[k + 1])
+    return arrival, begin, max_shift
+
+
+def insert_time_windows(
+    travel: np.ndarray,
+    start: int,
+    stops: Sequence[int],
+    windows: np.ndarray,
+    service: np.ndarray,
+    end: Optional[int] = None,
+    demands: Optional[np.ndarray] = None,
+    capacity: Optional[np.ndarray] = None,
+    rule: str = 'cheapest',
+) -> Tuple[List[int], List[int]]:
+    """Build one route by inserting stops one at a time; see solve_time_windows.
+
+    Every round evaluates all pending stops at all positions at once. An
+    insertion is feasible when the stop is reached before its latest time and
+    the delay it pushes onto the next node fits that node's max_shift. rule
+    picks the stop to insert: 'cheapest' detour, 'earliest' service start or
+    'deadline' (earliest latest time), each at its cheapest feasible position.
+    """
+    travel = np.asarray(travel, dtype=np.float64)
+    windows = np.asarray(windows, dtype=np.float64)
+    service = np.asarray(service, dtype=np.float64)
+    route: List[int] = []
+    pending = np.asarray(stops, dtype=np.int64)
+    if demands is not None:
+        demands = np.asarray(demands, dtype=np.float64).reshape(len(travel), -1)
+    load = 0.0 if demands is None else np.zeros(demands.shape[1])
+    unserved: List[int] = []
+    while len(pending):
+        path = [start, *route] + ([end] if end is not None else [])
+        path_array = np.array(path, dtype=np.int64)
+        arrival, begin, max_shift = schedule_path(travel, path, windows, service)
+        # Insertion position k puts the stop right after path[k]
+        before = path_array[:len(route) + 1]
+        departure = begin[:len(route) + 1] + service[before]
+        to_stop = departure[None, :] + travel[np.ix_(before, pending)].T
+        stop_begin = np.maximum(to_stop, windows[pending, 0, None])
+        feasible = to_stop <= windows[pending, 1, None]
+        detour = travel[np.ix_(before, pending)].T
+        # Node following each position; an open route has none after its last stop
+        successor = np.arange(1, len(before) + 1)
+        has_next = successor < len(path)
+        successor = np.minimum(successor, len(path) - 1)
+        nxt = path_array[successor]
+        next_arrival = stop_begin + service[pending, None] + travel[np.ix_(pending, nxt)]
+        push = np.maximum(next_arrival, windows[nxt, 0]) - begin[successor]
+        next_shift = np.where(has_next, max_shift[successor], np.inf)
+        feasible &= ~has_next | (push <= next_shift + EPSILON)
+        detour += np.where(has_next, travel[np.ix_(pending, nxt)] - travel[before, nxt], 0.0)
+        if demands is not None:
+            fits = np.all(load + demands[pending] <= capacity + EPSILON, axis=1)
+            feasible &= fits[:, None]
+        cost = np.where(feasible, detour, np.inf)
+        position = np.argmin(cost, axis=1)
+        rows = np.arange(len(pending))
+        insertable = np.isfinite(cost[rows, position])
+        unserved.extend(pending[~insertable].tolist())
+        if not insertable.any():
+            break
+        candidates = np.flatnonzero(insertable)
+        best_cost = cost[candidates, position[candidates]]
+        if rule == 'earliest':
+            key = stop_begin[candidates, position[candidates]]
+        elif rule == 'deadline':
+            key = windows[pending[candidates], 1]
+        else:
+            key = best_cost
+        pick = candidates[np.lexsort((best_cost, key))[0]]
+        route.insert(int(position[pick]), int(pending[pick]))
+        if demands is not None:
+            load = load + demands[pending[pick]]
+        pending = np.delete(pending, np.flatnonzero(~insertable).tolist() + [pick])
+    return route, unserved
+
+
+# Stop selection rules tried by solve_time_windows; none dominates the others
+TIME_WINDOW_RULES = ('cheapest', 'earliest', 'deadline')
+
+
+def solve_time_windows(
+    travel: np.ndarray,
+    start: int,
+    stops: Sequence[int],
+    windows: np.ndarray,
+    service: np.ndarray,
+    end: Optional[int] = None,
+    demands: Optional[np.ndarray] = None,
+    capacity: Optional[np.ndarray] = None,
+) -> Tuple[List[int], List[int]]:
+    """Build one vehicle route that serves as many stops as possible within their time windows.
+
+    Args:
+        travel: (N, N) travel times in seconds between all nodes.
+        start: node the vehicle leaves at time 0.
+        stops: node indices to visit.
+        windows: (N, 2) earliest and latest service start of every node, in seconds
+            after departure (use 0 and inf for no limit).
+        service: (N,) time spent at every node, in seconds.
+        end: node the route must finish at, or None for an open route.
+        demands, capacity: optional (N, D) demands and (D,) vehicle capacity.
+
+    Returns:
+        (route, unserved): the ordered stop nodes, and the stops that could not be
+        inserted anywhere without breaking a time window or the capacity.
+
+    Solomon-style insertion runs once per rule in TIME_WINDOW_RULES; the route
+    serving the most stops wins, then the one finishing first.
+    """
+    best = None
+    for rule in TIME_WINDOW_RULES:
+        route, unserved = insert_time_windows(
+            travel, start, stops, windows, service, end, demands, capacity, rule
+        )
+        path = [start, *route] + ([end] if end is not None else [])
+        finish = schedule_path(travel, path, np.asarray(windows, dtype=np.float64), service)[1][-1]
+        if best is None or (len(route), -finish) > (len(best[0]), -best[2]):
+            best = (route, unserved, finish)
+    return best[0], best[1]
@@ -0,0 +1,79 @@
+import numpy as np
+from great_circle import haversine_matrix, haversine_meters
+from typing import List, Tuple
+
+
+def sweep_clusters(center, points, max_size: int) -> List[np.ndarray]:
+    """Split (n, 2) [lon, lat] points into angular sectors around center of at most max_size.
+
+    The sweep starts at the widest angular gap between points so no dense area
+    is cut in two, and sectors are balanced in size. Sectors are returned in
+    sweep order, each as an array of point indices.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(points) == 0:
+        return []
+    center = np.asarray(center, dtype=np.float64)
+    # Equirectangular offsets are enough to sort by bearing
+    dx = (points[:, 0] - center[0]) * np.cos(np.radians(center[1]))
+    dy = points[:, 1] - center[1]
+    order = np.argsort(np.arctan2(dy, dx), kind='stable')
+    angles = np.arctan2(dy, dx)[order]
+    gaps = np.diff(np.concatenate((angles, [angles[0] + 2 * np.pi])))
+    order = np.roll(order, -((int(np.argmax(gaps)) + 1) % len(order)))
+    count = -(-len(points) // max_size)
+    return np.array_split(order, count)
+
+
+def order_clusters(origin, destination, centroids) -> List[int]:
+    """Return the cluster visiting order from origin to destination.
+
+    Clusters keep their cyclic sweep order; every starting cluster and both
+    directions are compared by great-circle length through the centroids.
+    """
+    count = len(centroids)
+    if count <= 1:
+        return list(range(count))
+    hops = haversine_matrix(centroids, centroids)
+    from_origin = haversine_meters(origin, centroids)
+    to_destination = haversine_meters(destination, centroids)
+    best, best_length = None, np.inf
+    for direction in (1, -1):
+        for start in range(count):
+            candidate = [(start + direction * k) % count for k in range(count)]
+            length = (
+                from_origin[candidate[0]]
+                + hops[candidate[:-1], candidate[1:]].sum()
+                + to_destination[candidate[-1]]
+            )
+            if length < best_length:
+                best, best_length = candidate, length
+    return best
+
+
+def cluster_junctions(origin, destination, points, clusters) -> List[Tuple[int, int]]:
+    """Pick the (entry, exit) point index of each cluster, in visiting order.
+
+    Each exit is the point closest to the next cluster's centroid and each
+    entry the point closest to the previous exit. -1 stands for the origin
+    (first entry) and the destination (last exit). Clusters with more than one
+    point never enter and exit through the same point.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    centroids = [points[c].mean(axis=0) for c in clusters]
+    junctions = []
+    previous = np.asarray(origin, dtype=np.float64)
+    for k, members in enumerate(clusters):
+        if k == 0:
+            entry = -1
+        else:
+            entry = int(members[np.argmin(haversine_meters(previous, points[members]))])
+        if k == len(clusters) - 1:
+            exit_ = -1
+        else:
+            candidates = members[members != entry] if len(members) > 1 else members
+            distances = haversine_meters(centroids[k + 1], points[candidates])
+            exit_ = int(candidates[np.argmin(distances)])
+            previous = points[exit_]
+        junctions.append((entry, exit_))
+    return junctions